@@ -0,0 +1,45 @@
+import argparse
+import json
+import sys
+
+from src.benchmark import BenchmarkSuite
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the world, job and rendering data hot paths"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 1024, 4096])
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--case", nargs="+", help="only run cases with these in the name"
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--baseline", help="compare against the results in this file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="slowdown over the baseline that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(args.sizes, args.counts, args.repeat, args.case)
+    results = suite.run()
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        results = BenchmarkSuite.compare(results, baseline, args.threshold)
+    print(BenchmarkSuite.format_results(results))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if any(result.get("regression") for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import json
+
+from src.scenario import Scenario
+from src.headless import HeadlessRunner
+from src.replay import Replay, ReplayRunner
+from src.tracer import TRACER
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a scenario without a window as fast as possible"
+    )
+    parser.add_argument("scenario", nargs="?", help="path to a scenario JSON file")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--replay", help="replay a recording instead of a scenario")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument(
+        "--memory", action="store_true", help="follow the allocations of every tick"
+    )
+    parser.add_argument("--trace", help="write a Chrome trace of the run to this file")
+    args = parser.parse_args()
+    TRACER.enabled = bool(args.trace)
+
+    if args.replay:
+        runner = ReplayRunner(Replay(args.replay))
+        report = runner.run()
+        print(ReplayRunner.format_report(report))
+    elif args.scenario:
+        runner = HeadlessRunner(Scenario.load(args.scenario), args.memory)
+        report = runner.run(args.ticks)
+        print(HeadlessRunner.format_report(report))
+    else:
+        parser.error("either a scenario or --replay is needed")
+
+    if args.trace:
+        TRACER.export(args.trace)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,64 @@
-import pyglet
+import argparse
 
-from src.game import Game
+from src import constants
+from src.tracer import TRACER
 
 
 def main():
-    game = Game()
+    # Imported here, a spawned simulation worker imports this module again and
+    # must not load the game, its window, textures and audio
+    import pyglet
+
+    from src.game import Game
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--simulation-process",
+        action="store_true",
+        help="run the world on a worker process",
+    )
+    parser.add_argument("--record", help="record the input to a replay file")
+    parser.add_argument("--replay", help="play a replay file back")
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="follow the allocations of every frame and flag the spikes",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="trace frames, F4 or a frame slower than --trace-threshold exports",
+    )
+    parser.add_argument(
+        "--trace-threshold",
+        type=float,
+        default=constants.TRACE_FRAME_THRESHOLD_MS,
+        help="milliseconds a frame takes before it is exported",
+    )
+    parser.add_argument(
+        "--chunk-cache",
+        action="store_true",
+        help="draw the structures of each chunk from a cached texture",
+    )
+    args = parser.parse_args()
+    if args.simulation_process:
+        if args.record or args.replay:
+            parser.error("replays need the world on this process")
+        constants.SIMULATION_IN_PROCESS = True
+
+    if args.chunk_cache:
+        constants.CHUNK_CACHE_ENABLED = True
+    if args.memory:
+        constants.MEMORY_TRACING = True
+    if args.trace:
+        TRACER.enabled = True
+        TRACER.threshold_ms = args.trace_threshold
+
+    game = Game(record_path=args.record, replay_path=args.replay)
     pyglet.clock.schedule(game.update)
     pyglet.app.run()
+    # Not reached after a crash, which leaves the autosave journal to recover
+    game.world_manager.close()
 
 
 if __name__ == "__main__":
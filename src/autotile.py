@@ -0,0 +1,47 @@
+"""
+Autotile bitmask helpers for connected textures
+
+Raw masks have one bit per neighbor in the order w, n, e, s, nw, ne, se, sw.
+The canonical mask drops the diagonal bits whose two adjacent sides are not
+both set, which is the form the connected texture sets are keyed by.
+"""
+import numpy as np
+
+W, N, E, S, NW, NE, SE, SW = (1 << bit for bit in range(8))
+
+# Bit index of a neighbor as seen from the other side: w <-> e, n <-> s, ...
+OPPOSITE_BITS = (2, 3, 0, 1, 6, 7, 4, 5)
+
+
+def canonicalize(mask: int) -> int:
+    canonical = mask & (W | N | E | S)
+    if mask & NW and mask & N and mask & W:
+        canonical |= NW
+    if mask & NE and mask & N and mask & E:
+        canonical |= NE
+    if mask & SE and mask & S and mask & E:
+        canonical |= SE
+    if mask & SW and mask & S and mask & W:
+        canonical |= SW
+    return canonical
+
+
+# Raw mask -> canonical mask
+CANONICAL_MASKS = np.array([canonicalize(mask) for mask in range(256)], dtype=np.uint8)
+
+
+def compute_raw_masks(padded: np.ndarray) -> np.ndarray:
+    """
+    Computes the raw masks of every tile of a [x, y] occupancy array that is
+    padded by one tile on every side, in a single vectorized pass.
+    """
+    padded = padded.astype(np.uint8)
+    masks = padded[0:-2, 1:-1].copy()  # w
+    masks |= padded[1:-1, 2:] << 1  # n
+    masks |= padded[2:, 1:-1] << 2  # e
+    masks |= padded[1:-1, 0:-2] << 3  # s
+    masks |= padded[0:-2, 2:] << 4  # nw
+    masks |= padded[2:, 2:] << 5  # ne
+    masks |= padded[2:, 0:-2] << 6  # se
+    masks |= padded[0:-2, 0:-2] << 7  # sw
+    return masks
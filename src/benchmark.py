@@ -0,0 +1,228 @@
+"""
+Microbenchmarks of the world, job and rendering data hot paths
+"""
+from contextlib import redirect_stdout
+from itertools import product
+from time import perf_counter
+from typing import Callable
+import io
+import math
+import statistics
+
+from .world import World
+from .tile import Tile
+from .structure_images import StructureImages
+from .simulation_process import apply_command
+
+# A case gets the map size and the entity count and returns the function to
+# time, everything before that is setup and is not timed
+Case = Callable[[int, int], Callable[[], None]]
+
+CASES: dict[str, Case] = {}
+# Cases that only scale with the map size
+SIZE_ONLY_CASES: set[str] = set()
+
+
+def case(name: str, size_only: bool = False) -> Callable[[Case], Case]:
+    def register(function: Case) -> Case:
+        CASES[name] = function
+        if size_only:
+            SIZE_ONLY_CASES.add(name)
+        return function
+
+    return register
+
+
+def quiet_world(size: int) -> World:
+    """Creates a world without it announcing itself"""
+    with redirect_stdout(io.StringIO()):
+        return World(size, size)
+
+
+def square(world: World, count: int, x0: int = 1, y0: int = 1) -> list[Tile]:
+    """Returns about count tiles in a square that fits in the world"""
+    side = min(math.ceil(math.sqrt(count)), world.width - x0 - 1)
+    return world.get_tiles_in_rect(x0, y0, x0 + side - 1, y0 + side - 1)[:count]
+
+
+@case("World.initialize", size_only=True)
+def world_initialize(size: int, count: int):
+    return lambda: quiet_world(size)
+
+
+@case("World.create_job drag")
+def create_job_drag(size: int, count: int):
+    world = quiet_world(size)
+    tiles = square(world, count)
+    world.place_structures("floor", tiles)
+    world.events.dispatch()
+    positions = [tile.position for tile in tiles]
+
+    def run():
+        # The same path a drag of BuildModeManager takes
+        apply_command(world, ("create_jobs", "wall", positions))
+        world.events.dispatch()
+
+    return run
+
+
+@case("World.place_structure")
+def place_structure(size: int, count: int):
+    world = quiet_world(size)
+    tiles = square(world, count)
+
+    def run():
+        world.place_structures("floor", tiles)
+        world.place_structures("wall", tiles)
+        world.events.dispatch()
+
+    return run
+
+
+@case("World.get_structure_neighbors")
+def get_structure_neighbors(size: int, count: int):
+    world = quiet_world(size)
+    tiles = square(world, count)
+    world.place_structures("floor", tiles)
+    structures = world.place_structures("wall", tiles)
+    world.events.dispatch()
+
+    def run():
+        for structure in structures:
+            world.get_structure_neighbors(structure)
+
+    return run
+
+
+@case("SpriteManager.get_image_for_structure")
+def get_image_for_structure(size: int, count: int):
+    world = quiet_world(size)
+    tiles = square(world, count)
+    world.place_structures("floor", tiles)
+    structures = world.place_structures("wall", tiles)
+    world.events.dispatch()
+    # Stand-ins for the textures, the lookup does not touch them
+    images = StructureImages(world, {"floor": "floor", "wall": ["wall"] * 256})
+
+    def run():
+        for structure in structures:
+            images.get(structure, structure.tile)
+
+    return run
+
+
+@case("Structure.is_valid_position")
+def is_valid_position(size: int, count: int):
+    world = quiet_world(size)
+    blueprints = list(world.blueprints.values())
+    types_at_tiles = [[], ["floor"], ["floor", "wall"]]
+    checks = [
+        (blueprints[i % len(blueprints)], types_at_tiles[i % len(types_at_tiles)])
+        for i in range(count)
+    ]
+
+    def run():
+        for blueprint, types_at_tile in checks:
+            blueprint.is_valid_position(types_at_tile)
+
+    return run
+
+
+def result_key(result: dict) -> str:
+    return f"{result['case']}[size={result['size']},count={result['count']}]"
+
+
+class BenchmarkSuite:
+    """
+    Benchmark Suite class
+
+    Runs every case over every combination of map size and entity count.
+    Each run sets the case up again so that it times the same work, the
+    median of the runs is what gets compared against a baseline.
+    """
+
+    def __init__(
+        self,
+        sizes: list[int],
+        counts: list[int],
+        repeat: int = 5,
+        names: list[str] | None = None,
+    ):
+        self.sizes: list[int] = sizes
+        self.counts: list[int] = counts
+        self.repeat: int = repeat
+        self.cases: dict[str, Case] = {
+            name: function
+            for name, function in CASES.items()
+            if not names or any(part in name for part in names)
+        }
+
+    def run(self) -> list[dict]:
+        results = []
+        for name, function in self.cases.items():
+            counts = [0] if name in SIZE_ONLY_CASES else self.counts
+            for size, count in product(self.sizes, counts):
+                count = min(count, (size - 2) ** 2)
+                times = []
+                for _ in range(self.repeat):
+                    run = function(size, count)
+                    start = perf_counter()
+                    run()
+                    times.append(perf_counter() - start)
+
+                median = statistics.median(times)
+                results.append(
+                    {
+                        "case": name,
+                        "size": size,
+                        "count": count,
+                        "min_ms": min(times) * 1000,
+                        "median_ms": median * 1000,
+                        "per_item_us": median * 1e6 / count if count else 0.0,
+                    }
+                )
+        return results
+
+    @staticmethod
+    def compare(
+        results: list[dict], baseline: list[dict], threshold: float
+    ) -> list[dict]:
+        """
+        Returns the results with the median of the baseline and the ratio to
+        it, a result over 1 + threshold times the baseline is a regression
+        """
+        baseline_by_key = {result_key(result): result for result in baseline}
+        compared = []
+        for result in results:
+            before = baseline_by_key.get(result_key(result))
+            if before is None or not before["median_ms"]:
+                compared.append({**result, "baseline_ms": None, "ratio": None})
+                continue
+            ratio = result["median_ms"] / before["median_ms"]
+            compared.append(
+                {
+                    **result,
+                    "baseline_ms": before["median_ms"],
+                    "ratio": ratio,
+                    "regression": ratio > 1 + threshold,
+                }
+            )
+        return compared
+
+    @staticmethod
+    def format_results(results: list[dict]) -> str:
+        lines = [
+            f"{'case':<40}{'size':>6}{'count':>7}{'median ms':>11}"
+            f"{'us/item':>10}{'baseline':>10}{'ratio':>8}"
+        ]
+        for result in results:
+            line = (
+                f"{result['case']:<40}{result['size']:>6}{result['count']:>7}"
+                f"{result['median_ms']:>11.3f}{result['per_item_us']:>10.3f}"
+            )
+            if result.get("ratio") is not None:
+                line += f"{result['baseline_ms']:>10.3f}{result['ratio']:>8.2f}"
+                if result["regression"]:
+                    line += "  REGRESSION"
+            lines.append(line)
+        return "\n".join(lines)
@@ -145,12 +145,11 @@ class BuildModeManager(Manager):
     def finilize_dragging(self, x, y) -> None:
         self.dragging = False
 
-        for tile in sorted(self.highligted_tiles, key=lambda tile: (tile.x, tile.y)):
-            if self.build_mode_type and isinstance(self.build_mode_type, str):
-                if self.world_manager.world.is_structure_valid_position(
-                    self.build_mode_type, tile
-                ):
-                    self.world_manager.world.create_job(tile, self.build_mode_type)
+        if self.build_mode_type and isinstance(self.build_mode_type, str):
+            self.world_manager.create_jobs(
+                self.build_mode_type,
+                sorted(self.highligted_tiles, key=lambda tile: (tile.x, tile.y)),
+            )
 
         self.highligted_tiles.clear()
         self.update_hover_tile(x, y)
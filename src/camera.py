@@ -54,22 +54,28 @@ class Camera:
         self.x, self.y = value
 
     def move(self, x, y) -> None:
-        """Move the camera"""
+        """Move the camera, the same distance on screen at any zoom"""
         # TODO: Work on this later
-        self.x += self.speed * x
-        self.y += self.speed * y
+        self.x += self.speed * x / self.zoom
+        self.y += self.speed * y / self.zoom
 
     def zoom_in(self, dt) -> None:
         """Zooms in the camera"""
         # TODO: make the zoom smoother by making pixel increments
         # self.zoom += self.zoom_speed
-        self.zoom += 1
+        if self.zoom < 1:
+            self.zoom *= 2
+        else:
+            self.zoom += 1
 
     def zoom_out(self, dt) -> None:
         """Zooms out the camera"""
         # TODO: make the zoom smoother by making pixel increments
         # self.zoom -= self.zoom_speed * dt
-        self.zoom -= 1
+        if self.zoom <= 1:
+            self.zoom /= 2
+        else:
+            self.zoom -= 1
 
     def screen_to_world_point(self, x: int, y: int) -> tuple[int, int]:
         # Potentially move to camera class
@@ -85,6 +91,12 @@ class Camera:
         )
         return math.floor(world_x), math.floor(world_y)
 
+    def get_visible_rect(self, margin: int = 0) -> tuple[int, int, int, int]:
+        """Returns the inclusive x0, y0, x1, y1 of the tiles on screen"""
+        x0, y0 = self.screen_to_world_point(0, 0)
+        x1, y1 = self.screen_to_world_point(self.window.width, self.window.height)
+        return x0 - margin, y0 - margin, x1 + margin, y1 + margin
+
     def __enter__(self):
         offset_x = 0
         offset_y = 0
@@ -27,14 +27,14 @@ class CameraManager(Manager):
             self.window,
             speed=2.0,
             # zoom_speed=1.1,
-            min_zoom=1.0,
-            max_zoom=8.0,
+            min_zoom=constants.MIN_ZOOM,
+            max_zoom=constants.MAX_ZOOM,
             center=True,
         )
         self.gui_camera = Camera(self.window)
         # Initialize camera position to middle of the world
         self.camera.position = (
-            constants.WOLRD_WIDTH * constants.TILE_SIZE // 2,
+            constants.WORLD_WIDTH * constants.TILE_SIZE // 2,
             constants.WORLD_HEIGHT * constants.TILE_SIZE // 2,
         )
 
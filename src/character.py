@@ -1,80 +1,90 @@
 """
 Character
 """
+from typing import TYPE_CHECKING
+
 from .tile import Tile
 from .job import Job
-from . import constants
+from .pathfinding import Path
+
+if TYPE_CHECKING:
+    from .character_store import CharacterStore
 
 
 class Character:
     """
     Character
+
+    Handle to a character in a CharacterStore, the state itself lives in the
+    store's arrays.
     """
 
-    def __init__(
-        self,
-        tile: Tile,
-        speed: float = 10.0,
-        build_speed: float = 10.0,
-    ):
-        self._x: float = 0
-        self._y: float = 0
-        self.speed: float = speed
-        self.build_speed: float = build_speed
+    __slots__ = ("store", "index")
 
-        self.job: Job | None = None
+    def __init__(self, store: "CharacterStore", index: int):
+        self.store: "CharacterStore" = store
+        self.index: int = index
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Character)
+            and self.store is other.store
+            and self.index == other.index
+        )
 
-        self.current_tile: Tile = tile
-        self.destinaiton_tile: Tile = tile
+    def __hash__(self) -> int:
+        return hash(self.index)
 
-        self.movement_percentage: float = 0.0  # Between 0.0 and 1.0
+    def __repr__(self) -> str:
+        return f"Character({self.index})"
 
     @property
     def x(self) -> float:
-        return Character.lerp(
-            self.current_tile.x, self.destinaiton_tile.x, self.movement_percentage
-        )
+        return float(self.store.positions[self.index, 0])
 
     @property
     def y(self) -> float:
-        return Character.lerp(
-            self.current_tile.y, self.destinaiton_tile.y, self.movement_percentage
-        )
+        return float(self.store.positions[self.index, 1])
 
-    @staticmethod
-    def lerp(current: float, destination: float, percentage: float) -> float:
-        return (percentage * destination) + ((1 - percentage) * current)
+    @property
+    def speed(self) -> float:
+        return float(self.store.speed[self.index])
 
-    def assign_job(self, job: Job) -> None:
-        self.job = job
-        job.subscribe_on_job_completed(self.on_job_completed)
+    @property
+    def build_speed(self) -> float:
+        return float(self.store.build_speed[self.index])
 
-    def remove_job(self) -> None:
-        self.job = None
+    @property
+    def current_tile(self) -> Tile:
+        return Tile(*self.store.current[self.index].tolist())
 
-    def on_job_completed(self, job: Job) -> None:
-        self.remove_job()
+    @property
+    def destinaiton_tile(self) -> Tile:
+        return Tile(*self.store.destination[self.index].tolist())
 
-    def update(self, dt: float) -> None:
-        if self.job:
-            self.destinaiton_tile = self.job.tile
+    @property
+    def movement_percentage(self) -> float:
+        return float(self.store.progress[self.index])
 
-        if self.current_tile == self.destinaiton_tile:
-            if self.job:
-                self.job.do_work(self.build_speed * dt)
-            return
+    @property
+    def job(self) -> Job | None:
+        return self.store.jobs[self.index]
 
-        distance_to_travel = (
-            (self.current_tile.x - self.destinaiton_tile.x) ** 2
-            + (self.current_tile.y - self.destinaiton_tile.y) ** 2
-        ) ** (1 / 2)
+    @property
+    def path(self) -> Path | None:
+        return self.store.paths[self.index]
 
-        character_can_travel = self.speed * dt
+    @path.setter
+    def path(self, path: Path | None) -> None:
+        self.store.set_path(self.index, path)
 
-        percentage_can_travel = character_can_travel / distance_to_travel
+    @property
+    def is_lost(self) -> bool:
+        """Standing still with a job but no path left to it"""
+        return bool(self.store.lost[self.index])
 
-        self.movement_percentage += percentage_can_travel
+    def assign_job(self, job: Job, path: Path) -> None:
+        self.store.assign_job(self.index, job, path)
 
-        if self.movement_percentage >= 1.0:
-            self.current_tile = self.destinaiton_tile
-            self.movement_percentage = 0.0
+    def remove_job(self) -> None:
+        self.store.remove_job(self.index)
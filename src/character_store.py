@@ -0,0 +1,234 @@
+"""
+Character Store class for array backed character simulation
+"""
+import numpy as np
+
+from .tile import Tile
+from .job import Job
+from .pathfinding import Path
+from .character import Character
+
+NO_JOB = -1
+
+
+class CharacterStore:
+    """
+    Character Store class
+
+    Keeps the state of every character in NumPy arrays indexed by character,
+    so movement and work are advanced for all characters in one step per
+    tick. Paths and jobs stay Python objects and are only touched for the
+    characters that reached a tile or finished a job this tick.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.count: int = 0
+
+        self.current: np.ndarray = np.zeros((capacity, 2), dtype=np.int32)
+        self.destination: np.ndarray = np.zeros((capacity, 2), dtype=np.int32)
+        self.positions: np.ndarray = np.zeros((capacity, 2), dtype=np.float32)
+        # Positions at the start of the last update, for interpolating frames
+        self.previous_positions: np.ndarray = np.zeros((capacity, 2), dtype=np.float32)
+        self.speed: np.ndarray = np.zeros(capacity, dtype=np.float32)
+        self.build_speed: np.ndarray = np.zeros(capacity, dtype=np.float32)
+        # Between 0.0 and 1.0 of the way from current to destination
+        self.progress: np.ndarray = np.zeros(capacity, dtype=np.float32)
+        self.job_ids: np.ndarray = np.full(capacity, NO_JOB, dtype=np.int64)
+        self.work_remaining: np.ndarray = np.zeros(capacity, dtype=np.float32)
+        self.working: np.ndarray = np.zeros(capacity, dtype=bool)
+        self.lost: np.ndarray = np.zeros(capacity, dtype=bool)
+
+        self.jobs: list[Job | None] = []
+        self.paths: list[Path | None] = []
+        self._indices_by_job: dict[Job, int] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> Character:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return Character(self, index)
+
+    def __iter__(self):
+        return (Character(self, index) for index in range(self.count))
+
+    @property
+    def capacity(self) -> int:
+        return len(self.speed)
+
+    def add(self, tile: Tile, speed: float = 10.0, build_speed: float = 10.0):
+        if self.count == self.capacity:
+            self._grow(self.capacity * 2)
+
+        index = self.count
+        self.count += 1
+
+        self.current[index] = tile.position
+        self.destination[index] = tile.position
+        self.positions[index] = tile.position
+        self.previous_positions[index] = tile.position
+        self.speed[index] = speed
+        self.build_speed[index] = build_speed
+        self.progress[index] = 0.0
+        self.job_ids[index] = NO_JOB
+        self.work_remaining[index] = 0.0
+        self.working[index] = False
+        self.lost[index] = False
+        self.jobs.append(None)
+        self.paths.append(None)
+        return Character(self, index)
+
+    def get_job(self, index: int) -> Job | None:
+        return self.jobs[index]
+
+    def get_index_of_job(self, job: Job) -> int | None:
+        return self._indices_by_job.get(job)
+
+    def get_work_remaining(self, job: Job) -> float:
+        """Work left on a job, counting the work of a character doing it"""
+        index = self._indices_by_job.get(job)
+        if index is not None and self.working[index]:
+            return float(self.work_remaining[index])
+        return job.work_remaining
+
+    def assign_job(self, index: int, job: Job, path: Path) -> None:
+        self.remove_job(index)
+        self.jobs[index] = job
+        self.job_ids[index] = job.id
+        self._indices_by_job[job] = index
+        self.set_path(index, path)
+
+    def set_path(self, index: int, path: Path | None) -> None:
+        self.paths[index] = path
+        self.lost[index] = False
+
+    def remove_job(self, index: int) -> None:
+        job = self.jobs[index]
+        if job is not None:
+            self._indices_by_job.pop(job, None)
+            if self.working[index]:
+                # Keep the work done so far for the next character
+                job.work_remaining = float(self.work_remaining[index])
+        self.jobs[index] = None
+        self.paths[index] = None
+        self.job_ids[index] = NO_JOB
+        self.working[index] = False
+        self.lost[index] = False
+
+    def drop_job(self, job: Job) -> None:
+        """Takes a job away from the character doing it, if there is one"""
+        index = self._indices_by_job.get(job)
+        if index is not None:
+            self.remove_job(index)
+
+    def idle_indices(self) -> np.ndarray:
+        return np.flatnonzero(self.job_ids[: self.count] == NO_JOB)
+
+    def lost_indices(self) -> np.ndarray:
+        return np.flatnonzero(self.lost[: self.count])
+
+    def job_indices(self) -> np.ndarray:
+        return np.flatnonzero(self.job_ids[: self.count] != NO_JOB)
+
+    def update(self, dt: float) -> None:
+        n = self.count
+        self.previous_positions[:n] = self.positions[:n]
+        current = self.current[:n]
+        destination = self.destination[:n]
+        progress = self.progress[:n]
+
+        # Movement
+        delta = destination - current
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        moving = distance > 0
+        progress[moving] += self.speed[:n][moving] * dt / distance[moving]
+
+        arrived = moving & (progress >= 1.0)
+        current[arrived] = destination[arrived]
+        progress[arrived] = 0.0
+
+        # Characters standing on a tile with a job and nothing to work on yet
+        standing = ~(moving & ~arrived) & (self.job_ids[:n] != NO_JOB)
+        standing &= ~self.working[:n] & ~self.lost[:n]
+        stepping = []
+        next_positions = []
+        for index in np.flatnonzero(standing).tolist():
+            position = self._next_position(index)
+            if position is not None:
+                stepping.append(index)
+                next_positions.append(position)
+        if stepping:
+            destination[stepping] = next_positions
+
+        # Work
+        working = self.working[:n]
+        self.work_remaining[:n][working] -= self.build_speed[:n][working] * dt
+        done = working & (self.work_remaining[:n] <= 0)
+        for index in np.flatnonzero(done).tolist():
+            job = self.jobs[index]
+            self.remove_job(index)
+            job.do_work()
+
+        self.update_positions()
+
+    def update_positions(self) -> None:
+        """Interpolates the current positions between tiles for every character"""
+        n = self.count
+        progress = self.progress[:n, np.newaxis]
+        self.positions[:n] = (
+            self.current[:n] + (self.destination[:n] - self.current[:n]) * progress
+        )
+
+    def interpolated_positions(self, alpha: float) -> np.ndarray:
+        """
+        Returns the positions alpha of the way from the previous update to the
+        last one
+        """
+        n = self.count
+        previous = self.previous_positions[:n]
+        return previous + (self.positions[:n] - previous) * alpha
+
+    def copy_positions(self, previous: np.ndarray, current: np.ndarray) -> None:
+        """Takes over positions that were simulated somewhere else"""
+        count = min(self.count, len(current))
+        self.previous_positions[:count] = previous[:count]
+        self.positions[:count] = current[:count]
+
+    def _next_position(self, index: int) -> tuple[int, int] | None:
+        """
+        Returns the next tile of the path, or starts the work on the job or
+        marks the character lost when the path is done
+        """
+        path = self.paths[index]
+        next_tile = path.next_tile() if path else None
+        if next_tile is not None:
+            return next_tile.position
+
+        job = self.jobs[index]
+        if tuple(self.current[index].tolist()) == job.tile.position:
+            self.working[index] = True
+            self.work_remaining[index] = job.work_remaining
+        else:
+            self.lost[index] = True
+        return None
+
+    def _grow(self, capacity: int) -> None:
+        for name in (
+            "current",
+            "destination",
+            "positions",
+            "previous_positions",
+            "speed",
+            "build_speed",
+            "progress",
+            "job_ids",
+            "work_remaining",
+            "working",
+            "lost",
+        ):
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[: len(array)] = array
+            setattr(self, name, grown)
+        self.job_ids[self.count :] = NO_JOB
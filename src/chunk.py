@@ -0,0 +1,63 @@
+"""
+Chunk class for a square block of tile grid data
+"""
+import numpy as np
+
+
+class Chunk:
+    """
+    Chunk class
+
+    Holds the tile grid arrays of a CHUNK_SIZE x CHUNK_SIZE block of the world,
+    indexed with local [x, y] coordinates.
+    """
+
+    def __init__(
+        self,
+        chunk_x: int,
+        chunk_y: int,
+        size: int,
+        layers: int,
+        empty_movement_cost: float,
+    ):
+        self.chunk_x: int = chunk_x
+        self.chunk_y: int = chunk_y
+        self.size: int = size
+
+        self.structure_ids = np.zeros((layers, size, size), dtype=np.uint16)
+        self.build_state = np.zeros((layers, size, size), dtype=np.uint8)
+        self.movement_cost = np.full(
+            (size, size), empty_movement_cost, dtype=np.float32
+        )
+        # Raw autotile neighbor masks per connected texture type id
+        self.masks: dict[int, np.ndarray] = {}
+
+    @property
+    def position(self) -> tuple[int, int]:
+        return self.chunk_x, self.chunk_y
+
+    @property
+    def origin(self) -> tuple[int, int]:
+        """World position of the bottom left tile of the chunk"""
+        return self.chunk_x * self.size, self.chunk_y * self.size
+
+    def get_masks(self, type_id: int) -> np.ndarray:
+        masks = self.masks.get(type_id)
+        if masks is None:
+            masks = np.zeros((self.size, self.size), dtype=np.uint8)
+            self.masks[type_id] = masks
+        return masks
+
+    def is_empty(self) -> bool:
+        return (
+            not self.structure_ids.any()
+            and not self.build_state.any()
+            and not any(masks.any() for masks in self.masks.values())
+        )
+
+    def iter_structure_positions(self):
+        """Yields the world positions of the tiles that have any structure"""
+        origin_x, origin_y = self.origin
+        xs, ys = np.nonzero(self.structure_ids.any(axis=0))
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            yield origin_x + x, origin_y + y
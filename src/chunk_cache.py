@@ -0,0 +1,163 @@
+"""
+Chunk Cache class for drawing the tilemap of a chunk from a texture
+"""
+from collections import OrderedDict
+from typing import Iterable
+import ctypes
+
+import pyglet
+from pyglet import gl
+
+from . import constants
+from .tile import Tile
+from .tilemap_renderer import TilemapRenderer
+
+
+class ChunkCache:
+    """
+    Chunk Cache class
+
+    Renders the tilemap of a chunk into a texture through a framebuffer once
+    and from then on draws the chunk as that one textured quad. A chunk is
+    rendered again only after a tile in it changed, which includes the
+    border tiles whose autotile masks a change next door updated. Textures
+    are kept in the order they were last drawn and the oldest are released
+    once they take more than budget bytes.
+    """
+
+    def __init__(
+        self,
+        tilemap: TilemapRenderer,
+        budget: int = constants.CHUNK_CACHE_BUDGET,
+    ):
+        self.tilemap: TilemapRenderer = tilemap
+        self.budget: int = budget
+        # Pixels along the side of a chunk and bytes of its texture
+        self.size: int = tilemap.world.grid.chunk_size * constants.TILE_SIZE
+        self.texture_bytes: int = self.size * self.size * 4
+
+        self.textures: OrderedDict[tuple[int, int], pyglet.image.Texture] = (
+            OrderedDict()
+        )
+        self.dirty: set[tuple[int, int]] = set()
+        self.renders: int = 0
+
+        self.framebuffer = gl.GLuint()
+        gl.glGenFramebuffers(1, ctypes.byref(self.framebuffer))
+
+    @staticmethod
+    def is_supported() -> bool:
+        return gl.gl_info.have_version(3, 0) or gl.gl_info.have_extension(
+            "GL_ARB_framebuffer_object"
+        )
+
+    def invalidate(self, tiles: Iterable[Tile]) -> None:
+        grid = self.tilemap.world.grid
+        self.dirty.update(grid.chunk_position_at(tile.x, tile.y) for tile in tiles)
+
+    def draw(self, chunk_positions: list[tuple[int, int]]) -> None:
+        stale = []
+        for chunk_position in chunk_positions:
+            if chunk_position not in self.tilemap.vertex_lists:
+                # Nothing is built on it anymore
+                self.textures.pop(chunk_position, None)
+                self.dirty.discard(chunk_position)
+            elif chunk_position not in self.textures or chunk_position in self.dirty:
+                stale.append(chunk_position)
+        if stale:
+            self.render(stale)
+
+        # The textures hold premultiplied colors
+        gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        uncached = []
+        for chunk_position in chunk_positions:
+            texture = self.textures.get(chunk_position)
+            if texture is None:
+                uncached.append(chunk_position)
+                continue
+            self.textures.move_to_end(chunk_position)
+            chunk_x, chunk_y = chunk_position
+            texture.blit(chunk_x * self.size, chunk_y * self.size)
+        gl.glPopAttrib()
+        # More chunks are on screen than fit in the budget
+        if uncached:
+            self.tilemap.draw(uncached)
+
+    def render(self, chunk_positions: list[tuple[int, int]]) -> None:
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer)
+        gl.glPushAttrib(gl.GL_VIEWPORT_BIT | gl.GL_COLOR_BUFFER_BIT)
+        gl.glViewport(0, 0, self.size, self.size)
+        gl.glClearColor(0, 0, 0, 0)
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPushMatrix()
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+
+        for chunk_position in chunk_positions:
+            texture = self.textures.get(chunk_position) or self.create_texture(
+                chunk_position
+            )
+            gl.glFramebufferTexture2D(
+                gl.GL_FRAMEBUFFER,
+                gl.GL_COLOR_ATTACHMENT0,
+                texture.target,
+                texture.id,
+                0,
+            )
+            chunk_x, chunk_y = chunk_position
+            gl.glMatrixMode(gl.GL_PROJECTION)
+            gl.glLoadIdentity()
+            gl.glOrtho(
+                chunk_x * self.size,
+                (chunk_x + 1) * self.size,
+                chunk_y * self.size,
+                (chunk_y + 1) * self.size,
+                -1,
+                1,
+            )
+            gl.glMatrixMode(gl.GL_MODELVIEW)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+
+            self.tilemap.group.set_state_recursive()
+            # Alpha is added up instead of multiplied in twice
+            gl.glBlendFuncSeparate(
+                gl.GL_SRC_ALPHA,
+                gl.GL_ONE_MINUS_SRC_ALPHA,
+                gl.GL_ONE,
+                gl.GL_ONE_MINUS_SRC_ALPHA,
+            )
+            self.tilemap.vertex_lists[chunk_position].draw(gl.GL_QUADS)
+            self.tilemap.group.unset_state_recursive()
+
+            self.dirty.discard(chunk_position)
+            self.renders += 1
+
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPopMatrix()
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPopMatrix()
+        gl.glPopAttrib()
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+
+    def create_texture(self, chunk_position: tuple[int, int]) -> pyglet.image.Texture:
+        # Textures are released when the last reference to them is dropped
+        while self.textures and self.get_bytes() + self.texture_bytes > self.budget:
+            released, _ = self.textures.popitem(last=False)
+            self.dirty.discard(released)
+
+        texture = pyglet.image.Texture.create(self.size, self.size)
+        self.textures[chunk_position] = texture
+        return texture
+
+    def get_bytes(self) -> int:
+        return len(self.textures) * self.texture_bytes
+
+    def clear(self) -> None:
+        self.textures.clear()
+        self.dirty.clear()
+
+    def measure(self) -> tuple[int, int]:
+        return len(self.textures), self.get_bytes()
@@ -6,6 +6,103 @@ WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 TILE_SIZE = 16
 
+# Simulation Settings
+SIMULATION_RATE = 20  # ticks per second
+# Most ticks run in one frame to catch up, the rest of the lag is dropped
+MAX_SIMULATION_STEPS = 5
+# Run the world on a worker process, the window only draws a mirror of it
+SIMULATION_IN_PROCESS = False
+# Most characters whose positions the worker publishes
+SNAPSHOT_MAX_CHARACTERS = 16384
+
+# Profiler Settings
+# Frames the percentiles of the frame profiler are taken over
+PROFILER_HISTORY = 600
+# Seconds between refreshing the numbers of the profiler overlay
+PROFILER_OVERLAY_UPDATE_INTERVAL = 0.25
+
+# Memory Settings
+# Follow the allocations of every frame with tracemalloc
+MEMORY_TRACING = False
+# Frames that allocate this many times the median are spikes
+MEMORY_SPIKE_FACTOR = 4.0
+# Allocations smaller than this are never spikes
+MEMORY_MIN_SPIKE_BYTES = 1 << 20
+MEMORY_SPIKES_KEPT = 8
+
+# Tracer Settings
+# Spans the tracer keeps, older ones are overwritten
+TRACE_CAPACITY = 65536
+# Traces go to this path with a number and .json appended
+TRACE_PATH = "trace"
+# Frames longer than this are exported when tracing
+TRACE_FRAME_THRESHOLD_MS = 50.0
+# Seconds between exporting slow frames
+TRACE_EXPORT_COOLDOWN = 5.0
+
+# Save Settings
+SAVE_FILE_PATH = "saves/world.sav"
+# Autosaves go to this path with .sav and .journal appended, they are only
+# loaded again after a crash
+AUTOSAVE_PATH = "saves/autosave"
+AUTOSAVE_ENABLED = True
+# Seconds between handing journal records to the writer thread
+JOURNAL_FLUSH_INTERVAL = 1.0
+# Seconds between snapshots, each one starts the journal over
+SNAPSHOT_INTERVAL = 300.0
+
+# Rendering Settings
+# Tiles around the screen that are drawn anyway
+CULLING_MARGIN = 4
+# Draw the structures of a chunk from a texture that is rendered once
+CHUNK_CACHE_ENABLED = False
+# Bytes the cached chunk textures may take, a chunk takes 1 MiB
+CHUNK_CACHE_BUDGET = 64 * 2**20
+# Zoom range of the camera, below 1 every step halves the zoom
+MIN_ZOOM = 1 / 16
+MAX_ZOOM = 8.0
+# Zoom below which chunks are drawn as a flat color per tile
+LOD_ZOOM = 0.5
+# Bytes the zoomed out chunk textures may take, a chunk takes 4 KiB
+LOD_CACHE_BUDGET = 16 * 2**20
+# Pixels along the longer side of the minimap
+MINIMAP_SIZE = 256
+# Packed images and autotile tables, rebuilt when the images change
+ATLAS_CACHE_PATH = "cache/atlas.sav"
+ATLAS_WIDTH = 256
+
 # Word Settings
-WOLRD_WIDTH = 100
-WORLD_HEIGHT = 100
+WORLD_WIDTH = 4096
+WORLD_HEIGHT = 4096
+CHUNK_SIZE = 32
+
+# Structure Settings
+STRUCTURE_LAYERS = 2  # floor: 0, wall: 1
+
+# Job Settings
+JOB_BOARD_CELL_SIZE = 16
+
+# Pathfinding Settings
+# Idle and lost characters that search for a path in one tick
+PATH_REQUESTS_PER_TICK = 8
+PATH_CACHE_SIZE = 1024
+PATHFINDING_MAX_EXPANDED_NODES = 100_000
+# Searches over smaller areas read the movement costs from a copy
+PATHFINDING_MAX_COPIED_TILES = 128 * 128
+# Tiles around start and goal searched before falling back to the whole grid
+PATHFINDING_SEARCH_MARGIN = 32
+# Routes at least this long are searched over the chunk graph first
+HIERARCHICAL_PATHFINDING_MIN_DISTANCE = 64
+
+# Flow Field Settings
+FLOW_FIELD_CACHE_SIZE = 32
+# Targets are grouped into square areas of this size, one field per area
+FLOW_FIELD_AREA_SIZE = 16
+# Tiles around the target area that a field covers
+FLOW_FIELD_RADIUS = 96
+# Path requests into an area before a field is built for it
+FLOW_FIELD_MIN_REQUESTS = 4
+# Seconds between halving the request counts
+FLOW_FIELD_DECAY_INTERVAL = 10.0
+# Seconds between rebuilding the fields that structures changed under
+FLOW_FIELD_REBUILD_INTERVAL = 1.0
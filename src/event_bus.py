@@ -0,0 +1,83 @@
+"""
+Event Bus for deferred, batched event delivery
+"""
+from collections import defaultdict
+from typing import Callable
+import time
+
+from .events import Event
+from .tracer import TRACER
+
+
+class EventBus:
+    """
+    Event Bus
+
+    Published events are queued and delivered when dispatch is called, once
+    per simulation tick. Every handler receives the list of all the queued
+    events of the type it subscribed to. Events published by handlers are
+    delivered in the next round of the same dispatch.
+    """
+
+    def __init__(self, max_rounds: int = 8):
+        self.max_rounds: int = max_rounds
+
+        self._queue: list[Event] = []
+        self._handlers: dict[type, list[Callable]] = defaultdict(list)
+
+        # Stats per event type
+        self.event_counts: dict[type, int] = defaultdict(int)
+        self.handler_times: dict[type, float] = defaultdict(float)
+
+    # Subscriptions
+    def subscribe(self, event_type: type, fn: Callable) -> None:
+        self._handlers[event_type].append(fn)
+
+    def unsubscribe(self, event_type: type, fn: Callable) -> None:
+        self._handlers[event_type].remove(fn)
+
+    def publish(self, event: Event) -> None:
+        self._queue.append(event)
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def dispatch(self) -> None:
+        """Delivers the queued events grouped by type"""
+        if not self._queue:
+            return
+
+        TRACER.begin("EventBus.dispatch")
+        rounds = 0
+        while self._queue and rounds < self.max_rounds:
+            queue, self._queue = self._queue, []
+            rounds += 1
+
+            events_by_type: dict[type, list[Event]] = {}
+            for event in queue:
+                events_by_type.setdefault(type(event), []).append(event)
+
+            for event_type, events in events_by_type.items():
+                self.event_counts[event_type] += len(events)
+
+                TRACER.begin(event_type.__name__)
+                start = time.perf_counter()
+                for handler in self._handlers.get(event_type, ()):
+                    handler(events)
+                self.handler_times[event_type] += time.perf_counter() - start
+                TRACER.end()
+        TRACER.end()
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        return {
+            event_type.__name__: {
+                "count": self.event_counts[event_type],
+                "time": self.handler_times[event_type],
+            }
+            for event_type in self.event_counts
+        }
+
+    def reset_stats(self) -> None:
+        self.event_counts.clear()
+        self.handler_times.clear()
@@ -0,0 +1,73 @@
+"""
+Event classes delivered by the Event Bus
+"""
+from .tile import Tile
+from .structure import Structure
+
+
+class Event:
+    """
+    Event base class
+    """
+
+    __slots__ = ()
+
+
+class StructuresChanged(Event):
+    """
+    Structures were placed or removed, tiles holds every tile that needs to be
+    redrawn including the neighbors of the changed ones
+    """
+
+    __slots__ = ("tiles", "placed_structures", "removed_structures")
+
+    def __init__(
+        self,
+        tiles: set[Tile],
+        placed_structures: list[Structure],
+        removed_structures: list[Structure],
+    ):
+        self.tiles: set[Tile] = tiles
+        self.placed_structures: list[Structure] = placed_structures
+        self.removed_structures: list[Structure] = removed_structures
+
+
+class JobCreated(Event):
+    """
+    A job was created
+    """
+
+    __slots__ = ("job",)
+
+    def __init__(self, job: "Job"):
+        self.job = job
+
+
+class JobCompleted(Event):
+    """
+    A job had all of its work done
+    """
+
+    __slots__ = ("job",)
+
+    def __init__(self, job: "Job"):
+        self.job = job
+
+
+class JobCancelled(Event):
+    """
+    A job was cancelled before it was completed
+    """
+
+    __slots__ = ("job",)
+
+    def __init__(self, job: "Job"):
+        self.job = job
+
+
+class WorldLoaded(Event):
+    """
+    The whole world was replaced, everything drawn from it has to be rebuilt
+    """
+
+    __slots__ = ()
@@ -0,0 +1,287 @@
+"""
+Flow field navigation for many characters heading to the same area
+"""
+from collections import OrderedDict
+from typing import Iterable
+import math
+
+import numpy as np
+
+from . import constants
+from .tile import Tile
+from .tile_grid import NEIGHBOR_OFFSETS
+from .pathfinding import Path, Pathfinder, shift_field
+
+NO_DIRECTION = -1
+
+
+class FlowField:
+    """
+    Flow Field class
+
+    Integration field holding the cost to the target area from every tile in
+    bounds, and a direction field pointing every tile at its cheapest neighbor.
+    """
+
+    def __init__(
+        self,
+        target_bounds: tuple[int, int, int, int],
+        bounds: tuple[int, int, int, int],
+        integration: np.ndarray,
+        directions: np.ndarray,
+    ):
+        self.target_bounds: tuple[int, int, int, int] = target_bounds
+        self.bounds: tuple[int, int, int, int] = bounds
+        self.integration: np.ndarray = integration
+        self.directions: np.ndarray = directions
+        # A structure changed inside bounds since the field was built
+        self.stale: bool = False
+
+    def contains(self, x: int, y: int) -> bool:
+        x0, y0, x1, y1 = self.bounds
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    def in_target(self, x: int, y: int) -> bool:
+        x0, y0, x1, y1 = self.target_bounds
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    def overlaps(self, positions: Iterable[tuple[int, int]]) -> bool:
+        return any(self.contains(x, y) for x, y in positions)
+
+    def cost_at(self, x: int, y: int) -> float:
+        if not self.contains(x, y):
+            return math.inf
+        return float(self.integration[x - self.bounds[0], y - self.bounds[1]])
+
+    def next_position(self, x: int, y: int) -> tuple[int, int] | None:
+        if not self.contains(x, y):
+            return None
+        direction = self.directions[x - self.bounds[0], y - self.bounds[1]]
+        if direction == NO_DIRECTION:
+            return None
+        dx, dy = NEIGHBOR_OFFSETS[direction]
+        return x + dx, y + dy
+
+
+class FlowFieldPath(Path):
+    """
+    Flow Field Path class
+
+    Follows a flow field until the target area. The path ends there, or
+    where a stale field stops leading anywhere, and the character asks for
+    the rest of the way like any lost character, within the path budget of
+    the tick.
+    """
+
+    def __init__(
+        self,
+        flow_field: FlowField,
+        pathfinder: Pathfinder,
+        start: tuple[int, int],
+    ):
+        super().__init__([])
+        self.flow_field: FlowField = flow_field
+        self.pathfinder: Pathfinder = pathfinder
+        self._position: tuple[int, int] = start
+        self._following: bool = True
+
+    def __len__(self) -> int:
+        return 1 if self._following else 0
+
+    def __bool__(self) -> bool:
+        return self._following
+
+    def next_tile(self) -> Tile | None:
+        if not self._following:
+            return None
+        if self.flow_field.in_target(*self._position):
+            self._following = False
+            return None
+
+        position = self.flow_field.next_position(*self._position)
+        # Stale fields may point into structures built since
+        if position is None or not self.pathfinder.is_walkable(*position):
+            self._following = False
+            return None
+        self._position = position
+        return Tile(*position)
+
+
+class FlowFieldService:
+    """
+    Flow Field Service class
+
+    Builds flow fields toward square target areas of the world once the area
+    has been asked for by enough characters, and keeps the most recently used
+    ones up to capacity. A structure change inside a field's bounds marks it
+    stale, stale fields are still followed until drop_stale is called so a
+    busy build site is not rebuilt every tick.
+    """
+
+    def __init__(
+        self,
+        pathfinder: Pathfinder,
+        capacity: int = constants.FLOW_FIELD_CACHE_SIZE,
+        area_size: int = constants.FLOW_FIELD_AREA_SIZE,
+        radius: int = constants.FLOW_FIELD_RADIUS,
+        min_requests: int = constants.FLOW_FIELD_MIN_REQUESTS,
+    ):
+        self.pathfinder: Pathfinder = pathfinder
+        self.grid = pathfinder.grid
+        self.capacity: int = capacity
+        self.area_size: int = area_size
+        self.radius: int = radius
+        self.min_requests: int = min_requests
+
+        self._fields: OrderedDict[tuple[int, int], FlowField] = OrderedDict()
+        self._requests: dict[tuple[int, int], int] = {}
+
+        self.fields_built: int = 0
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def area_of(self, position: tuple[int, int]) -> tuple[int, int]:
+        return position[0] // self.area_size, position[1] // self.area_size
+
+    def find_path(self, start: Tile, goal: Tile) -> Path | None:
+        """
+        Returns a flow field path when the goal's area is in demand, the
+        start is inside the field and can take a step along it and the goal
+        connects to the tiles the field leads to, None means the caller
+        should search
+        """
+        area = self.area_of(goal.position)
+        self._requests[area] = self._requests.get(area, 0) + 1
+        if area not in self._fields and self._requests[area] < self.min_requests:
+            return None
+
+        flow_field = self.get(area)
+        if flow_field.in_target(*start.position):
+            return None
+        if flow_field.cost_at(*start.position) == math.inf:
+            return None
+        position = flow_field.next_position(*start.position)
+        if position is None or not self.pathfinder.is_walkable(*position):
+            return None
+        if not self.leaves_target(flow_field, goal.position):
+            return None
+        return FlowFieldPath(flow_field, self.pathfinder, start.position)
+
+    def leaves_target(self, flow_field: FlowField, goal: tuple[int, int]) -> bool:
+        """
+        Whether the goal connects to a tile around the target area that the
+        field reaches, a flood over the target area and its border only so a
+        goal walled in inside the area is not walked to
+        """
+        x0, y0, x1, y1 = flow_field.target_bounds
+        # The border around the target area, clamped to the world
+        border_x0, border_y0 = max(x0 - 1, 0), max(y0 - 1, 0)
+        border_x1 = min(x1 + 1, self.grid.width - 1)
+        border_y1 = min(y1 + 1, self.grid.height - 1)
+        costs = self.grid.get_movement_costs(
+            border_x0, border_y0, border_x1, border_y1
+        ).tolist()
+
+        # Diagonal steps may not cut corners, so four neighbors are enough
+        stack = [goal]
+        seen = {goal}
+        while stack:
+            x, y = stack.pop()
+            for dx, dy in NEIGHBOR_OFFSETS[:4]:
+                neighbor_x, neighbor_y = x + dx, y + dy
+                if (
+                    (neighbor_x, neighbor_y) in seen
+                    or not border_x0 <= neighbor_x <= border_x1
+                    or not border_y0 <= neighbor_y <= border_y1
+                    or costs[neighbor_x - border_x0][neighbor_y - border_y0]
+                    == math.inf
+                ):
+                    continue
+                if not flow_field.in_target(neighbor_x, neighbor_y):
+                    if flow_field.cost_at(neighbor_x, neighbor_y) != math.inf:
+                        return True
+                    continue
+                seen.add((neighbor_x, neighbor_y))
+                stack.append((neighbor_x, neighbor_y))
+        return False
+
+    def get(self, area: tuple[int, int]) -> FlowField:
+        if area in self._fields:
+            self._fields.move_to_end(area)
+            return self._fields[area]
+
+        flow_field = self.build(area)
+        self._fields[area] = flow_field
+        while len(self._fields) > self.capacity:
+            self._fields.popitem(last=False)
+        return flow_field
+
+    def build(self, area: tuple[int, int]) -> FlowField:
+        area_x, area_y = area
+        target_bounds = (
+            area_x * self.area_size,
+            area_y * self.area_size,
+            min((area_x + 1) * self.area_size, self.grid.width) - 1,
+            min((area_y + 1) * self.area_size, self.grid.height) - 1,
+        )
+        bounds = (
+            max(target_bounds[0] - self.radius, 0),
+            max(target_bounds[1] - self.radius, 0),
+            min(target_bounds[2] + self.radius, self.grid.width - 1),
+            min(target_bounds[3] + self.radius, self.grid.height - 1),
+        )
+        # Only passable tiles are sources, a wall would pull its neighbors in
+        target_costs = self.grid.get_movement_costs(*target_bounds)
+        targets = [
+            (target_bounds[0] + x, target_bounds[1] + y)
+            for x, y in zip(*np.nonzero(np.isfinite(target_costs)))
+        ]
+        integration = self.pathfinder.integration_field(targets, bounds)
+        directions = self._directions(integration)
+
+        self.fields_built += 1
+        return FlowField(target_bounds, bounds, integration, directions)
+
+    def invalidate(self, positions: Iterable[tuple[int, int]]) -> None:
+        positions = list(positions)
+        for area, flow_field in list(self._fields.items()):
+            if flow_field.overlaps(positions):
+                flow_field.stale = True
+
+    def drop_stale(self) -> None:
+        for area, flow_field in list(self._fields.items()):
+            if flow_field.stale:
+                del self._fields[area]
+
+    def clear(self) -> None:
+        self._fields.clear()
+        self._requests.clear()
+
+    def decay_requests(self) -> None:
+        """Halves the request counts so only recent demand builds fields"""
+        self._requests = {
+            area: count // 2 for area, count in self._requests.items() if count > 1
+        }
+
+    @staticmethod
+    def _directions(integration: np.ndarray) -> np.ndarray:
+        """Points every tile at the neighbor with the lowest integration cost"""
+        walkable = np.isfinite(integration)
+        neighbor_costs = []
+        for dx, dy in NEIGHBOR_OFFSETS:
+            # Cost at [x + dx, y + dy]
+            cost = shift_field(integration, -dx, -dy, math.inf)
+            if dx and dy:
+                # Do not cut corners of walls
+                allowed = shift_field(walkable, -dx, 0, False) & shift_field(
+                    walkable, 0, -dy, False
+                )
+                cost = np.where(allowed, cost, math.inf)
+            neighbor_costs.append(cost)
+
+        neighbor_costs = np.stack(neighbor_costs)
+        directions = np.argmin(neighbor_costs, axis=0).astype(np.int8)
+        best = np.min(neighbor_costs, axis=0)
+        directions[~(best < integration)] = NO_DIRECTION
+        return directions
@@ -0,0 +1,73 @@
+"""
+Frame Profiler class for rolling per subsystem frame times
+"""
+import numpy as np
+
+from . import constants
+
+# Name of the whole frame in the profiler
+FRAME = "frame"
+
+
+class FrameProfiler:
+    """
+    Frame Profiler class
+
+    Collects the seconds spent in each named subsystem during a frame and
+    keeps the last history frames of each in a ring buffer. Percentiles are
+    only computed when asked for, recording a time is a dict update.
+    """
+
+    def __init__(self, history: int = constants.PROFILER_HISTORY):
+        self.history: int = history
+        self.frames: int = 0
+        # Subsystem -> seconds of the last history frames
+        self.times: dict[str, np.ndarray] = {}
+        self.current: dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def end_frame(self, seconds: float | None = None) -> None:
+        """
+        Stores the times of the frame, seconds is the time of the whole frame
+        and defaults to the sum of its subsystems
+        """
+        if seconds is None:
+            seconds = sum(self.current.values())
+        # The whole frame comes first in the stats
+        self.current = {FRAME: seconds, **self.current}
+
+        index = self.frames % self.history
+        for name in self.current:
+            if name not in self.times:
+                self.times[name] = np.zeros(self.history)
+        for name, times in self.times.items():
+            times[index] = self.current.get(name, 0.0)
+
+        self.frames += 1
+        self.current = {}
+
+    def reset(self) -> None:
+        self.frames = 0
+        self.times.clear()
+        self.current.clear()
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """Returns the mean, p50, p95, p99 and max in milliseconds"""
+        count = min(self.frames, self.history)
+        if not count:
+            return {}
+
+        stats = {}
+        for name, times in self.times.items():
+            milliseconds = times[:count] * 1000
+            p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99]).tolist()
+            stats[name] = {
+                "mean_ms": float(milliseconds.mean()),
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "max_ms": float(milliseconds.max()),
+            }
+        return stats
@@ -1,6 +1,9 @@
 """
 Game
 """
+from itertools import chain
+from time import perf_counter
+
 import pyglet
 
 from .game_window import GameWindow
@@ -12,6 +15,11 @@ from .world_manager import WorldManager
 from .sound_manager import SoundManager
 from .sprite_manager import SpriteManager
 from .build_mode_manager import BuildModeManager
+from .replay import Replay, ReplayRunner
+from .frame_profiler import FrameProfiler
+from .tracer import TRACER
+from .memory_tracker import MemoryTracker, estimate_bytes
+from . import constants
 
 
 class Game:
@@ -19,8 +27,12 @@ class Game:
     Game
     """
 
-    def __init__(self):
+    def __init__(self, record_path: str | None = None, replay_path: str | None = None):
         self.window = GameWindow()
+        self.profiler: FrameProfiler = FrameProfiler()
+        self.memory_tracker: MemoryTracker = MemoryTracker()
+        # When the last frame started, a frame lasts until the next one starts
+        self.frame_start: float | None = None
         self.background_manager: BackgroundManager = BackgroundManager()
         self.input_manager: InputManager = InputManager()
         self.world_manager: WorldManager = WorldManager()
@@ -40,9 +52,25 @@ class Game:
             self.sprite_manager,
             self.build_mode_manager,
         ]
+        self.manager_names: list[str] = [
+            type(manager).__name__ for manager in self.managers
+        ]
 
         self.initialize_managers()
         self.register_push_handlers()
+        self.register_memory_categories()
+        if constants.MEMORY_TRACING:
+            self.memory_tracker.start_tracing()
+
+        # Frames of the replay fed back instead of the live input
+        self.replay: Replay | None = None
+        self.replay_frame: int = 0
+        self.frame_times: list[float] = []
+        if replay_path:
+            self.replay = Replay(replay_path)
+            self.world_manager.start_replay(self.replay)
+        elif record_path:
+            self.world_manager.start_recording(record_path)
 
     def initialize_managers(self):
         self.window.init(
@@ -51,14 +79,22 @@ class Game:
             self.camera_manager,
             self.sprite_manager,
             self.gui_manager,
+            self.profiler,
         )
         self.background_manager.init()
         self.input_manager.init()
         self.world_manager.init()
         self.camera_manager.init(self.input_manager, self.window)
-        self.gui_manager.init(self.window, self.input_manager)
+        self.gui_manager.init(
+            self.window,
+            self.input_manager,
+            self.world_manager,
+            self.camera_manager,
+            self.profiler,
+            self.memory_tracker,
+        )
         self.sound_manager.init(self.world_manager)
-        self.sprite_manager.init(self.world_manager)
+        self.sprite_manager.init(self.world_manager, self.camera_manager)
         self.build_mode_manager.init(
             self.input_manager,
             self.camera_manager,
@@ -72,16 +108,109 @@ class Game:
             self.window.push_handlers(manager.keys)
             self.window.push_handlers(manager.mouse_buttons)
 
+    def register_memory_categories(self) -> None:
+        self.memory_tracker.register_world(self.world_manager.world)
+        self.memory_tracker.register("sprites", self.sprite_manager.measure_sprites)
+        self.memory_tracker.register("tilemap", self.sprite_manager.tilemap.measure)
+        self.memory_tracker.register("lod", self.sprite_manager.lod.measure)
+        if self.sprite_manager.chunk_cache is not None:
+            self.memory_tracker.register(
+                "chunk cache", self.sprite_manager.chunk_cache.measure
+            )
+        highlights = self.build_mode_manager.highligted_tiles
+        self.memory_tracker.register(
+            "highlights",
+            lambda: (len(highlights), estimate_bytes(list(highlights.values()))),
+        )
+        self.memory_tracker.register("textures", self.sprite_manager.measure_textures)
+
+    def get_input_state(self) -> dict:
+        """Returns the input the managers are about to see this frame"""
+        return {
+            "mouse": list(self.input_manager.mouse.position),
+            "scroll": list(self.input_manager.mouse.scroll),
+            "keys": sorted(symbol for symbol, down in self.window.keys.items() if down),
+            "buttons": sorted(
+                button for button, down in self.window.mouse_buttons.items() if down
+            ),
+            "build_mode": self.build_mode_manager.build_mode_type,
+            "window": [self.window.width, self.window.height],
+        }
+
+    def set_input_state(self, state: dict) -> None:
+        """Overrides the live input with a recorded one"""
+        self.input_manager.mouse.position = state["mouse"]
+        self.input_manager.mouse.scroll = state["scroll"]
+
+        keys = dict.fromkeys(state["keys"], True)
+        buttons = dict.fromkeys(state["buttons"], True)
+        for manager in chain([self.window], self.managers):
+            manager.keys.clear()
+            manager.keys.update(keys)
+            manager.mouse_buttons.clear()
+            manager.mouse_buttons.update(buttons)
+
+        self.build_mode_manager.build_mode_type = state["build_mode"]
+        if state["window"] != [self.window.width, self.window.height]:
+            self.window.set_size(*state["window"])
+
+    def finish_replay(self) -> None:
+        world_manager = self.world_manager
+        report = self.replay.report(
+            world_manager.world,
+            world_manager.simulation.ticks,
+            sum(self.frame_times),
+            self.frame_times,
+        )
+        print(ReplayRunner.format_report(report))
+        pyglet.app.exit()
+
     # Pyglet Window Methods
     def update(self, dt: float):
+        frame_start = perf_counter()
+        if self.frame_start is not None:
+            self.profiler.end_frame(frame_start - self.frame_start)
+            TRACER.check_frame(frame_start - self.frame_start)
+            spike = self.memory_tracker.end_frame()
+            if spike:
+                print(
+                    f"Frame {spike['frame']} allocated "
+                    f"{spike['allocated'] / 1024:.1f} KiB"
+                )
+        self.frame_start = frame_start
+
+        recorder = self.world_manager.recorder
+        if self.replay:
+            if self.replay_frame == len(self.replay.frames):
+                self.finish_replay()
+                return
+            frame = self.replay.frames[self.replay_frame]
+            self.replay_frame += 1
+            dt = frame["dt"]
+            self.set_input_state(frame["input"])
+        elif recorder:
+            input_state = self.get_input_state()
+
+        TRACER.begin("Game.update")
+        start = perf_counter()
         self.window.update(dt)
 
-        for manager in self.managers:
+        for manager, name in zip(self.managers, self.manager_names):
+            TRACER.begin(name)
+            manager_start = perf_counter()
             manager.update(dt)
+            self.profiler.record(name, perf_counter() - manager_start)
+            TRACER.end()
+        if self.replay:
+            self.frame_times.append(perf_counter() - start)
+
+        if recorder:
+            recorder.record_frame(dt, self.world_manager.simulation.ticks, input_state)
 
         # Reset the mouse scroll
         # TODO: There might be a better place for this
         self.input_manager.mouse.scroll = 0, 0
+        TRACER.end()
 
         # DEBUG
         # if self.world_manager.world.jobs:
@@ -1,6 +1,8 @@
 """
 Game Window
 """
+from time import perf_counter
+
 import pyglet
 from pyglet.window import key, mouse
 
@@ -10,6 +12,8 @@ from .camera_manager import CameraManager
 from .input_manager import InputManager
 from .gui_manager import GUIManager
 from .sprite_manager import SpriteManager
+from .frame_profiler import FrameProfiler
+from .tracer import TRACER
 
 
 class GameWindow(pyglet.window.Window):
@@ -33,12 +37,14 @@ class GameWindow(pyglet.window.Window):
         camera_manager: CameraManager,
         sprite_manager: SpriteManager,
         gui_manager: GUIManager,
+        profiler: FrameProfiler,
     ) -> None:
         self.background_manager: BackgroundManager = background_manager
         self.input_manager: InputManager = input_manager
         self.camera_manager: CameraManager = camera_manager
         self.sprite_manager: SpriteManager = sprite_manager
         self.gui_manager: GUIManager = gui_manager
+        self.profiler: FrameProfiler = profiler
         self.keys = key.KeyStateHandler()
         self.mouse_buttons = mouse.MouseStateHandler()
         self.register_push_handlers()
@@ -52,18 +58,28 @@ class GameWindow(pyglet.window.Window):
         pass
 
     def on_draw(self):
+        TRACER.begin("GameWindow.on_draw")
+        start = perf_counter()
         self.clear()
 
         with self.camera_manager.background_camera:
             self.background_manager.batch.draw()
+        background_drawn = perf_counter()
 
         with self.camera_manager.camera:
-            self.sprite_manager.batch.draw()
+            self.sprite_manager.draw()
+        sprites_drawn = perf_counter()
 
         with self.camera_manager.gui_camera:
             self.gui_manager.batch.draw()
 
         self.gui_manager.fps_display.draw()
+        gui_drawn = perf_counter()
+
+        self.profiler.record("draw background", background_drawn - start)
+        self.profiler.record("draw sprites", sprites_drawn - background_drawn)
+        self.profiler.record("draw gui", gui_drawn - sprites_drawn)
+        TRACER.end()
 
     # TODO: move to input manager
     def on_key_press(self, symbol, modifiers):
@@ -17,6 +17,12 @@ from .tile import Tile
 from .structure import Structure
 from .job import Job
 from .manager import Manager
+from .frame_profiler import FrameProfiler
+from .memory_tracker import MemoryTracker
+from .profiler_overlay import ProfilerOverlay
+from .tracer import TRACER
+from .tile_colors import TileColors
+from .minimap import Minimap
 
 
 class GUIManager(Manager):
@@ -27,15 +33,46 @@ class GUIManager(Manager):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def init(self, window: pyglet.window.Window, input_manager: InputManager) -> None:
+    def init(
+        self,
+        window: pyglet.window.Window,
+        input_manager: InputManager,
+        world_manager: WorldManager,
+        camera_manager: CameraManager,
+        profiler: FrameProfiler,
+        memory_tracker: MemoryTracker,
+    ) -> None:
         self.window: pyglet.window.Window = window
         self.input_manager: InputManager = input_manager
         self.fps_display = pyglet.window.FPSDisplay(self.window)
         self.batch = pyglet.graphics.Batch()
         self.tile_label = pyglet.text.Label("(0, 0)", x=10, y=50, batch=self.batch)
 
+        # F3 shows the frame times of every manager and draw and the memory
+        self.profiler_overlay = ProfilerOverlay(
+            profiler, memory_tracker, self.batch, 10, self.window.height - 20
+        )
+        # M hides the minimap
+        world = world_manager.world
+        self.minimap = Minimap(
+            world,
+            camera_manager.camera,
+            TileColors(world, resources.structure_colors),
+            self.batch,
+            self.window.width - constants.MINIMAP_SIZE - 10,
+            self.window.height - constants.MINIMAP_SIZE - 10,
+        )
+
     def set_tile_info(self, text: str) -> None:
         self.tile_label.text = text
 
     def update(self, dt) -> None:
-        pass
+        if self.is_key_pressed(key.F3):
+            self.profiler_overlay.toggle()
+        if self.is_key_pressed(key.F4) and TRACER.enabled:
+            print(f"Trace written to {TRACER.export()}")
+        if self.is_key_pressed(key.M):
+            self.minimap.toggle()
+
+        self.profiler_overlay.update(dt)
+        self.minimap.update(dt)
@@ -0,0 +1,111 @@
+"""
+Headless runner that steps the world without a window, graphics or audio
+"""
+from time import perf_counter
+
+from .scenario import Scenario
+from .simulation import Simulation
+from .frame_profiler import FrameProfiler
+from .memory_tracker import MemoryTracker
+
+
+class HeadlessRunner:
+    """
+    Headless Runner class
+
+    Builds the world of a scenario and runs simulation ticks back to back as
+    fast as they go, timing the whole run and every part of the world update.
+    Every tick also goes through a FrameProfiler for the percentiles of the
+    tick times, and through a MemoryTracker when tracing memory.
+    """
+
+    def __init__(self, scenario: Scenario, trace_memory: bool = False):
+        self.scenario: Scenario = scenario
+        self.world = scenario.build()
+        self.simulation: Simulation = Simulation(self.world)
+        self.profiler: FrameProfiler = FrameProfiler()
+        self.memory_tracker: MemoryTracker = MemoryTracker()
+        self.memory_tracker.register_world(self.world)
+        self.trace_memory: bool = trace_memory
+
+    def run(self, ticks: int) -> dict:
+        self.world.reset_timings()
+        self.world.events.reset_stats()
+        self.profiler.reset()
+        timings = self.world.timings
+        if self.trace_memory:
+            self.memory_tracker.start_tracing()
+
+        start = perf_counter()
+        for _ in range(ticks):
+            before = dict(timings)
+            tick_start = perf_counter()
+            self.simulation.step()
+            tick_seconds = perf_counter() - tick_start
+            for subsystem, time in timings.items():
+                self.profiler.record(subsystem, time - before[subsystem])
+            self.profiler.end_frame(tick_seconds)
+            self.memory_tracker.end_frame()
+        seconds = perf_counter() - start
+
+        memory = self.memory_tracker.get_report()
+        if self.trace_memory:
+            self.memory_tracker.stop_tracing()
+
+        return {
+            "ticks": ticks,
+            "seconds": seconds,
+            "ticks_per_second": ticks / seconds if seconds else 0.0,
+            # How many times faster than real time the world ran
+            "realtime_factor": (
+                ticks * self.simulation.step_dt / seconds if seconds else 0.0
+            ),
+            "characters": len(self.world.characters),
+            "jobs_remaining": len(self.world.jobs),
+            "subsystems": {
+                subsystem: {
+                    "seconds": time,
+                    "ms_per_tick": time * 1000 / ticks if ticks else 0.0,
+                }
+                for subsystem, time in self.world.timings.items()
+            },
+            "events": self.world.events.get_stats(),
+            # The whole tick is the "frame" of the profiler
+            "percentiles": self.profiler.get_stats(),
+            "memory": memory,
+        }
+
+    @staticmethod
+    def format_report(report: dict) -> str:
+        lines = [
+            f"{report['ticks']} ticks in {report['seconds']:.3f} s",
+            f"{report['ticks_per_second']:.1f} ticks/s, "
+            f"{report['realtime_factor']:.1f}x real time",
+            f"{report['characters']} characters, "
+            f"{report['jobs_remaining']} jobs remaining",
+            "",
+            f"{'subsystem':<24}{'seconds':>10}{'ms/tick':>10}",
+        ]
+        for subsystem, timing in report["subsystems"].items():
+            lines.append(
+                f"{subsystem:<24}{timing['seconds']:>10.3f}"
+                f"{timing['ms_per_tick']:>10.3f}"
+            )
+        for event_type, stats in report["events"].items():
+            lines.append(
+                f"{'  ' + event_type:<24}{stats['time']:>10.3f}"
+                f"{'':>10}  {stats['count']} events"
+            )
+
+        lines.append("")
+        lines.append(f"{'ms':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for name, stats in report["percentiles"].items():
+            lines.append(
+                f"{'tick' if name == 'frame' else name:<24}"
+                f"{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+                f"{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}"
+            )
+
+        lines.append("")
+        lines.append(MemoryTracker.format_report(report["memory"]))
+        return "\n".join(lines)
@@ -0,0 +1,324 @@
+"""
+Hierarchical pathfinding (HPA*) over world chunks
+"""
+from collections import deque
+from typing import Iterable
+import heapq
+import math
+
+import numpy as np
+
+from . import constants
+from .tile import Tile
+from .tile_grid import TileGrid
+from .pathfinding import Path, Pathfinder, octile_distance
+
+# Border segments up to this length get a single entrance in their middle,
+# longer ones get one at each end
+MAX_SINGLE_ENTRANCE_LENGTH = 6
+
+
+class HierarchicalPath(Path):
+    """
+    Hierarchical Path class
+
+    Holds the abstract waypoints of a path and refines them to tiles one
+    segment at a time as the character walks it, so only the chunk the
+    character is in is searched at full resolution.
+    """
+
+    def __init__(
+        self,
+        hierarchical_pathfinder: "HierarchicalPathfinder",
+        waypoints: list[tuple[int, int]],
+    ):
+        super().__init__([])
+        self.hierarchical_pathfinder = hierarchical_pathfinder
+        self.waypoints: deque[tuple[int, int]] = deque(waypoints[1:])
+        self._refined_to: tuple[int, int] = waypoints[0]
+        self._refine()
+
+    def __len__(self) -> int:
+        return len(self.positions) + len(self.waypoints)
+
+    def __bool__(self) -> bool:
+        return bool(self.positions or self.waypoints)
+
+    def next_tile(self) -> Tile | None:
+        self._refine()
+        return super().next_tile()
+
+    def crosses(self, positions: set[tuple[int, int]]) -> bool:
+        return super().crosses(positions) or not positions.isdisjoint(self.waypoints)
+
+    def _refine(self) -> None:
+        while not self.positions and self.waypoints:
+            waypoint = self.waypoints.popleft()
+            positions = self.hierarchical_pathfinder.refine(self._refined_to, waypoint)
+            if positions is None:
+                # Blocked since the path was found, the character asks again
+                self.waypoints.clear()
+                return
+            self.positions.extend(positions[1:])
+            self._refined_to = waypoint
+
+
+class HierarchicalPathfinder:
+    """
+    Hierarchical Pathfinder class
+
+    Builds an abstract graph whose nodes are the entrances between adjacent
+    chunks. Each chunk's part of the graph is built the first time a search
+    reaches it and is rebuilt only when a structure changes in it or next to
+    it. Short routes are handed to the grid Pathfinder.
+    """
+
+    def __init__(
+        self,
+        grid: TileGrid,
+        min_distance: int = constants.HIERARCHICAL_PATHFINDING_MIN_DISTANCE,
+        max_expanded_nodes: int = constants.PATHFINDING_MAX_EXPANDED_NODES,
+    ):
+        self.grid: TileGrid = grid
+        self.chunk_size: int = grid.chunk_size
+        self.min_distance: int = min_distance
+        self.max_expanded_nodes: int = max_expanded_nodes
+
+        self.grid_pathfinder: Pathfinder = Pathfinder(grid)
+
+        # (chunk_x, chunk_y, side) -> entrance pairs across the east or north side
+        self._entrances: dict[tuple[int, int, str], list] = {}
+        # (chunk_x, chunk_y) -> node -> [(node, cost)]
+        self._chunk_graphs: dict[tuple[int, int], dict] = {}
+
+    @property
+    def cache_hits(self) -> int:
+        return self.grid_pathfinder.cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self.grid_pathfinder.cache_misses
+
+    def find_path(self, start: Tile, goal: Tile) -> Path | None:
+        start_position = start.position
+        goal_position = goal.position
+
+        if (
+            octile_distance(start_position, goal_position) < self.min_distance
+            or self._chunk_of(start_position) == self._chunk_of(goal_position)
+        ):
+            return self.grid_pathfinder.find_path(start, goal)
+
+        waypoints = self.search(start_position, goal_position)
+        if waypoints is None:
+            return None
+        return HierarchicalPath(self, waypoints)
+
+    def invalidate(self, positions: Iterable[tuple[int, int]]) -> None:
+        positions = list(positions)
+        self.grid_pathfinder.invalidate(positions)
+
+        for chunk_x, chunk_y in {self._chunk_of(position) for position in positions}:
+            for side in ("e", "n"):
+                self._entrances.pop((chunk_x, chunk_y, side), None)
+            self._entrances.pop((chunk_x - 1, chunk_y, "e"), None)
+            self._entrances.pop((chunk_x, chunk_y - 1, "n"), None)
+
+            for dx, dy in ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)):
+                self._chunk_graphs.pop((chunk_x + dx, chunk_y + dy), None)
+
+    def clear(self) -> None:
+        self.grid_pathfinder.clear()
+        self._entrances.clear()
+        self._chunk_graphs.clear()
+
+    def search(
+        self, start: tuple[int, int], goal: tuple[int, int]
+    ) -> list[tuple[int, int]] | None:
+        """A* over the abstract graph, returns the waypoints from start to goal"""
+        start_chunk = self._chunk_of(start)
+        goal_chunk = self._chunk_of(goal)
+
+        start_edges = self.grid_pathfinder.distances(
+            start, self._chunk_graph(*start_chunk), self._chunk_bounds(*start_chunk)
+        )
+        # Costs are close enough to symmetric to search out from the goal
+        goal_edges = self.grid_pathfinder.distances(
+            goal, self._chunk_graph(*goal_chunk), self._chunk_bounds(*goal_chunk)
+        )
+        if not start_edges or not goal_edges:
+            return None
+
+        open_heap = []
+        came_from: dict[tuple[int, int], tuple[int, int]] = {}
+        costs: dict[tuple[int, int], float] = {}
+        for node, cost in start_edges.items():
+            costs[node] = cost
+            came_from[node] = start
+            heapq.heappush(open_heap, (cost + octile_distance(node, goal), cost, node))
+
+        best_cost = math.inf
+        best_node = None
+        expanded = 0
+
+        while open_heap:
+            priority, cost, node = heapq.heappop(open_heap)
+            if priority >= best_cost:
+                break
+            if cost > costs[node]:
+                continue
+
+            expanded += 1
+            if expanded > self.max_expanded_nodes:
+                return None
+
+            if node in goal_edges and cost + goal_edges[node] < best_cost:
+                best_cost = cost + goal_edges[node]
+                best_node = node
+
+            for neighbor, edge_cost in self._chunk_graph(*self._chunk_of(node)).get(
+                node, ()
+            ):
+                new_cost = cost + edge_cost
+                if new_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = new_cost
+                    came_from[neighbor] = node
+                    priority = new_cost + octile_distance(neighbor, goal)
+                    heapq.heappush(open_heap, (priority, new_cost, neighbor))
+
+        if best_node is None:
+            return None
+
+        waypoints = [goal, best_node]
+        while waypoints[-1] != start:
+            waypoints.append(came_from[waypoints[-1]])
+        waypoints.reverse()
+        return waypoints
+
+    def refine(
+        self, start: tuple[int, int], goal: tuple[int, int]
+    ) -> list[tuple[int, int]] | None:
+        """Full resolution path between two waypoints of an abstract path"""
+        start_x0, start_y0, start_x1, start_y1 = self._chunk_bounds(
+            *self._chunk_of(start)
+        )
+        goal_x0, goal_y0, goal_x1, goal_y1 = self._chunk_bounds(*self._chunk_of(goal))
+        bounds = (
+            min(start_x0, goal_x0),
+            min(start_y0, goal_y0),
+            max(start_x1, goal_x1),
+            max(start_y1, goal_y1),
+        )
+        return self.grid_pathfinder.search(start, goal, bounds)
+
+    # Abstract graph
+    def _chunk_of(self, position: tuple[int, int]) -> tuple[int, int]:
+        return self.grid.chunk_position_at(*position)
+
+    def _chunk_bounds(self, chunk_x: int, chunk_y: int) -> tuple[int, int, int, int]:
+        x0 = chunk_x * self.chunk_size
+        y0 = chunk_y * self.chunk_size
+        return (
+            x0,
+            y0,
+            min(x0 + self.chunk_size, self.grid.width) - 1,
+            min(y0 + self.chunk_size, self.grid.height) - 1,
+        )
+
+    def _get_entrances(self, chunk_x: int, chunk_y: int, side: str) -> list:
+        """
+        Returns the (inside, outside) position pairs where the east or north
+        side of a chunk can be crossed
+        """
+        key = (chunk_x, chunk_y, side)
+        if key not in self._entrances:
+            self._entrances[key] = self._find_entrances(chunk_x, chunk_y, side)
+        return self._entrances[key]
+
+    def _find_entrances(self, chunk_x: int, chunk_y: int, side: str) -> list:
+        x0, y0, x1, y1 = self._chunk_bounds(chunk_x, chunk_y)
+        if side == "e":
+            if x1 + 1 >= self.grid.width:
+                return []
+            costs = self.grid.get_movement_costs(x1, y0, x1 + 1, y1)
+            walkable = np.isfinite(costs).all(axis=0)
+            positions = [((x1, y), (x1 + 1, y)) for y in range(y0, y1 + 1)]
+        else:
+            if y1 + 1 >= self.grid.height:
+                return []
+            costs = self.grid.get_movement_costs(x0, y1, x1, y1 + 1)
+            walkable = np.isfinite(costs).all(axis=1)
+            positions = [((x, y1), (x, y1 + 1)) for x in range(x0, x1 + 1)]
+
+        entrances = []
+        segment_start = None
+        for i, is_walkable in enumerate(list(walkable) + [False]):
+            if is_walkable and segment_start is None:
+                segment_start = i
+            elif not is_walkable and segment_start is not None:
+                segment_end = i - 1
+                if segment_end - segment_start + 1 <= MAX_SINGLE_ENTRANCE_LENGTH:
+                    entrances.append(positions[(segment_start + segment_end) // 2])
+                else:
+                    entrances.append(positions[segment_start])
+                    entrances.append(positions[segment_end])
+                segment_start = None
+        return entrances
+
+    def _chunk_graph(self, chunk_x: int, chunk_y: int) -> dict:
+        """Returns the abstract graph edges leaving the nodes of a chunk"""
+        key = (chunk_x, chunk_y)
+        if key in self._chunk_graphs:
+            return self._chunk_graphs[key]
+
+        # node -> node on the other side of the border
+        crossings: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for inside, outside in self._get_entrances(chunk_x, chunk_y, "e"):
+            crossings.setdefault(inside, []).append(outside)
+        for inside, outside in self._get_entrances(chunk_x, chunk_y, "n"):
+            crossings.setdefault(inside, []).append(outside)
+        for outside, inside in self._get_entrances(chunk_x - 1, chunk_y, "e"):
+            crossings.setdefault(inside, []).append(outside)
+        for outside, inside in self._get_entrances(chunk_x, chunk_y - 1, "n"):
+            crossings.setdefault(inside, []).append(outside)
+
+        nodes = list(crossings)
+        bounds = self._chunk_bounds(chunk_x, chunk_y)
+        costs = self.grid.get_movement_costs(*bounds)
+        uniform_cost = float(costs.flat[0])
+        uniform = np.isfinite(uniform_cost) and (costs == uniform_cost).all()
+
+        if not uniform:
+            x0, y0, _, _ = bounds
+            fields = self.grid_pathfinder.distance_fields(nodes, bounds)
+
+        graph: dict[tuple[int, int], list] = {}
+        for i, node in enumerate(nodes):
+            if uniform:
+                # Every tile of the chunk costs the same, no search is needed
+                distances = {
+                    other: octile_distance(node, other) * uniform_cost
+                    for other in nodes
+                    if other != node
+                }
+            else:
+                distances = {
+                    other: float(fields[i, other[0] - x0, other[1] - y0])
+                    for other in nodes
+                    if other != node
+                    and fields[i, other[0] - x0, other[1] - y0] != math.inf
+                }
+
+            edges = list(distances.items())
+            for outside in crossings[node]:
+                edges.append(
+                    (
+                        outside,
+                        octile_distance(node, outside)
+                        * self.grid.get_movement_cost(*outside),
+                    )
+                )
+            graph[node] = edges
+
+        self._chunk_graphs[key] = graph
+        return graph
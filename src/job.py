@@ -3,6 +3,8 @@ Job class
 """
 from .tile import Tile
 from .structure import Structure
+from .event_bus import EventBus
+from .events import JobCompleted, JobCancelled
 
 
 class Job:
@@ -14,39 +16,39 @@ class Job:
         self,
         tile: Tile,
         blueprint: Structure,
+        events: EventBus,
+        id_: int = 0,
     ):
+        self.id: int = id_
         self.tile: Tile = tile
         self.blueprint: Structure = blueprint
         self.work_required = blueprint.build_time
         self.structure_type = blueprint.type_
+        self.events: EventBus = events
 
         self.work_remaining = self.work_required
+        self.completed: bool = False
+        self.cancelled: bool = False
 
-        self._on_job_created_callbacks = set()
-        self._on_job_completed_callbacks = set()
-
-    # Subscriptions
-    def subscribe_on_job_created(self, fn):
-        self._on_job_created_callbacks.add(fn)
-
-    def unsubscribe_on_job_created(self, fn):
-        self._on_job_created_callbacks.remove(fn)
-
-    def subscribe_on_job_completed(self, fn):
-        self._on_job_completed_callbacks.add(fn)
-
-    def unsubscribe_on_job_completed(self, fn):
-        self._on_job_completed_callbacks.remove(fn)
+    @property
+    def finished(self) -> bool:
+        return self.completed or self.cancelled
 
     def do_work(self, amount: float = 0) -> None:
+        if self.finished:
+            return
+
         self.work_remaining -= amount
         if self.work_remaining <= 0:
             self.complete_job()
 
     def complete_job(self) -> None:
-        for callback in self._on_job_completed_callbacks:
-            callback(self)
+        self.completed = True
+        self.events.publish(JobCompleted(self))
 
     def cancel_job(self) -> None:
-        for callback in self._on_job_completed_callbacks:
-            callback(self)
+        if self.finished:
+            return
+
+        self.cancelled = True
+        self.events.publish(JobCancelled(self))
@@ -0,0 +1,165 @@
+"""
+Job Board class for indexed job lookups
+"""
+from . import constants
+from .tile import Tile
+from .job import Job
+
+
+class JobBoard:
+    """
+    Job Board class
+
+    Keeps the jobs of the world indexed by tile and by structure type. Jobs
+    that no character has claimed are also kept in a spatial grid of
+    cell_size x cell_size cells for nearest job queries.
+    """
+
+    def __init__(self, cell_size: int = constants.JOB_BOARD_CELL_SIZE):
+        self.cell_size: int = cell_size
+
+        self.jobs_by_tile: dict[Tile, Job] = {}
+        self.jobs_by_type: dict[str, set[Job]] = {}
+        self.open_jobs_by_cell: dict[tuple[int, int], set[Job]] = {}
+        self.claimed_jobs: set[Job] = set()
+
+    def __len__(self) -> int:
+        return len(self.jobs_by_tile)
+
+    def __bool__(self) -> bool:
+        return bool(self.jobs_by_tile)
+
+    def __contains__(self, tile: Tile) -> bool:
+        return tile in self.jobs_by_tile
+
+    def __iter__(self):
+        return iter(list(self.jobs_by_tile.values()))
+
+    @property
+    def open_count(self) -> int:
+        return len(self.jobs_by_tile) - len(self.claimed_jobs)
+
+    def get(self, tile: Tile) -> Job | None:
+        return self.jobs_by_tile.get(tile)
+
+    def get_jobs_of_type(self, structure_type: str) -> set[Job]:
+        return self.jobs_by_type.get(structure_type, set())
+
+    def add(self, job: Job) -> None:
+        self.jobs_by_tile[job.tile] = job
+        self.jobs_by_type.setdefault(job.structure_type, set()).add(job)
+        self._add_open(job)
+
+    def remove(self, job: Job) -> None:
+        if self.jobs_by_tile.get(job.tile) is not job:
+            return
+
+        del self.jobs_by_tile[job.tile]
+        jobs_of_type = self.jobs_by_type[job.structure_type]
+        jobs_of_type.discard(job)
+        if not jobs_of_type:
+            del self.jobs_by_type[job.structure_type]
+
+        if job in self.claimed_jobs:
+            self.claimed_jobs.discard(job)
+        else:
+            self._remove_open(job)
+
+    def cancel(self, tile: Tile) -> Job | None:
+        job = self.jobs_by_tile.get(tile)
+        if job:
+            self.remove(job)
+            job.cancel_job()
+        return job
+
+    def claim(self, job: Job) -> None:
+        if job in self.claimed_jobs:
+            return
+        self._remove_open(job)
+        self.claimed_jobs.add(job)
+
+    def release(self, job: Job) -> None:
+        """Puts a claimed job back on the board for other characters"""
+        if job not in self.claimed_jobs:
+            return
+        self.claimed_jobs.discard(job)
+        self._add_open(job)
+
+    def nearest_open(
+        self,
+        tile: Tile,
+        structure_type: str = "",
+        exclude: set[Job] | None = None,
+    ) -> Job | None:
+        """Returns the closest job no character has claimed"""
+        if not self.open_jobs_by_cell:
+            return None
+
+        cell_x, cell_y = self._cell_at(tile)
+        max_radius = max(
+            max(abs(x - cell_x), abs(y - cell_y)) for x, y in self.open_jobs_by_cell
+        )
+
+        best_job = None
+        best_distance = 0
+        for radius in range(max_radius + 1):
+            for cell in self._ring(cell_x, cell_y, radius):
+                for job in self.open_jobs_by_cell.get(cell, ()):
+                    if structure_type and job.structure_type != structure_type:
+                        continue
+                    if exclude and job in exclude:
+                        continue
+                    distance = (job.tile.x - tile.x) ** 2 + (job.tile.y - tile.y) ** 2
+                    # Ties go to the older job so the choice does not depend
+                    # on the order of the set
+                    if (
+                        best_job is None
+                        or distance < best_distance
+                        or (distance == best_distance and job.id < best_job.id)
+                    ):
+                        best_job = job
+                        best_distance = distance
+
+            # Any job in the next ring is at least radius * cell_size away
+            if best_job and best_distance <= (radius * self.cell_size) ** 2:
+                break
+
+        return best_job
+
+    def claim_nearest(
+        self,
+        tile: Tile,
+        structure_type: str = "",
+        exclude: set[Job] | None = None,
+    ) -> Job | None:
+        job = self.nearest_open(tile, structure_type, exclude)
+        if job:
+            self.claim(job)
+        return job
+
+    def _cell_at(self, tile: Tile) -> tuple[int, int]:
+        return tile.x // self.cell_size, tile.y // self.cell_size
+
+    def _add_open(self, job: Job) -> None:
+        self.open_jobs_by_cell.setdefault(self._cell_at(job.tile), set()).add(job)
+
+    def _remove_open(self, job: Job) -> None:
+        cell = self._cell_at(job.tile)
+        jobs = self.open_jobs_by_cell.get(cell)
+        if jobs is None:
+            return
+        jobs.discard(job)
+        if not jobs:
+            del self.open_jobs_by_cell[cell]
+
+    def _ring(self, cell_x: int, cell_y: int, radius: int):
+        if radius == 0:
+            yield cell_x, cell_y
+            return
+
+        for x in range(cell_x - radius, cell_x + radius + 1):
+            yield x, cell_y - radius
+            yield x, cell_y + radius
+        for y in range(cell_y - radius + 1, cell_y + radius):
+            yield cell_x - radius, y
+            yield cell_x + radius, y
@@ -0,0 +1,107 @@
+"""
+LOD Renderer for drawing zoomed out chunks as flat color images
+"""
+from collections import OrderedDict
+from typing import Iterable
+
+import pyglet
+from pyglet import gl
+
+from . import constants
+from .world import World
+from .tile import Tile
+from .chunk import Chunk
+from .tile_colors import TileColors
+
+
+class LODRenderer:
+    """
+    LOD Renderer class
+
+    Below the LOD zoom a tile is a few pixels on screen, so instead of the
+    tilemap each chunk is drawn as one texture with a pixel per tile in the
+    color of its structure, stretched over the chunk. A chunk image is built
+    again the next time it is drawn after a tile in it changed. Textures are
+    kept in the order they were last drawn and the oldest are released once
+    they take more than budget bytes.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        tile_colors: TileColors,
+        budget: int = constants.LOD_CACHE_BUDGET,
+    ):
+        self.world: World = world
+        self.tile_colors: TileColors = tile_colors
+        self.budget: int = budget
+        self.chunk_size: int = world.grid.chunk_size
+        # Pixels along the side of a chunk on screen at zoom 1
+        self.size: int = self.chunk_size * constants.TILE_SIZE
+        self.texture_bytes: int = self.chunk_size**2 * 4
+
+        self.textures: OrderedDict[tuple[int, int], pyglet.image.Texture] = (
+            OrderedDict()
+        )
+        self.dirty: set[tuple[int, int]] = set()
+
+    def update_tiles(self, tiles: Iterable[Tile]) -> None:
+        grid = self.world.grid
+        self.dirty.update(grid.chunk_position_at(tile.x, tile.y) for tile in tiles)
+
+    def get_texture(self, chunk: Chunk) -> pyglet.image.Texture:
+        texture = self.textures.get(chunk.position)
+        if texture is not None:
+            self.textures.move_to_end(chunk.position)
+            if chunk.position not in self.dirty:
+                return texture
+
+        self.dirty.discard(chunk.position)
+        if texture is None:
+            texture = self.create_texture(chunk.position)
+        colors = self.tile_colors.get_chunk_colors(chunk)
+        image = pyglet.image.ImageData(
+            self.chunk_size, self.chunk_size, "RGBA", colors.tobytes()
+        )
+        texture.blit_into(image, 0, 0, 0)
+        return texture
+
+    def create_texture(self, chunk_position: tuple[int, int]) -> pyglet.image.Texture:
+        # Textures are released when the last reference to them is dropped
+        while self.textures and self.get_bytes() + self.texture_bytes > self.budget:
+            released, _ = self.textures.popitem(last=False)
+            self.dirty.discard(released)
+
+        texture = pyglet.image.Texture.create(self.chunk_size, self.chunk_size)
+        self.textures[chunk_position] = texture
+        return texture
+
+    def get_bytes(self) -> int:
+        return len(self.textures) * self.texture_bytes
+
+    def draw(self, chunk_positions: Iterable[tuple[int, int]]) -> None:
+        gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        for chunk_position in chunk_positions:
+            chunk = self.world.grid.get_chunk(*chunk_position)
+            if chunk is None:
+                # Nothing is built on it anymore
+                self.textures.pop(chunk_position, None)
+                continue
+            texture = self.get_texture(chunk)
+            chunk_x, chunk_y = chunk_position
+            texture.blit(
+                chunk_x * self.size,
+                chunk_y * self.size,
+                width=self.size,
+                height=self.size,
+            )
+        gl.glPopAttrib()
+
+    def clear(self) -> None:
+        self.textures.clear()
+        self.dirty.clear()
+
+    def measure(self) -> tuple[int, int]:
+        return len(self.textures), self.get_bytes()
@@ -14,6 +14,18 @@ class Manager(ABC):
     def __init__(self):
         self.keys = key.KeyStateHandler()
         self.mouse_buttons = mouse.MouseStateHandler()
+        # Keys held down since the last frame, so holding one acts only once
+        self.keys_down: set[int] = set()
+
+    def is_key_pressed(self, symbol: int) -> bool:
+        """True only on the first frame the key is held down"""
+        if not self.keys[symbol]:
+            self.keys_down.discard(symbol)
+            return False
+        if symbol in self.keys_down:
+            return False
+        self.keys_down.add(symbol)
+        return True
 
     @abstractmethod
     def init(self) -> None:
@@ -0,0 +1,234 @@
+"""
+Memory Tracker class for live memory per category and allocation spikes
+"""
+from collections import deque
+from typing import Callable, Collection
+import sys
+import tracemalloc
+
+import numpy as np
+
+from . import constants
+from .world import World
+
+# Measures a category, returns the live object count and bytes
+Measure = Callable[[], tuple[int, int]]
+
+
+def estimate_bytes(objects: Collection) -> int:
+    """
+    Estimates the bytes of objects of one class from the first of them, the
+    object and its attribute dict without what the attributes point to
+    """
+    if not objects:
+        return 0
+    sample = next(iter(objects))
+    size = sys.getsizeof(sample) + sys.getsizeof(getattr(sample, "__dict__", {}))
+    return size * len(objects)
+
+
+def array_bytes(arrays) -> int:
+    return sum(array.nbytes for array in arrays)
+
+
+class MemoryTracker:
+    """
+    Memory Tracker class
+
+    Reports the live object count and bytes of every registered category,
+    measured only when asked for. While tracing it also follows tracemalloc
+    frame by frame: how much a frame allocated at its peak and how much it
+    kept. A frame that allocates spike_factor times the median of the last
+    history frames is flagged, and a tracemalloc snapshot is compared with
+    the one of the previous spike to show where the memory went.
+    """
+
+    def __init__(
+        self,
+        history: int = constants.PROFILER_HISTORY,
+        spike_factor: float = constants.MEMORY_SPIKE_FACTOR,
+        min_spike_bytes: int = constants.MEMORY_MIN_SPIKE_BYTES,
+    ):
+        self.history: int = history
+        self.spike_factor: float = spike_factor
+        self.min_spike_bytes: int = min_spike_bytes
+
+        self.categories: dict[str, Measure] = {}
+        self.tracing: bool = False
+
+        self.frames: int = 0
+        # Bytes allocated at the peak of each frame and kept at its end
+        self.allocated: np.ndarray = np.zeros(history)
+        self.retained: np.ndarray = np.zeros(history)
+        self.frame_start_memory: int = 0
+
+        self.spikes: deque[dict] = deque(maxlen=constants.MEMORY_SPIKES_KEPT)
+        self.snapshot: tracemalloc.Snapshot | None = None
+
+    def register(self, category: str, measure: Measure) -> None:
+        self.categories[category] = measure
+
+    def register_world(self, world: World) -> None:
+        grid = world.grid
+        self.register(
+            "tiles",
+            lambda: (
+                len(grid.chunks) * grid.chunk_size**2,
+                sum(
+                    array_bytes(
+                        [chunk.structure_ids, chunk.build_state, chunk.movement_cost]
+                    )
+                    + array_bytes(chunk.masks.values())
+                    for chunk in grid.chunks.values()
+                ),
+            ),
+        )
+        self.register(
+            "structures",
+            lambda: (
+                sum(map(len, world.structures.values())),
+                estimate_bytes(
+                    [s for structures in world.structures.values() for s in structures]
+                ),
+            ),
+        )
+        self.register(
+            "jobs", lambda: (len(world.jobs), estimate_bytes(list(world.jobs)))
+        )
+        # The store is replaced when the world is reset
+        self.register(
+            "characters",
+            lambda: (
+                len(world.characters),
+                array_bytes(
+                    array
+                    for array in vars(world.characters).values()
+                    if isinstance(array, np.ndarray)
+                ),
+            ),
+        )
+
+    def measure(self) -> dict[str, dict[str, int]]:
+        measured = {}
+        for category, measure in self.categories.items():
+            count, bytes_ = measure()
+            measured[category] = {"count": count, "bytes": bytes_}
+        return measured
+
+    def start_tracing(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.tracing = True
+        self.frame_start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+
+    def stop_tracing(self) -> None:
+        self.tracing = False
+        self.snapshot = None
+        tracemalloc.stop()
+
+    def end_frame(self) -> dict | None:
+        """Records the allocations of the frame, returns a spike if it was one"""
+        if not self.tracing:
+            return None
+
+        current, peak = tracemalloc.get_traced_memory()
+        allocated = peak - self.frame_start_memory
+        retained = current - self.frame_start_memory
+
+        count = min(self.frames, self.history)
+        threshold = self.min_spike_bytes
+        if count:
+            median = float(np.median(self.allocated[:count]))
+            threshold = max(threshold, median * self.spike_factor)
+
+        index = self.frames % self.history
+        self.allocated[index] = allocated
+        self.retained[index] = retained
+        self.frames += 1
+
+        spike = None
+        if allocated > threshold:
+            spike = self.record_spike(allocated, retained)
+
+        # Whatever record_spike allocated is not part of the next frame
+        self.frame_start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        return spike
+
+    def record_spike(self, allocated: int, retained: int) -> dict:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        top = [
+            {
+                "where": str(stat.traceback[0]),
+                "bytes": stat.size_diff,
+                "count": stat.count_diff,
+            }
+            for stat in snapshot.compare_to(self.snapshot, "lineno")[:5]
+        ]
+        self.snapshot = snapshot
+
+        spike = {
+            "frame": self.frames - 1,
+            "allocated": allocated,
+            "retained": retained,
+            "top": top,
+        }
+        self.spikes.append(spike)
+        return spike
+
+    def get_frame_stats(self) -> dict[str, float]:
+        count = min(self.frames, self.history)
+        if not count:
+            return {}
+        allocated = self.allocated[:count]
+        return {
+            "allocated_mean": float(allocated.mean()),
+            "allocated_p95": float(np.percentile(allocated, 95)),
+            "allocated_max": float(allocated.max()),
+            "retained_mean": float(self.retained[:count].mean()),
+        }
+
+    def get_report(self) -> dict:
+        report = {"categories": self.measure()}
+        if self.tracing:
+            current, _ = tracemalloc.get_traced_memory()
+            report["traced_bytes"] = current
+            report["frames"] = self.get_frame_stats()
+            report["spikes"] = list(self.spikes)
+        return report
+
+    @staticmethod
+    def format_report(report: dict) -> str:
+        lines = [f"{'memory':<24}{'count':>10}{'MiB':>10}"]
+        for category, measured in report["categories"].items():
+            lines.append(
+                f"{category:<24}{measured['count']:>10}"
+                f"{measured['bytes'] / 2**20:>10.2f}"
+            )
+        if "frames" in report:
+            frames = report["frames"]
+            lines.append(f"traced {report['traced_bytes'] / 2**20:.2f} MiB")
+            if frames:
+                lines.append(
+                    f"allocated per frame: mean {frames['allocated_mean'] / 1024:.1f}"
+                    f" KiB, p95 {frames['allocated_p95'] / 1024:.1f} KiB,"
+                    f" max {frames['allocated_max'] / 1024:.1f} KiB"
+                )
+            for spike in report["spikes"]:
+                lines.append(
+                    f"spike at frame {spike['frame']}: "
+                    f"{spike['allocated'] / 1024:.1f} KiB allocated, "
+                    f"{spike['retained'] / 1024:.1f} KiB kept"
+                )
+                for stat in spike["top"]:
+                    lines.append(
+                        f"    {stat['bytes'] / 1024:+.1f} KiB "
+                        f"{stat['count']:+} blocks {stat['where']}"
+                    )
+        return "\n".join(lines)
@@ -0,0 +1,186 @@
+"""
+Minimap for drawing the whole world and the camera view in a corner
+"""
+import math
+
+import numpy as np
+import pyglet
+
+from . import constants
+from .world import World
+from .camera import Camera
+from .tile_colors import TileColors
+from .events import StructuresChanged, WorldLoaded
+
+# Chunks whose block colors are computed in one go
+MINIMAP_CHUNK_BATCH = 256
+
+
+class Minimap:
+    """
+    Minimap class
+
+    Draws the world at a pixel per scale x scale block of tiles, in the mean
+    color of the structures built in the block, with the part the camera
+    shows on top. Changed tiles only mark their chunk, on the next update
+    the pixels under the marked chunks are colored again a block at a time
+    and the part of the texture they span is uploaded at once.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        camera: Camera,
+        tile_colors: TileColors,
+        batch: pyglet.graphics.Batch,
+        x: int,
+        y: int,
+        size: int = constants.MINIMAP_SIZE,
+    ):
+        self.world: World = world
+        self.camera: Camera = camera
+        self.tile_colors: TileColors = tile_colors
+        self.x: int = x
+        self.y: int = y
+        # Tiles along the side of the block behind a pixel
+        self.scale: int = math.ceil(max(world.width, world.height) / size)
+        self.width: int = math.ceil(world.width / self.scale)
+        self.height: int = math.ceil(world.height / self.scale)
+        self.visible: bool = True
+
+        self.texture: pyglet.image.Texture = pyglet.image.Texture.create(
+            self.width, self.height
+        )
+        self.background = pyglet.shapes.Rectangle(
+            x,
+            y,
+            self.width,
+            self.height,
+            color=(20, 20, 24),
+            batch=batch,
+            group=pyglet.graphics.OrderedGroup(0),
+        )
+        self.sprite = pyglet.sprite.Sprite(
+            self.texture, x, y, batch=batch, group=pyglet.graphics.OrderedGroup(1)
+        )
+        self.view = pyglet.shapes.Rectangle(
+            x,
+            y,
+            1,
+            1,
+            color=(255, 255, 255),
+            batch=batch,
+            group=pyglet.graphics.OrderedGroup(2),
+        )
+        self.view.opacity = 60
+
+        # The texture's pixels, [y, x, rgba] with the bottom row first
+        self.pixels: np.ndarray = np.zeros((self.height, self.width, 4), np.uint8)
+        self.dirty_chunks: set[tuple[int, int]] = set()
+
+        self.world.events.subscribe(StructuresChanged, self.on_structures_changed)
+        self.world.events.subscribe(WorldLoaded, self.on_world_loaded)
+        self.mark_chunks()
+
+    def mark_chunks(self) -> None:
+        self.dirty_chunks.update(chunk.position for chunk in self.world.iter_chunks())
+
+    def on_structures_changed(self, events: list[StructuresChanged]) -> None:
+        grid = self.world.grid
+        for event in events:
+            self.dirty_chunks.update(
+                grid.chunk_position_at(tile.x, tile.y) for tile in event.tiles
+            )
+
+    def on_world_loaded(self, events: list[WorldLoaded]) -> None:
+        self.pixels[:] = 0
+        self.upload(0, 0, self.width - 1, self.height - 1)
+        self.dirty_chunks.clear()
+        self.mark_chunks()
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        for part in (self.background, self.sprite, self.view):
+            part.visible = self.visible
+
+    def update(self, dt: float) -> None:
+        if self.dirty_chunks:
+            self.update_pixels()
+
+        if self.visible:
+            self.update_view()
+
+    def update_pixels(self) -> None:
+        """Colors the pixels under the marked chunks and uploads them"""
+        grid = self.world.grid
+        chunk_size = grid.chunk_size
+        # Inclusive pixel rects under each chunk, a block may span chunks
+        rects = {
+            (chunk_x, chunk_y): (
+                chunk_x * chunk_size // self.scale,
+                chunk_y * chunk_size // self.scale,
+                min(((chunk_x + 1) * chunk_size - 1) // self.scale, self.width - 1),
+                min(((chunk_y + 1) * chunk_size - 1) // self.scale, self.height - 1),
+            )
+            for chunk_x, chunk_y in self.dirty_chunks
+        }
+        self.dirty_chunks.clear()
+
+        if chunk_size % self.scale == 0:
+            # Every block is inside one chunk, the chunks are reduced together
+            chunks = []
+            for chunk_position, (x0, y0, x1, y1) in rects.items():
+                chunk = grid.get_chunk(*chunk_position)
+                if chunk is None:
+                    self.pixels[y0 : y1 + 1, x0 : x1 + 1] = 0
+                else:
+                    chunks.append(chunk)
+            for start in range(0, len(chunks), MINIMAP_CHUNK_BATCH):
+                batch = chunks[start : start + MINIMAP_CHUNK_BATCH]
+                block_colors = self.tile_colors.get_chunks_block_colors(
+                    batch, self.scale
+                )
+                for chunk, colors in zip(batch, block_colors):
+                    x0, y0, x1, y1 = rects[chunk.position]
+                    self.pixels[y0 : y1 + 1, x0 : x1 + 1] = colors[
+                        : y1 - y0 + 1, : x1 - x0 + 1
+                    ]
+        else:
+            for x0, y0, x1, y1 in set(rects.values()):
+                self.pixels[y0 : y1 + 1, x0 : x1 + 1] = (
+                    self.tile_colors.get_block_colors(
+                        x0 * self.scale,
+                        y0 * self.scale,
+                        x1 - x0 + 1,
+                        y1 - y0 + 1,
+                        self.scale,
+                    )
+                )
+
+        x0s, y0s, x1s, y1s = zip(*rects.values())
+        self.upload(min(x0s), min(y0s), max(x1s), max(y1s))
+
+    def upload(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        """Writes the inclusive pixel rect into the texture"""
+        pixels = np.ascontiguousarray(self.pixels[y0 : y1 + 1, x0 : x1 + 1])
+        self.texture.blit_into(
+            pyglet.image.ImageData(
+                x1 - x0 + 1, y1 - y0 + 1, "RGBA", pixels.tobytes()
+            ),
+            x0,
+            y0,
+            0,
+        )
+
+    def update_view(self) -> None:
+        x0, y0, x1, y1 = self.camera.get_visible_rect()
+        x0 = min(max(x0, 0), self.world.width)
+        y0 = min(max(y0, 0), self.world.height)
+        x1 = min(max(x1 + 1, x0), self.world.width)
+        y1 = min(max(y1 + 1, y0), self.world.height)
+        self.view.position = (
+            self.x + x0 / self.scale,
+            self.y + y0 / self.scale,
+        )
+        self.view.width = max((x1 - x0) / self.scale, 1)
+        self.view.height = max((y1 - y0) / self.scale, 1)
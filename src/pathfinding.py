@@ -0,0 +1,416 @@
+"""
+Grid pathfinding with cached paths
+"""
+from collections import deque, OrderedDict
+from typing import Iterable
+import heapq
+import math
+
+import numpy as np
+
+from . import constants
+from .tile import Tile
+from .tile_grid import TileGrid, NEIGHBOR_OFFSETS, EMPTY_MOVEMENT_COST
+
+DIAGONAL_DISTANCE = math.sqrt(2)
+
+
+def octile_distance(a: tuple[int, int], b: tuple[int, int]) -> float:
+    """Cheapest possible cost between two positions, used as the A* heuristic"""
+    dx = abs(a[0] - b[0])
+    dy = abs(a[1] - b[1])
+    return EMPTY_MOVEMENT_COST * (max(dx, dy) + (DIAGONAL_DISTANCE - 1) * min(dx, dy))
+
+
+def shift_field(array: np.ndarray, dx: int, dy: int, fill) -> np.ndarray:
+    """
+    Shifts the last two [x, y] axes so that result[x, y] is array[x - dx, y - dy]
+    """
+    shifted = np.full_like(array, fill)
+    width, height = array.shape[-2:]
+    shifted[..., max(dx, 0) : width + min(dx, 0), max(dy, 0) : height + min(dy, 0)] = (
+        array[..., max(-dx, 0) : width - max(dx, 0), max(-dy, 0) : height - max(dy, 0)]
+    )
+    return shifted
+
+
+class Path:
+    """
+    Path class
+
+    The tiles a character walks through, not including the tile it starts on.
+    """
+
+    def __init__(self, positions: Iterable[tuple[int, int]]):
+        self.positions: deque[tuple[int, int]] = deque(positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __bool__(self) -> bool:
+        return bool(self.positions)
+
+    def next_tile(self) -> Tile | None:
+        if not self.positions:
+            return None
+        return Tile(*self.positions.popleft())
+
+    def crosses(self, positions: set[tuple[int, int]]) -> bool:
+        return not positions.isdisjoint(self.positions)
+
+
+class CachedPath:
+    """
+    A path in the cache, indexed by position so the paths of characters
+    starting anywhere along it can be served from it
+    """
+
+    __slots__ = ("goal", "positions", "index")
+
+    def __init__(self, goal: tuple[int, int], positions: list[tuple[int, int]]):
+        self.goal: tuple[int, int] = goal
+        self.positions: list[tuple[int, int]] = positions
+        self.index: dict[tuple[int, int], int] = {
+            position: i for i, position in enumerate(positions)
+        }
+
+
+class Pathfinder:
+    """
+    Pathfinder class
+
+    A* over the tile grid using the per-tile movement cost, walls have an
+    infinite cost and are never entered. Found paths are cached by goal and a
+    cached path is only dropped when a structure changes on a tile it crosses.
+    """
+
+    def __init__(
+        self,
+        grid: TileGrid,
+        cache_size: int = constants.PATH_CACHE_SIZE,
+        max_expanded_nodes: int = constants.PATHFINDING_MAX_EXPANDED_NODES,
+    ):
+        self.grid: TileGrid = grid
+        self.cache_size: int = cache_size
+        self.max_expanded_nodes: int = max_expanded_nodes
+
+        self._next_path_id: int = 0
+        self._paths: OrderedDict[int, CachedPath] = OrderedDict()
+        self._paths_by_goal: dict[tuple[int, int], set[int]] = {}
+        self._paths_by_position: dict[tuple[int, int], set[int]] = {}
+        self._unreachable: set[tuple[tuple[int, int], tuple[int, int]]] = set()
+
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+
+    def find_path(self, start: Tile, goal: Tile) -> Path | None:
+        start_position = start.position
+        goal_position = goal.position
+
+        if start_position == goal_position:
+            return Path([])
+
+        positions = self._get_cached(start_position, goal_position)
+        if positions is not None:
+            self.cache_hits += 1
+            return Path(positions)
+
+        if (start_position, goal_position) in self._unreachable:
+            self.cache_hits += 1
+            return None
+
+        self.cache_misses += 1
+        # Most paths stay close to the line between start and goal, searching
+        # a small area around it first lets the search read a cost copy
+        bounds = self._search_bounds(start_position, goal_position)
+        positions = self.search(start_position, goal_position, bounds)
+        if positions is None and bounds != self._grid_bounds():
+            positions = self.search(start_position, goal_position)
+        if positions is None:
+            self._unreachable.add((start_position, goal_position))
+            return None
+
+        self._add_cached(goal_position, positions)
+        return Path(positions[1:])
+
+    def invalidate(self, positions: Iterable[tuple[int, int]]) -> None:
+        """Drops the cached paths crossing any of the changed positions"""
+        for position in positions:
+            for path_id in list(self._paths_by_position.get(position, ())):
+                self._remove_cached(path_id)
+
+        # A change anywhere may connect areas that were not connected
+        self._unreachable.clear()
+
+    def clear(self) -> None:
+        self._paths.clear()
+        self._paths_by_goal.clear()
+        self._paths_by_position.clear()
+        self._unreachable.clear()
+
+    def is_walkable(self, x: int, y: int) -> bool:
+        return self.grid.get_movement_cost(x, y) != math.inf
+
+    def search(
+        self,
+        start: tuple[int, int],
+        goal: tuple[int, int],
+        bounds: tuple[int, int, int, int] | None = None,
+    ) -> list[tuple[int, int]] | None:
+        """
+        A* from start to goal, both included in the returned positions. The
+        goal is always enterable, bounds limits the search to an inclusive
+        x0, y0, x1, y1 rect.
+        """
+        if bounds is None:
+            bounds = self._grid_bounds()
+        get_movement_cost = self._cost_lookup(bounds)
+
+        open_heap = [(octile_distance(start, goal), 0.0, start)]
+        came_from: dict[tuple[int, int], tuple[int, int]] = {}
+        costs: dict[tuple[int, int], float] = {start: 0.0}
+        expanded = 0
+
+        while open_heap:
+            _, cost, position = heapq.heappop(open_heap)
+            if position == goal:
+                return self._reconstruct(came_from, position)
+            if cost > costs[position]:
+                continue
+
+            expanded += 1
+            if expanded > self.max_expanded_nodes:
+                return None
+
+            for neighbor, movement_cost in self._neighbors(
+                position, bounds, get_movement_cost, goal
+            ):
+                new_cost = cost + movement_cost
+                if new_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = new_cost
+                    came_from[neighbor] = position
+                    priority = new_cost + octile_distance(neighbor, goal)
+                    heapq.heappush(open_heap, (priority, new_cost, neighbor))
+
+        return None
+
+    def distances(
+        self,
+        source: tuple[int, int],
+        targets: Iterable[tuple[int, int]],
+        bounds: tuple[int, int, int, int],
+    ) -> dict[tuple[int, int], float]:
+        """Returns the cost from source to every target reachable inside bounds"""
+        x0, y0, _, _ = bounds
+        field = self.distance_fields([source], bounds)[0]
+
+        found = {}
+        for x, y in targets:
+            cost = field[x - x0, y - y0]
+            if cost != math.inf:
+                found[(x, y)] = float(cost)
+        return found
+
+    def distance_fields(
+        self,
+        sources: list[tuple[int, int]],
+        bounds: tuple[int, int, int, int],
+    ) -> np.ndarray:
+        """
+        Returns the cost of reaching every tile inside bounds from each of the
+        sources as a [source, x, y] array
+        """
+        x0, y0, x1, y1 = bounds
+        fields = np.full((len(sources), x1 - x0 + 1, y1 - y0 + 1), math.inf)
+        for i, (x, y) in enumerate(sources):
+            fields[i, x - x0, y - y0] = 0.0
+        return self._relax(fields, bounds)
+
+    def integration_field(
+        self,
+        sources: list[tuple[int, int]],
+        bounds: tuple[int, int, int, int],
+    ) -> np.ndarray:
+        """
+        Returns the cost of reaching every tile inside bounds from the closest
+        of the sources as an [x, y] array
+        """
+        x0, y0, x1, y1 = bounds
+        fields = np.full((1, x1 - x0 + 1, y1 - y0 + 1), math.inf)
+        for x, y in sources:
+            fields[0, x - x0, y - y0] = 0.0
+        return self._relax(fields, bounds)[0]
+
+    def _relax(self, fields: np.ndarray, bounds: tuple[int, int, int, int]):
+        """
+        Relaxes [field, x, y] cost fields until nothing changes. Each pass
+        sweeps the columns east, west, then the rows north, south, so a cost
+        travels a whole row or column per sweep instead of a tile per step.
+        """
+        x0, y0, x1, y1 = bounds
+        costs = self.grid.get_movement_costs(x0, y0, x1, y1).astype(np.float64)
+        walkable = np.isfinite(costs)
+
+        # Cost of stepping onto [x, y] from [x - dx, y - dy]
+        step_costs = {}
+        for dx, dy in NEIGHBOR_OFFSETS:
+            if dx and dy:
+                # Do not cut corners of walls
+                allowed = (
+                    walkable
+                    & shift_field(walkable, dx, 0, False)
+                    & shift_field(walkable, 0, dy, False)
+                )
+                step_costs[(dx, dy)] = np.where(
+                    allowed, costs * DIAGONAL_DISTANCE, math.inf
+                )
+            else:
+                step_costs[(dx, dy)] = costs
+
+        # Rows are swept as the columns of the transposed fields
+        transposed_step_costs = {
+            (dy, dx): step_cost.T for (dx, dy), step_cost in step_costs.items()
+        }
+
+        while True:
+            previous = fields.copy()
+            for direction in (1, -1):
+                self._sweep_columns(fields, step_costs, direction)
+            for direction in (1, -1):
+                self._sweep_columns(
+                    fields.swapaxes(-2, -1), transposed_step_costs, direction
+                )
+            if np.array_equal(previous, fields):
+                return fields
+
+    @staticmethod
+    def _sweep_columns(fields: np.ndarray, step_costs: dict, direction: int) -> None:
+        """Relaxes every column from the one before it, in the given direction"""
+        width = fields.shape[-2]
+        straight = step_costs[(direction, 0)]
+        from_below = step_costs[(direction, 1)]
+        from_above = step_costs[(direction, -1)]
+
+        columns = range(1, width) if direction > 0 else range(width - 2, -1, -1)
+        for x in columns:
+            column = fields[..., x, :]
+            previous = fields[..., x - direction, :]
+            np.minimum(column, previous + straight[x], out=column)
+            np.minimum(
+                column[..., 1:],
+                previous[..., :-1] + from_below[x, 1:],
+                out=column[..., 1:],
+            )
+            np.minimum(
+                column[..., :-1],
+                previous[..., 1:] + from_above[x, :-1],
+                out=column[..., :-1],
+            )
+
+    def _grid_bounds(self) -> tuple[int, int, int, int]:
+        return 0, 0, self.grid.width - 1, self.grid.height - 1
+
+    def _search_bounds(
+        self, start: tuple[int, int], goal: tuple[int, int]
+    ) -> tuple[int, int, int, int]:
+        margin = constants.PATHFINDING_SEARCH_MARGIN
+        return (
+            max(min(start[0], goal[0]) - margin, 0),
+            max(min(start[1], goal[1]) - margin, 0),
+            min(max(start[0], goal[0]) + margin, self.grid.width - 1),
+            min(max(start[1], goal[1]) + margin, self.grid.height - 1),
+        )
+
+    def _cost_lookup(self, bounds: tuple[int, int, int, int]):
+        """
+        Returns a movement cost function for positions inside bounds, small
+        areas are copied out of the grid once up front
+        """
+        x0, y0, x1, y1 = bounds
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > constants.PATHFINDING_MAX_COPIED_TILES:
+            return self.grid.get_movement_cost
+
+        costs = self.grid.get_movement_costs(x0, y0, x1, y1).tolist()
+        return lambda x, y: costs[x - x0][y - y0]
+
+    @staticmethod
+    def _neighbors(
+        position: tuple[int, int],
+        bounds: tuple[int, int, int, int],
+        get_movement_cost,
+        goal: tuple[int, int] | None = None,
+    ):
+        """Yields the neighbors that can be stepped on and the cost of the step"""
+        x0, y0, x1, y1 = bounds
+
+        x, y = position
+        for dx, dy in NEIGHBOR_OFFSETS:
+            neighbor_x, neighbor_y = x + dx, y + dy
+            if not (x0 <= neighbor_x <= x1 and y0 <= neighbor_y <= y1):
+                continue
+
+            neighbor = neighbor_x, neighbor_y
+            movement_cost = get_movement_cost(neighbor_x, neighbor_y)
+            if movement_cost == math.inf:
+                if neighbor != goal:
+                    continue
+                movement_cost = EMPTY_MOVEMENT_COST
+
+            if dx and dy:
+                # Do not cut corners of walls
+                if get_movement_cost(x + dx, y) == math.inf:
+                    continue
+                if get_movement_cost(x, y + dy) == math.inf:
+                    continue
+                movement_cost *= DIAGONAL_DISTANCE
+
+            yield neighbor, movement_cost
+
+    @staticmethod
+    def _reconstruct(
+        came_from: dict[tuple[int, int], tuple[int, int]], position: tuple[int, int]
+    ) -> list[tuple[int, int]]:
+        positions = [position]
+        while position in came_from:
+            position = came_from[position]
+            positions.append(position)
+        positions.reverse()
+        return positions
+
+    # Cache
+    def _get_cached(
+        self, start: tuple[int, int], goal: tuple[int, int]
+    ) -> list[tuple[int, int]] | None:
+        for path_id in self._paths_by_goal.get(goal, ()):
+            cached = self._paths[path_id]
+            index = cached.index.get(start)
+            if index is not None:
+                self._paths.move_to_end(path_id)
+                return cached.positions[index + 1 :]
+        return None
+
+    def _add_cached(self, goal: tuple[int, int], positions: list[tuple[int, int]]):
+        cached = CachedPath(goal, positions)
+        path_id = self._next_path_id
+        self._next_path_id += 1
+        self._paths[path_id] = cached
+        self._paths_by_goal.setdefault(goal, set()).add(path_id)
+        for position in positions:
+            self._paths_by_position.setdefault(position, set()).add(path_id)
+
+        while len(self._paths) > self.cache_size:
+            self._remove_cached(next(iter(self._paths)))
+
+    def _remove_cached(self, path_id: int) -> None:
+        cached = self._paths.pop(path_id)
+
+        path_ids = self._paths_by_goal[cached.goal]
+        path_ids.discard(path_id)
+        if not path_ids:
+            del self._paths_by_goal[cached.goal]
+
+        for position in cached.positions:
+            path_ids = self._paths_by_position[position]
+            path_ids.discard(path_id)
+            if not path_ids:
+                del self._paths_by_position[position]
@@ -0,0 +1,140 @@
+"""
+Profiler Overlay for drawing the frame times of a FrameProfiler
+"""
+import pyglet
+
+from . import constants
+from .frame_profiler import FrameProfiler
+from .memory_tracker import MemoryTracker
+
+ROW_HEIGHT = 18
+BAR_WIDTH = 160
+# Offset of the memory column from the frame time column
+MEMORY_COLUMN_X = 520
+# Longest frame that still draws at 60 frames per second
+FRAME_BUDGET_MS = 1000 / 60
+
+
+class ProfilerOverlay:
+    """
+    Profiler Overlay class
+
+    One row per subsystem of a FrameProfiler with its p50, p95 and p99 frame
+    times and a bar of the p95 against the frame budget, a tick on the bar
+    marks the p99. Next to them one row per category of a MemoryTracker
+    with its live count and bytes, and the allocations per frame and the
+    last spike when it is tracing. Rows are added as they show up and the
+    numbers are refreshed a few times a second while the overlay is visible.
+    """
+
+    def __init__(
+        self,
+        profiler: FrameProfiler,
+        memory_tracker: MemoryTracker,
+        batch: pyglet.graphics.Batch,
+        x: int,
+        y: int,
+        update_interval: float = constants.PROFILER_OVERLAY_UPDATE_INTERVAL,
+    ):
+        self.profiler: FrameProfiler = profiler
+        self.memory_tracker: MemoryTracker = memory_tracker
+        self.batch: pyglet.graphics.Batch = batch
+        self.x: int = x
+        self.y: int = y
+        self.update_interval: float = update_interval
+        self.update_timer: float = 0.0
+        self.visible: bool = False
+
+        # Subsystem -> label, p95 bar, p99 tick
+        self.rows: dict[str, tuple] = {}
+        self.memory_labels: list[pyglet.text.Label] = []
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        for row in self.rows.values():
+            for part in row:
+                part.visible = self.visible
+        for label in self.memory_labels:
+            label.visible = self.visible
+        if self.visible:
+            self.refresh()
+
+    def update(self, dt: float) -> None:
+        if not self.visible:
+            return
+        self.update_timer += dt
+        if self.update_timer >= self.update_interval:
+            self.update_timer = 0.0
+            self.refresh()
+
+    def refresh(self) -> None:
+        for name, stats in self.profiler.get_stats().items():
+            label, bar, tick = self.rows.get(name) or self.add_row(name)
+            label.text = (
+                f"{name:<20}{stats['p50_ms']:7.2f}{stats['p95_ms']:7.2f}"
+                f"{stats['p99_ms']:7.2f} ms"
+            )
+            bar.width = max(min(stats["p95_ms"] / FRAME_BUDGET_MS, 1.0) * BAR_WIDTH, 1)
+            bar.color = self.get_color(stats["p95_ms"])
+            tick.x = bar.x + min(stats["p99_ms"] / FRAME_BUDGET_MS, 1.0) * BAR_WIDTH
+
+        lines = [
+            f"{category:<12}{measured['count']:>9}{measured['bytes'] / 2**20:>9.2f} MiB"
+            for category, measured in self.memory_tracker.measure().items()
+        ]
+        frames = self.memory_tracker.get_frame_stats()
+        if frames:
+            lines.append(
+                f"{'alloc/frame':<12}p95 {frames['allocated_p95'] / 1024:.1f} KiB"
+            )
+        if self.memory_tracker.spikes:
+            spike = self.memory_tracker.spikes[-1]
+            lines.append(
+                f"{'last spike':<12}frame {spike['frame']} "
+                f"{spike['allocated'] / 1024:.1f} KiB"
+            )
+        while len(self.memory_labels) < len(lines):
+            self.memory_labels.append(
+                self.create_label(
+                    self.x + MEMORY_COLUMN_X,
+                    self.y - ROW_HEIGHT * len(self.memory_labels),
+                )
+            )
+        for label, line in zip(self.memory_labels, lines):
+            label.text = line
+
+    def add_row(self, name: str) -> tuple:
+        y = self.y - ROW_HEIGHT * len(self.rows)
+        label = self.create_label(self.x, y)
+        bar_x = self.x + 320
+        bar = pyglet.shapes.Rectangle(
+            bar_x, y, 1, ROW_HEIGHT - 6, color=(80, 200, 80), batch=self.batch
+        )
+        tick = pyglet.shapes.Rectangle(
+            bar_x, y - 2, 2, ROW_HEIGHT - 2, color=(255, 255, 255), batch=self.batch
+        )
+        row = label, bar, tick
+        for part in row:
+            part.visible = self.visible
+        self.rows[name] = row
+        return row
+
+    def create_label(self, x: int, y: int) -> pyglet.text.Label:
+        label = pyglet.text.Label(
+            "",
+            font_name=["Courier New", "DejaVu Sans Mono"],
+            font_size=9,
+            x=x,
+            y=y,
+            batch=self.batch,
+        )
+        label.visible = self.visible
+        return label
+
+    @staticmethod
+    def get_color(milliseconds: float) -> tuple[int, int, int]:
+        if milliseconds < FRAME_BUDGET_MS / 2:
+            return 80, 200, 80
+        if milliseconds < FRAME_BUDGET_MS:
+            return 230, 190, 60
+        return 220, 70, 60
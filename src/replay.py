@@ -0,0 +1,220 @@
+"""
+Recording and replaying of input and simulation ticks
+"""
+from time import perf_counter
+import atexit
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .world import World
+from .simulation import Simulation
+from .simulation_process import Command, apply_command
+from .save_file import save_world, load_world, world_arrays
+
+REPLAY_VERSION = 1
+
+
+def world_hash(world: World) -> str:
+    """Returns a hash of everything a save file keeps of the world"""
+    digest = hashlib.sha256()
+    for name, array in world_arrays(world).items():
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def frame_time_stats(frame_times: list[float]) -> dict:
+    """Returns the count, mean and percentiles of frame times in milliseconds"""
+    if not frame_times:
+        return {"frames": 0}
+    milliseconds = np.array(frame_times) * 1000
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99]).tolist()
+    return {
+        "frames": len(frame_times),
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": float(milliseconds.max()),
+    }
+
+
+class ReplayRecorder:
+    """
+    Replay Recorder class
+
+    Writes a replay as JSON lines: a header, then one line per frame with its
+    dt, the input the managers saw, the commands sent to the world and the
+    simulation tick the frame ended on, then the tick and hash of the world
+    the recording ended with.
+
+    The starting world is saved next to the replay and loaded back into the
+    world being recorded, so that characters and jobs start out exactly as a
+    replay finds them.
+    """
+
+    def __init__(self, path: str, world: World, rate: int, start_tick: int = 0):
+        self.world: World = world
+        self.start_tick: int = start_tick
+        self.tick: int = 0
+        self.commands: list[Command] = []
+
+        snapshot_path = path + ".sav"
+        save_world(world, snapshot_path)
+        load_world(world, snapshot_path)
+        world.events.dispatch()
+
+        self.file = open(path, "w")
+        self._write(
+            {
+                "version": REPLAY_VERSION,
+                "width": world.width,
+                "height": world.height,
+                "rate": rate,
+                "snapshot": os.path.basename(snapshot_path),
+            }
+        )
+        atexit.register(self.close)
+
+    def _write(self, line: dict) -> None:
+        self.file.write(json.dumps(line) + "\n")
+
+    def record_command(self, command: Command) -> None:
+        self.commands.append(command)
+
+    def record_frame(self, dt: float, tick: int, input_state: dict) -> None:
+        self.tick = tick - self.start_tick
+        self._write(
+            {
+                "dt": dt,
+                "tick": self.tick,
+                "input": input_state,
+                "commands": self.commands,
+            }
+        )
+        self.commands = []
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        state_hash = world_hash(self.world)
+        self._write({"end": True, "tick": self.tick, "hash": state_hash})
+        self.file.close()
+
+
+class Replay:
+    """
+    Replay class
+
+    A recording loaded back from disk
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.frames: list[dict] = []
+        self.end: dict | None = None
+
+        with open(path) as file:
+            self.header: dict = json.loads(file.readline())
+            for line in file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("end"):
+                    self.end = entry
+                else:
+                    self.frames.append(entry)
+
+        if self.header["version"] > REPLAY_VERSION:
+            raise ValueError(f"{path} is from a newer version")
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(os.path.dirname(self.path), self.header["snapshot"])
+
+    def load_world(self, world: World) -> None:
+        load_world(world, self.snapshot_path)
+        world.events.dispatch()
+
+    def build_world(self) -> World:
+        world = World(self.header["width"], self.header["height"])
+        self.load_world(world)
+        return world
+
+    def report(
+        self, world: World, ticks: int, seconds: float, frame_times: list[float]
+    ) -> dict:
+        """Compares the replayed world to the recorded one and times the run"""
+        state_hash = world_hash(world)
+        recorded_hash = self.end["hash"] if self.end else None
+        return {
+            "replay": self.path,
+            "ticks": ticks,
+            "seconds": seconds,
+            "hash": state_hash,
+            "recorded_hash": recorded_hash,
+            "matches": state_hash == recorded_hash,
+            "frame_times": frame_time_stats(frame_times),
+            "subsystems": {
+                subsystem: time * 1000 / max(ticks, 1)
+                for subsystem, time in world.timings.items()
+            },
+        }
+
+
+class ReplayRunner:
+    """
+    Replay Runner class
+
+    Replays the ticks and commands of a recording without a window. Every
+    frame runs the ticks the recorded frame ran and then applies its commands,
+    which is the order WorldManager and BuildModeManager update in.
+    """
+
+    def __init__(self, replay: Replay):
+        self.replay: Replay = replay
+        self.world: World = replay.build_world()
+        self.simulation: Simulation = Simulation(self.world, replay.header["rate"])
+
+    def run(self) -> dict:
+        self.world.reset_timings()
+
+        frame_times = []
+        start = perf_counter()
+        for frame in self.replay.frames:
+            frame_start = perf_counter()
+            while self.simulation.ticks < frame["tick"]:
+                self.simulation.step()
+            for command in frame["commands"]:
+                apply_command(self.world, command)
+            frame_times.append(perf_counter() - frame_start)
+        seconds = perf_counter() - start
+
+        return self.replay.report(
+            self.world, self.simulation.ticks, seconds, frame_times
+        )
+
+    @staticmethod
+    def format_report(report: dict) -> str:
+        frame_times = report["frame_times"]
+        lines = [
+            f"{report['ticks']} ticks in {report['seconds']:.3f} s",
+            f"world hash {report['hash'][:16]}, "
+            + ("matches the recording" if report["matches"] else "DIFFERS"),
+        ]
+        if frame_times["frames"]:
+            lines.append(
+                f"{frame_times['frames']} frames, "
+                f"p50 {frame_times['p50_ms']:.2f} ms, "
+                f"p95 {frame_times['p95_ms']:.2f} ms, "
+                f"p99 {frame_times['p99_ms']:.2f} ms, "
+                f"max {frame_times['max_ms']:.2f} ms"
+            )
+        lines.append("")
+        lines.append(f"{'subsystem':<24}{'ms/tick':>10}")
+        for subsystem, ms_per_tick in report["subsystems"].items():
+            lines.append(f"{subsystem:<24}{ms_per_tick:>10.3f}")
+        return "\n".join(lines)
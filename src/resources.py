@@ -1,5 +1,7 @@
 import pyglet
 
+from .texture_atlas import TextureAtlasBuilder
+
 pyglet.resource.path = ["resources", "resources/tiles", "resources/audio"]
 pyglet.resource.reindex()
 
@@ -9,68 +11,78 @@ pyglet.image.Texture.default_mag_filter = pyglet.gl.GL_NEAREST
 
 background = pyglet.resource.image("background.jpg")
 
-# Load Spritesheets
-wall_spritesheet = pyglet.resource.image("tiles/walls.png")
-wall_seq = pyglet.image.ImageGrid(wall_spritesheet, 6, 9)
+# Sheet cell of each canonical autotile mask, counted from the bottom left
+WALL_CELLS = {
+    0: 9 * 2 + 6,
+    1: 9 * 5 + 5,
+    2: 9 * 5 + 6,
+    3: 9 * 4 + 1,
+    4: 9 * 4 + 6,
+    5: 9 * 5 + 2,
+    6: 9 * 4 + 0,
+    7: 9 * 5 + 4,
+    8: 9 * 4 + 5,
+    9: 9 * 5 + 1,
+    10: 9 * 4 + 2,
+    11: 9 * 4 + 4,
+    12: 9 * 5 + 0,
+    13: 9 * 5 + 3,
+    14: 9 * 4 + 3,
+    15: 9 * 3 + 7,
+    19: 9 * 4 + 8,
+    23: 9 * 0 + 5,
+    27: 9 * 0 + 3,
+    31: 9 * 0 + 1,
+    38: 9 * 4 + 7,
+    39: 9 * 0 + 4,
+    46: 9 * 0 + 2,
+    47: 9 * 0 + 0,
+    55: 9 * 2 + 5,
+    63: 9 * 3 + 2,
+    76: 9 * 5 + 7,
+    77: 9 * 1 + 4,
+    78: 9 * 1 + 2,
+    79: 9 * 1 + 0,
+    95: 9 * 1 + 6,
+    110: 9 * 3 + 4,
+    111: 9 * 2 + 3,
+    127: 9 * 3 + 1,
+    137: 9 * 5 + 8,
+    139: 9 * 1 + 3,
+    141: 9 * 1 + 5,
+    143: 9 * 1 + 1,
+    155: 9 * 3 + 5,
+    159: 9 * 2 + 2,
+    175: 9 * 0 + 6,
+    191: 9 * 3 + 0,
+    205: 9 * 2 + 4,
+    207: 9 * 3 + 3,
+    223: 9 * 2 + 0,
+    239: 9 * 2 + 1,
+    255: 9 * 3 + 6,
+}
+
+atlas_builder = TextureAtlasBuilder()
+atlas_builder.add_image("floor", "tiles/floor.png")
+atlas_builder.add_connected("wall", "tiles/walls.png", 6, 9, WALL_CELLS)
+atlas_builder.add_sheet_image("character", "character.png", 30, 8, 8 * 25 + 0)
+atlas_builder.add_image("highlight", "highlight.png")
+atlas = atlas_builder.build()
 
 structures = {
-    "floor": pyglet.resource.image("tiles/floor.png"),
-    "wall": {
-        0: pyglet.image.TextureGrid(wall_seq)[9 * 2 + 6],
-        1: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 5],
-        2: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 6],
-        3: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 1],
-        4: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 6],
-        5: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 2],
-        6: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 0],
-        7: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 4],
-        8: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 5],
-        9: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 1],
-        10: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 2],
-        11: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 4],
-        12: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 0],
-        13: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 3],
-        14: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 3],
-        15: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 7],
-        19: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 8],
-        23: pyglet.image.TextureGrid(wall_seq)[9 * 0 + 5],
-        27: pyglet.image.TextureGrid(wall_seq)[9 * 0 + 3],
-        31: pyglet.image.TextureGrid(wall_seq)[9 * 0 + 1],
-        38: pyglet.image.TextureGrid(wall_seq)[9 * 4 + 7],
-        39: pyglet.image.TextureGrid(wall_seq)[9 * 0 + 4],
-        46: pyglet.image.TextureGrid(wall_seq)[9 * 0 + 2],
-        47: pyglet.image.TextureGrid(wall_seq)[9 * 0 + 0],
-        55: pyglet.image.TextureGrid(wall_seq)[9 * 2 + 5],
-        63: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 2],
-        76: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 7],
-        77: pyglet.image.TextureGrid(wall_seq)[9 * 1 + 4],
-        78: pyglet.image.TextureGrid(wall_seq)[9 * 1 + 2],
-        79: pyglet.image.TextureGrid(wall_seq)[9 * 1 + 0],
-        95: pyglet.image.TextureGrid(wall_seq)[9 * 1 + 6],
-        110: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 4],
-        111: pyglet.image.TextureGrid(wall_seq)[9 * 2 + 3],
-        127: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 1],
-        137: pyglet.image.TextureGrid(wall_seq)[9 * 5 + 8],
-        139: pyglet.image.TextureGrid(wall_seq)[9 * 1 + 3],
-        141: pyglet.image.TextureGrid(wall_seq)[9 * 1 + 5],
-        143: pyglet.image.TextureGrid(wall_seq)[9 * 1 + 1],
-        155: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 5],
-        159: pyglet.image.TextureGrid(wall_seq)[9 * 2 + 2],
-        175: pyglet.image.TextureGrid(wall_seq)[9 * 0 + 6],
-        191: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 0],
-        205: pyglet.image.TextureGrid(wall_seq)[9 * 2 + 4],
-        207: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 3],
-        223: pyglet.image.TextureGrid(wall_seq)[9 * 2 + 0],
-        239: pyglet.image.TextureGrid(wall_seq)[9 * 2 + 1],
-        255: pyglet.image.TextureGrid(wall_seq)[9 * 3 + 6],
-    },
+    "floor": atlas.images["floor"],
+    # Region of every raw autotile mask
+    "wall": atlas.tables["wall"],
+}
+# For zoomed out tiles
+structure_colors = {
+    "floor": atlas.get_average_color("floor"),
+    "wall": atlas.get_average_color("wall"),
 }
 
-character_spritesheet = pyglet.resource.image("character.png")
-character_seq = pyglet.image.ImageGrid(character_spritesheet, 30, 8)
-character = pyglet.image.TextureGrid(character_seq)[8 * 25 + 0]
+character = atlas.images["character"]
 
-tile_highlighter = pyglet.resource.image("highlight.png")
+tile_highlighter = atlas.images["highlight"]
 
 audio = {
     "tile_changed": pyglet.resource.media("audio/tile_changed.wav", streaming=False),
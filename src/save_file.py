@@ -0,0 +1,261 @@
+"""
+Binary save files for the world
+"""
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+from .tile import Tile
+from .job import Job
+from .world import World
+from .events import WorldLoaded
+
+MAGIC = b"SBGSAVE\0"
+VERSION = 1
+# magic, version, header length, offset of the first array
+PRELUDE = struct.Struct("<8sIIQ")
+# Arrays start on multiples of this so they can be mapped as they are
+ALIGNMENT = 64
+
+
+class SaveFileError(Exception):
+    """
+    Raised when a file is not a save file this version can read
+    """
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def world_arrays(world: World) -> dict[str, np.ndarray]:
+    """Returns the state of the world as named contiguous arrays"""
+    grid = world.grid
+    chunks = list(grid.iter_chunks())
+    shape = (grid.layers, grid.chunk_size, grid.chunk_size)
+    jobs = list(world.jobs)
+    characters = world.characters
+    count = len(characters)
+
+    return {
+        "chunk_positions": np.array(
+            [chunk.position for chunk in chunks], dtype=np.int32
+        ).reshape(-1, 2),
+        "structure_ids": np.array(
+            [chunk.structure_ids for chunk in chunks], dtype=np.uint16
+        ).reshape(-1, *shape),
+        "build_state": np.array(
+            [chunk.build_state for chunk in chunks], dtype=np.uint8
+        ).reshape(-1, *shape),
+        "job_positions": np.array(
+            [job.tile.position for job in jobs], dtype=np.int32
+        ).reshape(-1, 2),
+        "job_type_ids": np.array(
+            [grid.type_ids[job.structure_type] for job in jobs], dtype=np.uint16
+        ),
+        "job_ids": np.array([job.id for job in jobs], dtype=np.int64),
+        "job_work_remaining": np.array(
+            [characters.get_work_remaining(job) for job in jobs], dtype=np.float32
+        ),
+        "character_current": characters.current[:count].copy(),
+        "character_destination": characters.destination[:count].copy(),
+        "character_progress": characters.progress[:count].copy(),
+        "character_speed": characters.speed[:count].copy(),
+        "character_build_speed": characters.build_speed[:count].copy(),
+    }
+
+
+def world_header(world: World) -> dict:
+    return {
+        "width": world.width,
+        "height": world.height,
+        "layers": world.grid.layers,
+        "chunk_size": world.grid.chunk_size,
+        "types": list(world.grid.type_names),
+        "next_job_id": world.next_job_id,
+    }
+
+
+def save_world(world: World, path: str) -> None:
+    write_save(path, world_header(world), world_arrays(world))
+
+
+def write_save(path: str, header: dict, arrays: dict[str, np.ndarray]) -> None:
+    """
+    Writes a JSON header describing where each array is, followed by the
+    arrays themselves
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        layout[name] = {
+            "offset": offset,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+        }
+        offset += array.nbytes
+
+    encoded_header = json.dumps({**header, "arrays": layout}).encode()
+    data_offset = _aligned(PRELUDE.size + len(encoded_header))
+
+    with open(path, "wb") as file:
+        file.write(PRELUDE.pack(MAGIC, VERSION, len(encoded_header), data_offset))
+        file.write(encoded_header)
+        for name, array in arrays.items():
+            file.seek(data_offset + layout[name]["offset"])
+            file.write(np.ascontiguousarray(array).tobytes())
+
+
+def read_save(path: str) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Returns the header and the arrays of a save file, mapped from disk. A
+    file that is cut short or damaged raises SaveFileError.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        prelude = file.read(PRELUDE.size)
+        if len(prelude) < PRELUDE.size:
+            raise SaveFileError(f"{path} is not a save file")
+        magic, version, header_length, data_offset = PRELUDE.unpack(prelude)
+        if magic != MAGIC:
+            raise SaveFileError(f"{path} is not a save file")
+        if version > VERSION:
+            raise SaveFileError(f"{path} is from a newer version ({version})")
+        encoded_header = file.read(header_length)
+
+    try:
+        header = json.loads(encoded_header)
+        arrays = {}
+        for name, entry in header["arrays"].items():
+            dtype = np.dtype(entry["dtype"])
+            shape = tuple(entry["shape"])
+            offset = data_offset + entry["offset"]
+            if offset + dtype.itemsize * math.prod(shape) > size:
+                raise SaveFileError(f"{path} is cut short in {name}")
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=offset, shape=shape
+            )
+    except (ValueError, KeyError, TypeError) as error:
+        # json.JSONDecodeError is a ValueError
+        raise SaveFileError(f"{path} is damaged: {error!r}") from error
+    return header, arrays
+
+
+def check_world_save(
+    world: World, path: str, header: dict, arrays: dict[str, np.ndarray]
+) -> np.ndarray:
+    """
+    Checks that a save fits the world before anything is replaced, returns
+    the type ids of the file mapped to the type ids of this world
+    """
+    if (header["width"], header["height"]) != (world.width, world.height):
+        raise SaveFileError(
+            f"{path} is a {header['width']}x{header['height']} world, "
+            f"not {world.width}x{world.height}"
+        )
+    grid = world.grid
+    if (header["layers"], header["chunk_size"]) != (grid.layers, grid.chunk_size):
+        raise SaveFileError(f"{path} has a different chunk layout")
+    if not isinstance(header["next_job_id"], int):
+        raise SaveFileError(f"{path} has no next job id")
+
+    chunks = len(arrays["chunk_positions"])
+    jobs = len(arrays["job_positions"])
+    characters = len(arrays["character_current"])
+    chunk_shape = (chunks, grid.layers, grid.chunk_size, grid.chunk_size)
+    shapes = {
+        "chunk_positions": (chunks, 2),
+        "structure_ids": chunk_shape,
+        "build_state": chunk_shape,
+        "job_positions": (jobs, 2),
+        "job_type_ids": (jobs,),
+        "job_ids": (jobs,),
+        "job_work_remaining": (jobs,),
+        "character_current": (characters, 2),
+        "character_destination": (characters, 2),
+        "character_progress": (characters,),
+        "character_speed": (characters,),
+        "character_build_speed": (characters,),
+    }
+    for name, shape in shapes.items():
+        if arrays[name].shape != shape:
+            raise SaveFileError(f"{path} has {name} of the wrong shape")
+
+    chunk_positions = arrays["chunk_positions"]
+    if chunks and (
+        chunk_positions.min() < 0
+        or chunk_positions[:, 0].max() >= grid.chunks_wide
+        or chunk_positions[:, 1].max() >= grid.chunks_high
+    ):
+        raise SaveFileError(f"{path} has chunks outside the world")
+
+    # Type ids of the file -> type ids of this world
+    type_ids = np.array(
+        [grid.type_ids.get(name, 0) for name in header["types"]], dtype=np.uint16
+    )
+    type_ids[0] = 0
+    if chunks and arrays["structure_ids"].max() >= len(type_ids):
+        raise SaveFileError(f"{path} has structures of unknown type ids")
+    if jobs:
+        job_type_ids = arrays["job_type_ids"]
+        if job_type_ids.max() >= len(type_ids) or not type_ids[job_type_ids].all():
+            raise SaveFileError(f"{path} has jobs of types this world does not have")
+    return type_ids
+
+
+def load_world(world: World, path: str) -> dict:
+    """
+    Replaces the state of the world with a save file. The tile arrays are
+    copied chunk by chunk and the autotile masks rebuilt in one pass, the
+    structure objects are only created when something asks for them. Then
+    WorldLoaded tells everything drawn from the world to rebuild. Returns the
+    header of the file.
+    """
+    header, arrays = read_save(path)
+    try:
+        type_ids = check_world_save(world, path, header, arrays)
+    except (KeyError, TypeError, ValueError, IndexError) as error:
+        raise SaveFileError(f"{path} is damaged: {error!r}") from error
+
+    grid = world.grid
+    # Nothing can fail from here on, the world is only replaced now
+    world.reset()
+
+    structure_ids = arrays["structure_ids"]
+    build_state = arrays["build_state"]
+    for i, (chunk_x, chunk_y) in enumerate(arrays["chunk_positions"].tolist()):
+        grid.load_chunk(chunk_x, chunk_y, type_ids[structure_ids[i]], build_state[i])
+    grid.recompute_masks()
+
+    for (x, y), type_id, job_id, work_remaining in zip(
+        arrays["job_positions"].tolist(),
+        type_ids[arrays["job_type_ids"]].tolist(),
+        arrays["job_ids"].tolist(),
+        arrays["job_work_remaining"].tolist(),
+    ):
+        blueprint = world.blueprints[grid.type_names[type_id]]
+        job = Job(Tile(x, y), blueprint, world.events, job_id)
+        job.work_remaining = work_remaining
+        world.jobs.add(job)
+    world.next_job_id = header["next_job_id"]
+
+    characters = world.characters
+    for x, y in arrays["character_current"].tolist():
+        characters.add(Tile(x, y))
+    count = len(characters)
+    characters.destination[:count] = arrays["character_destination"]
+    characters.progress[:count] = arrays["character_progress"]
+    characters.speed[:count] = arrays["character_speed"]
+    characters.build_speed[:count] = arrays["character_build_speed"]
+    characters.update_positions()
+    characters.previous_positions[:count] = characters.positions[:count]
+
+    world.events.publish(WorldLoaded())
+    return header
@@ -0,0 +1,101 @@
+"""
+Scenario class for setting up a world from a description
+"""
+import json
+import random
+
+from .world import World
+
+# A rect is the inclusive [x0, y0, x1, y1] of tiles
+Rect = tuple[int, int, int, int]
+
+
+class Scenario:
+    """
+    Scenario class
+
+    Describes a world to start from: its size, the structures already built,
+    the characters and the jobs waiting for them. Loaded from JSON like
+
+        {
+            "width": 256,
+            "height": 256,
+            "seed": 0,
+            "structures": [{"type": "floor", "rect": [0, 0, 63, 63]}],
+            "characters": {"count": 100, "rect": [0, 0, 63, 63]},
+            "jobs": [{"type": "wall", "rect": [10, 10, 20, 10]}]
+        }
+
+    Characters are spread over the walkable tiles of their rect at random,
+    the seed keeps runs repeatable.
+    """
+
+    def __init__(
+        self,
+        width: int = 256,
+        height: int = 256,
+        seed: int = 0,
+        structures: list[tuple[str, Rect]] | None = None,
+        character_count: int = 1,
+        character_rect: Rect | None = None,
+        jobs: list[tuple[str, Rect]] | None = None,
+    ):
+        self.width: int = width
+        self.height: int = height
+        self.seed: int = seed
+        self.structures: list[tuple[str, Rect]] = structures or []
+        self.character_count: int = character_count
+        self.character_rect: Rect = character_rect or (0, 0, width - 1, height - 1)
+        self.jobs: list[tuple[str, Rect]] = jobs or []
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Scenario":
+        characters = data.get("characters", 1)
+        if isinstance(characters, int):
+            characters = {"count": characters}
+
+        return cls(
+            width=data.get("width", 256),
+            height=data.get("height", 256),
+            seed=data.get("seed", 0),
+            structures=[
+                (entry["type"], tuple(entry["rect"]))
+                for entry in data.get("structures", [])
+            ],
+            character_count=characters.get("count", 1),
+            character_rect=(
+                tuple(characters["rect"]) if "rect" in characters else None
+            ),
+            jobs=[
+                (entry["type"], tuple(entry["rect"])) for entry in data.get("jobs", [])
+            ],
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "Scenario":
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+    def build(self) -> World:
+        world = World(self.width, self.height)
+        rng = random.Random(self.seed)
+
+        for type_, rect in self.structures:
+            world.place_structures(type_, world.get_tiles_in_rect(*rect))
+        world.events.dispatch()
+
+        # The world starts with one character of its own
+        spawn_tiles = [
+            tile
+            for tile in world.get_tiles_in_rect(*self.character_rect)
+            if world.pathfinder.grid_pathfinder.is_walkable(tile.x, tile.y)
+        ]
+        for _ in range(self.character_count - len(world.characters)):
+            world.characters.add(rng.choice(spawn_tiles))
+
+        for type_, rect in self.jobs:
+            for tile in world.get_tiles_in_rect(*rect):
+                world.create_job(tile, type_)
+        world.events.dispatch()
+
+        return world
@@ -0,0 +1,54 @@
+"""
+Fixed timestep simulation of the world
+"""
+from . import constants
+from .world import World
+
+
+class Simulation:
+    """
+    Simulation class
+
+    Runs the world at a fixed tick rate no matter how often it is advanced.
+    Frame time is collected in an accumulator and spent in whole ticks, at
+    most max_steps per frame. What is left over is the alpha that rendering
+    interpolates between the last two ticks with.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        rate: int = constants.SIMULATION_RATE,
+        max_steps: int = constants.MAX_SIMULATION_STEPS,
+    ):
+        self.world: World = world
+        self.rate: int = rate
+        self.step_dt: float = 1 / rate
+        self.max_steps: int = max_steps
+
+        self.accumulator: float = 0.0
+        self.ticks: int = 0
+
+    @property
+    def alpha(self) -> float:
+        """How far between the last tick and the next one the frame is"""
+        return self.accumulator / self.step_dt
+
+    def advance(self, dt: float) -> int:
+        """Runs the ticks that fit in the elapsed time, returns how many ran"""
+        self.accumulator += dt
+
+        steps = 0
+        while self.accumulator >= self.step_dt and steps < self.max_steps:
+            self.step()
+            self.accumulator -= self.step_dt
+            steps += 1
+
+        if self.accumulator >= self.step_dt:
+            # Too far behind, drop the lag instead of spiraling
+            self.accumulator %= self.step_dt
+        return steps
+
+    def step(self) -> None:
+        self.world.update(self.step_dt)
+        self.ticks += 1
@@ -0,0 +1,119 @@
+"""
+Simulation of the world on a worker process
+"""
+from time import perf_counter
+import atexit
+import multiprocessing
+import queue
+
+import numpy as np
+
+from . import constants
+from .tile import Tile
+from .world import World
+from .simulation_worker import (
+    Command,
+    Delta,
+    SnapshotBuffer,
+    apply_command,
+    run_worker,
+)
+
+
+def apply_delta(world: World, delta: Delta) -> None:
+    """Replays a tick of the worker on a world that does not simulate itself"""
+    _, commands, completed = delta
+    for command in commands:
+        apply_command(world, command)
+    for x, y in completed:
+        job = world.jobs.get(Tile(x, y))
+        if job:
+            job.complete_job()
+
+
+class SimulationProcess:
+    """
+    Simulation Process class
+
+    Runs a world at a fixed tick rate on a worker process so a slow tick does
+    not hold up drawing. Commands are sent to the worker over a queue. After
+    every tick that changed something the worker sends back a delta, the
+    commands it applied and the jobs it completed, which apply_delta replays
+    on a mirror world on this side. Character positions are published every
+    tick through a SnapshotBuffer.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        rate: int = constants.SIMULATION_RATE,
+        capacity: int = constants.SNAPSHOT_MAX_CHARACTERS,
+    ):
+        self.step_dt: float = 1 / rate
+        self.snapshots: SnapshotBuffer = SnapshotBuffer(capacity)
+
+        # The worker must not inherit the window and GL state
+        context = multiprocessing.get_context("spawn")
+        self.commands: multiprocessing.Queue = context.Queue()
+        self.deltas: multiprocessing.Queue = context.Queue()
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=run_worker,
+            args=(
+                width,
+                height,
+                rate,
+                self.snapshots.name,
+                capacity,
+                self.commands,
+                self.deltas,
+                self.stop_event,
+            ),
+            daemon=True,
+        )
+
+        self.tick: int = 0
+        self.snapshot_time: float = 0.0
+
+    @property
+    def alpha(self) -> float:
+        """How far past the latest snapshot drawing is, in ticks"""
+        return min((perf_counter() - self.snapshot_time) / self.step_dt, 1.0)
+
+    def start(self) -> None:
+        self.process.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.stop_event.set()
+            self.process.join(timeout=1.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self.snapshots is not None:
+            self.snapshots.close()
+            self.snapshots.unlink()
+            self.snapshots = None
+
+    def send(self, command: Command) -> None:
+        self.commands.put(command)
+
+    def receive_deltas(self) -> list[Delta]:
+        """Returns the deltas that have arrived without waiting for more"""
+        deltas = []
+        while True:
+            try:
+                deltas.append(self.deltas.get_nowait())
+            except queue.Empty:
+                return deltas
+
+    def read_snapshot(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """Returns the previous and current positions of a new snapshot"""
+        snapshot = self.snapshots.read()
+        if snapshot is None or snapshot[0] == self.tick:
+            return None
+
+        self.tick, previous, current = snapshot
+        self.snapshot_time = perf_counter()
+        return previous, current
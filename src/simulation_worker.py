@@ -0,0 +1,175 @@
+"""
+Entry point of the simulation worker process, it imports only the world and
+its simulation so a spawned worker does not load the game
+"""
+from multiprocessing import shared_memory
+from time import perf_counter, sleep
+import multiprocessing
+import queue
+
+import numpy as np
+
+from .tile import Tile
+from .world import World
+from .simulation import Simulation
+from .events import JobCompleted
+
+# latest buffer, sequence per buffer, tick per buffer, count per buffer
+HEADER_LENGTH = 7
+NO_SNAPSHOT = -1
+
+# Commands change the world the same way on both processes, they are
+# ("create_jobs", type_, positions) or ("cancel_jobs", positions)
+Command = tuple
+# Sent back after every tick that changed something:
+# (tick, commands applied before the tick, positions of the jobs completed)
+Delta = tuple[int, list[Command], list[tuple[int, int]]]
+
+
+def apply_command(world: World, command: Command) -> None:
+    name, *args = command
+    if name == "create_jobs":
+        type_, positions = args
+        for x, y in positions:
+            tile = world.get_tile_at(x, y)
+            if tile and world.is_structure_valid_position(type_, tile):
+                world.create_job(tile, type_)
+    elif name == "cancel_jobs":
+        (positions,) = args
+        for x, y in positions:
+            world.cancel_job(Tile(x, y))
+    else:
+        raise ValueError(f"Unknown command {name}")
+
+
+class SnapshotBuffer:
+    """
+    Snapshot Buffer class
+
+    Two snapshots of the character positions in shared memory. The worker
+    writes the snapshot the reader is not pointed at and then flips to it, so
+    the reader finds a complete snapshot without taking a lock. A sequence
+    number per snapshot, odd while it is written, tells the reader when a
+    copy raced a write.
+    """
+
+    def __init__(self, capacity: int, name: str | None = None):
+        self.capacity: int = capacity
+        header_size = HEADER_LENGTH * np.dtype(np.int64).itemsize
+        # [snapshot, previous or current, character, x or y]
+        data_shape = (2, 2, capacity, 2)
+        size = header_size + int(np.prod(data_shape)) * np.dtype(np.float32).itemsize
+
+        create = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.header: np.ndarray = np.ndarray(
+            (HEADER_LENGTH,), dtype=np.int64, buffer=self.memory.buf
+        )
+        self.data: np.ndarray = np.ndarray(
+            data_shape, dtype=np.float32, buffer=self.memory.buf, offset=header_size
+        )
+        if create:
+            self.header[:] = 0
+            self.header[0] = NO_SNAPSHOT
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def write(self, tick: int, previous: np.ndarray, current: np.ndarray) -> None:
+        latest = self.header[0]
+        snapshot = 0 if latest == NO_SNAPSHOT else 1 - latest
+        count = min(len(current), self.capacity)
+
+        self.header[1 + snapshot] += 1
+        self.data[snapshot, 0, :count] = previous[:count]
+        self.data[snapshot, 1, :count] = current[:count]
+        self.header[3 + snapshot] = tick
+        self.header[5 + snapshot] = count
+        self.header[1 + snapshot] += 1
+
+        self.header[0] = snapshot
+
+    def read(self) -> tuple[int, np.ndarray, np.ndarray] | None:
+        """
+        Returns the tick, previous and current positions of the latest
+        snapshot, or None when there is none or it was written while copying
+        """
+        snapshot = int(self.header[0])
+        if snapshot == NO_SNAPSHOT:
+            return None
+
+        sequence = int(self.header[1 + snapshot])
+        if sequence % 2:
+            return None
+        tick = int(self.header[3 + snapshot])
+        count = int(self.header[5 + snapshot])
+        previous = self.data[snapshot, 0, :count].copy()
+        current = self.data[snapshot, 1, :count].copy()
+        if self.header[1 + snapshot] != sequence:
+            return None
+        return tick, previous, current
+
+    def close(self) -> None:
+        # The arrays point into the shared memory and have to go first
+        del self.header
+        del self.data
+        self.memory.close()
+
+    def unlink(self) -> None:
+        self.memory.unlink()
+
+
+def run_worker(
+    width: int,
+    height: int,
+    rate: int,
+    snapshot_name: str,
+    capacity: int,
+    commands: multiprocessing.Queue,
+    deltas: multiprocessing.Queue,
+    stop_event,
+) -> None:
+    """Runs the world at the tick rate until stop_event is set"""
+    world = World(width, height)
+    simulation = Simulation(world, rate)
+    snapshots = SnapshotBuffer(capacity, snapshot_name)
+
+    completed: list[tuple[int, int]] = []
+    world.events.subscribe(
+        JobCompleted,
+        lambda events: completed.extend(event.job.tile.position for event in events),
+    )
+
+    next_tick = perf_counter()
+    while not stop_event.is_set():
+        applied = []
+        while True:
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                break
+            apply_command(world, command)
+            applied.append(command)
+
+        simulation.step()
+
+        count = len(world.characters)
+        snapshots.write(
+            simulation.ticks,
+            world.characters.previous_positions[:count],
+            world.characters.positions[:count],
+        )
+        if applied or completed:
+            deltas.put((simulation.ticks, applied, list(completed)))
+            completed.clear()
+
+        next_tick += simulation.step_dt
+        delay = next_tick - perf_counter()
+        if delay > 0:
+            sleep(delay)
+        elif -delay > simulation.max_steps * simulation.step_dt:
+            # Too far behind, drop the lag instead of spiraling
+            next_tick = perf_counter()
+
+    snapshots.close()
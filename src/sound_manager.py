@@ -7,6 +7,7 @@ from . import resources
 from .world_manager import WorldManager
 from .input_manager import InputManager
 from .manager import Manager
+from .events import StructuresChanged
 
 
 class SoundManager(Manager):
@@ -20,13 +21,13 @@ class SoundManager(Manager):
     def init(self, world_manager: WorldManager) -> None:
         self.world_manager: WorldManager = world_manager
 
-        self.world_manager.world.subscribe_on_structure_changed(
-            self.on_structure_changed
+        self.world_manager.world.events.subscribe(
+            StructuresChanged, self.on_structures_changed
         )
 
         self.structure_player = pyglet.media.Player()
 
-    def on_structure_changed(self, structure) -> None:
+    def on_structures_changed(self, events: list[StructuresChanged]) -> None:
         self.structure_player.queue(resources.audio["tile_changed"])
         self.structure_player.next_source()
         self.structure_player.play()
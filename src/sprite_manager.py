@@ -1,6 +1,9 @@
 """
 Sprite Manager
 """
+from itertools import chain
+
+import numpy as np
 import pyglet
 from pyglet.sprite import Sprite
 
@@ -9,11 +12,24 @@ from . import resources
 from .world import World
 from .tile import Tile
 from .structure import Structure
+from .structure_images import StructureImages
+from .tilemap_renderer import TilemapRenderer
+from .chunk_cache import ChunkCache
+from .tile_colors import TileColors
+from .lod_renderer import LODRenderer
 from .job import Job
 from .world_manager import WorldManager
-from .character import Character
+from .camera_manager import CameraManager
+from .events import (
+    StructuresChanged,
+    JobCreated,
+    JobCompleted,
+    JobCancelled,
+    WorldLoaded,
+)
 
 from .manager import Manager
+from .memory_tracker import estimate_bytes
 
 
 class SpriteManager(Manager):
@@ -24,37 +40,57 @@ class SpriteManager(Manager):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def init(self, world_manager: WorldManager) -> None:
+    def init(self, world_manager: WorldManager, camera_manager: CameraManager) -> None:
         self.world_manager: WorldManager = world_manager
+        self.camera_manager: CameraManager = camera_manager
+        # Characters and everything else that moves or is not on a tile
         self.batch = pyglet.graphics.Batch()
+        # Jobs are batched by chunk, only the batches of the chunks on screen
+        # are drawn
+        self.chunk_batches: dict[tuple[int, int], pyglet.graphics.Batch] = {}
+        self.visible_chunks: list[tuple[int, int]] = []
+        self.visible_rect: tuple[int, int, int, int] = (0, 0, -1, -1)
         self.background_group = pyglet.graphics.OrderedGroup(0)
         self.forground_group = pyglet.graphics.OrderedGroup(1)
         self.gui_group = pyglet.graphics.OrderedGroup(2)
 
-        self.structure_sprites: dict[Structure, pyglet.sprite.Sprite] = {}
         self.job_sprites: dict[Job, pyglet.sprite.Sprite] = {}
-        self.character_sprites: dict[Character, pyglet.sprite.Sprite] = {}
+        # Indexed like the characters of the world
+        self.character_sprites: list[pyglet.sprite.Sprite] = []
+        self.character_visible: np.ndarray = np.zeros(0, dtype=bool)
 
         self.world = self.world_manager.world
 
-        self.world.subscribe_on_structure_changed(self.on_structure_changed)
-        self.world.subscribe_on_job_created(self.on_job_created)
-        self.world.subscribe_on_job_completed(self.on_job_completed)
+        self.structure_images: StructureImages = StructureImages(
+            self.world, resources.structures
+        )
+        # Structures are drawn by the tilemap, only what changes or moves
+        # gets a sprite
+        self.tilemap: TilemapRenderer = TilemapRenderer(
+            self.world, self.structure_images
+        )
+        self.chunk_cache: ChunkCache | None = None
+        if constants.CHUNK_CACHE_ENABLED:
+            if ChunkCache.is_supported():
+                self.chunk_cache = ChunkCache(self.tilemap)
+            else:
+                print("Framebuffers are not supported, chunks are drawn directly")
+        # Zoomed out chunks are drawn as a color per tile
+        self.lod: LODRenderer = LODRenderer(
+            self.world, TileColors(self.world, resources.structure_colors)
+        )
+
+        self.world.events.subscribe(StructuresChanged, self.on_structures_changed)
+        self.world.events.subscribe(JobCreated, self.on_jobs_created)
+        self.world.events.subscribe(JobCompleted, self.on_jobs_finished)
+        self.world.events.subscribe(JobCancelled, self.on_jobs_finished)
+        self.world.events.subscribe(WorldLoaded, self.on_world_loaded)
 
         self.create_sprites()
 
     def create_sprites(self) -> None:
         # TODO: create dynamic ordering system aka groups
-        for structure in self.world_manager.world.structures.values():
-            if structure:
-                sprite = Sprite(
-                    self.get_image_for_structure(structure),
-                    structure.tile.x * constants.TILE_SIZE,
-                    structure.tile.y * constants.TILE_SIZE,
-                    batch=self.batch,
-                    group=self.background_group,
-                )
-                self.structure_sprites[structure] = sprite
+        self.tilemap.build()
 
         for character in self.world.characters:
             sprite = Sprite(
@@ -64,186 +100,151 @@ class SpriteManager(Manager):
                 batch=self.batch,
                 group=self.forground_group,
             )
-            self.character_sprites[character] = sprite
-
-    def get_image_for_job(self, job: Job):
-        # TODO: merge this with get_image_for_structure
-        structure = job.blueprint
-
-        if job.blueprint.connected_texture:
-            x = job.tile.x
-            y = job.tile.y
-            index = 0
-
-            world = self.world_manager.world
-
-            w = world.get_tile_at(x - 1, y + 0)
-            n = world.get_tile_at(x + 0, y + 1)
-            e = world.get_tile_at(x + 1, y + 0)
-            s = world.get_tile_at(x + 0, y - 1)
-            nw = world.get_tile_at(x - 1, y + 1)
-            ne = world.get_tile_at(x + 1, y + 1)
-            se = world.get_tile_at(x + 1, y - 1)
-            sw = world.get_tile_at(x - 1, y - 1)
-
-            # Check neighbors
-            if w in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[w]):
-                    index += 1
-            if n in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[n]):
-                    index += 2
-            if e in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[e]):
-                    index += 4
-            if s in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[s]):
-                    index += 8
-            if nw in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[nw])
-                    and structure.type_ in (s.type_ for s in world.structures[n])
-                    and structure.type_ in (s.type_ for s in world.structures[w])
-                ):
-                    index += 16
-            if ne in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[ne])
-                    and structure.type_ in (s.type_ for s in world.structures[n])
-                    and structure.type_ in (s.type_ for s in world.structures[e])
-                ):
-                    index += 32
-            if se in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[se])
-                    and structure.type_ in (s.type_ for s in world.structures[s])
-                    and structure.type_ in (s.type_ for s in world.structures[e])
-                ):
-                    index += 64
-            if sw in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[sw])
-                    and structure.type_ in (s.type_ for s in world.structures[s])
-                    and structure.type_ in (s.type_ for s in world.structures[w])
-                ):
-                    index += 128
-
-            if index in resources.structures[structure.type_]:
-                image = resources.structures[structure.type_][index]
-            else:
-                image = resources.structures[structure.type_][0]
-            return image
-        else:
-            return resources.structures[structure.type_]
-
-    def get_image_for_structure(self, structure: Structure):
-        if structure.connected_texture:
-            x = structure.tile.x
-            y = structure.tile.y
-            index = 0
-
-            world = self.world_manager.world
-
-            w = world.get_tile_at(x - 1, y + 0)
-            n = world.get_tile_at(x + 0, y + 1)
-            e = world.get_tile_at(x + 1, y + 0)
-            s = world.get_tile_at(x + 0, y - 1)
-            nw = world.get_tile_at(x - 1, y + 1)
-            ne = world.get_tile_at(x + 1, y + 1)
-            se = world.get_tile_at(x + 1, y - 1)
-            sw = world.get_tile_at(x - 1, y - 1)
-
-            # Check neighbors
-            if w in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[w]):
-                    index += 1
-            if n in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[n]):
-                    index += 2
-            if e in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[e]):
-                    index += 4
-            if s in world.structures:
-                if structure.type_ in (s.type_ for s in world.structures[s]):
-                    index += 8
-            if nw in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[nw])
-                    and structure.type_ in (s.type_ for s in world.structures[n])
-                    and structure.type_ in (s.type_ for s in world.structures[w])
-                ):
-                    index += 16
-            if ne in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[ne])
-                    and structure.type_ in (s.type_ for s in world.structures[n])
-                    and structure.type_ in (s.type_ for s in world.structures[e])
-                ):
-                    index += 32
-            if se in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[se])
-                    and structure.type_ in (s.type_ for s in world.structures[s])
-                    and structure.type_ in (s.type_ for s in world.structures[e])
-                ):
-                    index += 64
-            if sw in world.structures:
-                if (
-                    structure.type_ in (s.type_ for s in world.structures[sw])
-                    and structure.type_ in (s.type_ for s in world.structures[s])
-                    and structure.type_ in (s.type_ for s in world.structures[w])
-                ):
-                    index += 128
-
-            if index in resources.structures[structure.type_]:
-                image = resources.structures[structure.type_][index]
-            else:
-                image = resources.structures[structure.type_][0]
-            return image
-        else:
-            return resources.structures[structure.type_]
-
-    def on_structure_changed(self, structure: Structure) -> None:
-        if structure in self.structure_sprites:
-            self.structure_sprites[structure].image = self.get_image_for_structure(
-                structure
-            )
-            return
-
-        x = structure.tile.x
-        y = structure.tile.y
-
-        if structure not in self.structure_sprites:
-            sprite = Sprite(
-                self.get_image_for_structure(structure),
-                x * constants.TILE_SIZE,
-                y * constants.TILE_SIZE,
-                batch=self.batch,
-                group=self.background_group,
-            )
-            self.structure_sprites[structure] = sprite
+            self.character_sprites.append(sprite)
 
-    def on_job_created(self, job: Job) -> None:
-        x = job.tile.x
-        y = job.tile.y
+    def get_chunk_batch(self, chunk_position: tuple[int, int]) -> pyglet.graphics.Batch:
+        batch = self.chunk_batches.get(chunk_position)
+        if batch is None:
+            batch = pyglet.graphics.Batch()
+            self.chunk_batches[chunk_position] = batch
+        return batch
 
+    def get_image_for_job(self, job: Job):
+        return self.get_connected_image(job.blueprint, job.tile)
+
+    def get_connected_image(self, structure: Structure, tile: Tile):
+        return self.structure_images.get(structure, tile)
+
+    def on_structures_changed(self, events: list[StructuresChanged]) -> None:
+        tiles = set()
+        for event in events:
+            tiles.update(event.tiles)
+        self.tilemap.update_tiles(tiles)
+        self.lod.update_tiles(tiles)
+        if self.chunk_cache is not None:
+            self.chunk_cache.invalidate(tiles)
+
+    def on_jobs_created(self, events: list[JobCreated]) -> None:
+        for event in events:
+            if not event.job.finished:
+                self.create_job_sprite(event.job)
+
+    def create_job_sprite(self, job: Job) -> None:
         sprite = Sprite(
             self.get_image_for_job(job),
-            x * constants.TILE_SIZE,
-            y * constants.TILE_SIZE,
-            batch=self.batch,
+            job.tile.x * constants.TILE_SIZE,
+            job.tile.y * constants.TILE_SIZE,
+            batch=self.get_chunk_batch(
+                self.world.grid.chunk_position_at(job.tile.x, job.tile.y)
+            ),
             group=self.forground_group,
         )
         # sprite.color = (255, 0, 0)
         sprite.opacity = 128
         self.job_sprites[job] = sprite
 
-    def on_job_completed(self, job: Job) -> None:
-        del self.job_sprites[job]
+    def on_world_loaded(self, events: list[WorldLoaded]) -> None:
+        for sprite in chain(self.job_sprites.values(), self.character_sprites):
+            sprite.delete()
+        self.tilemap.clear()
+        self.lod.clear()
+        if self.chunk_cache is not None:
+            self.chunk_cache.clear()
+        self.job_sprites.clear()
+        self.character_sprites.clear()
+        self.chunk_batches.clear()
 
-    def update(self, dt) -> None:
-        for character, sprite in self.character_sprites.items():
-            sprite.x = character.x * constants.TILE_SIZE - constants.TILE_SIZE // 2
-            sprite.y = character.y * constants.TILE_SIZE + constants.TILE_SIZE // 2
+        self.create_sprites()
+        for job in self.world.jobs:
+            self.create_job_sprite(job)
+
+    def on_jobs_finished(self, events: list[JobCompleted | JobCancelled]) -> None:
+        for event in events:
+            sprite = self.job_sprites.pop(event.job, None)
+            if sprite:
+                sprite.delete()
+
+    def measure_sprites(self) -> tuple[int, int]:
+        sprites = [*self.job_sprites.values(), *self.character_sprites]
+        return len(sprites), estimate_bytes(sprites)
+
+    @staticmethod
+    def measure_textures() -> tuple[int, int]:
+        """Counts the textures behind the images of the resources"""
+        textures = {}
+        images = list(vars(resources).values())
+        while images:
+            image = images.pop()
+            if isinstance(image, dict):
+                images.extend(image.values())
+                continue
+            if isinstance(image, list):
+                images.extend(image)
+                continue
+            if not isinstance(image, pyglet.image.AbstractImage):
+                continue
+            texture = image.get_texture()
+            # Regions share the texture of their atlas or grid
+            texture = getattr(texture, "owner", None) or texture
+            textures[id(texture)] = texture.width * texture.height * 4
+        return len(textures), sum(textures.values())
+
+    def update_visible_chunks(self) -> None:
+        """Finds the chunks under the camera and the culling margin"""
+        self.visible_rect = self.camera_manager.camera.get_visible_rect(
+            constants.CULLING_MARGIN
+        )
+        x0, y0, x1, y1 = self.visible_rect
+        chunk_x0, chunk_y0 = self.world.grid.chunk_position_at(x0, y0)
+        chunk_x1, chunk_y1 = self.world.grid.chunk_position_at(x1, y1)
+        self.visible_chunks = [
+            (chunk_x, chunk_y)
+            for chunk_x in range(chunk_x0, chunk_x1 + 1)
+            for chunk_y in range(chunk_y0, chunk_y1 + 1)
+        ]
+
+    def update_character_sprites(self) -> None:
+        """Moves the characters on screen and hides the rest"""
+        count = len(self.character_sprites)
+        if len(self.character_visible) != count:
+            self.character_visible = np.ones(count, dtype=bool)
+
+        # Drawn between the last two simulation ticks
+        positions = self.world.characters.interpolated_positions(
+            self.world_manager.alpha
+        )[:count]
+        x0, y0, x1, y1 = self.visible_rect
+        visible = (
+            (positions[:, 0] >= x0)
+            & (positions[:, 0] <= x1 + 1)
+            & (positions[:, 1] >= y0)
+            & (positions[:, 1] <= y1 + 1)
+        )
+
+        for index in np.flatnonzero(visible != self.character_visible).tolist():
+            self.character_sprites[index].visible = bool(visible[index])
+        self.character_visible = visible
+
+        indices = np.flatnonzero(visible)
+        positions = positions[indices] * constants.TILE_SIZE
+        for index, (x, y) in zip(indices.tolist(), positions.tolist()):
+            self.character_sprites[index].update(
+                x=x - constants.TILE_SIZE // 2, y=y + constants.TILE_SIZE // 2
+            )
 
-        pass
+    def draw(self) -> None:
+        if self.camera_manager.camera.zoom < constants.LOD_ZOOM:
+            self.lod.draw(self.visible_chunks)
+        elif self.chunk_cache is not None:
+            self.chunk_cache.draw(self.visible_chunks)
+        else:
+            self.tilemap.draw(self.visible_chunks)
+        for chunk_position in self.visible_chunks:
+            batch = self.chunk_batches.get(chunk_position)
+            if batch is not None:
+                batch.draw()
+        self.batch.draw()
+
+    def update(self, dt) -> None:
+        self.update_visible_chunks()
+        self.update_character_sprites()
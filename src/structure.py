@@ -18,6 +18,7 @@ class Structure:
         connected_texture: bool = False,
         layer_order: int = 0,  # background: 0, forground:1, gui: 2
         build_time: int = 10,
+        layer: int = 0,  # tile grid layer, floor: 0, wall: 1
     ):
         self.type_: str = type_
         self.movement_speed: float = movement_speed
@@ -27,34 +28,26 @@ class Structure:
         self.connected_texture: bool = connected_texture
         self.layer_order: int = layer_order
         self.build_time: int = build_time
+        self.layer: int = layer
 
         self.constructed: bool = False
 
         # Valid placement
         self.structure_types_needs_to_be_under: list[str] = []
 
-        self._on_changed_callbacks = set()
-
-    # Subscriptions
-    def subscribe_on_changed(self, fn) -> None:
-        self._on_changed_callbacks.add(fn)
-
-    def unsubscribe_on_structure_changed(self, fn) -> None:
-        self._on_changed_callbacks.remove(fn)
-
-    def is_valid_position(self, structures_at_tile: list["structure"]) -> bool:
+    def is_valid_position(self, structure_types_at_tile: list[str]) -> bool:
         if "empty" in self.structure_types_needs_to_be_under:
-            if structures_at_tile:
+            if structure_types_at_tile:
                 return False
             else:
                 return True
 
-        if self.type_ in (s.type_ for s in structures_at_tile):
+        if self.type_ in structure_types_at_tile:
             return False
 
         if self.structure_types_needs_to_be_under:
             for type_ in self.structure_types_needs_to_be_under:
-                if type_ not in (s.type_ for s in structures_at_tile):
+                if type_ not in structure_types_at_tile:
                     return False
 
         return True
@@ -68,6 +61,7 @@ class Structure:
         height: int = 1,
         connected_texture: bool = False,
         build_time: int = 10,
+        layer: int = 0,
     ) -> "Structure":
         """Creates the blueprint"""
         # TODO: maybe create a blueprint class
@@ -78,6 +72,7 @@ class Structure:
             height=height,
             connected_texture=connected_texture,
             build_time=build_time,
+            layer=layer,
         )
 
         blueprint.structure_types_needs_to_be_under = structure_types_needs_to_be_under
@@ -92,13 +87,11 @@ class Structure:
             width=blueprint.width,
             height=blueprint.height,
             connected_texture=blueprint.connected_texture,
+            layer=blueprint.layer,
         )
 
         # TODO: fill the tiles list
         structure.tile = tile
         structure.completed = True
 
-        for callback in structure._on_changed_callbacks:
-            callback(structure)
-
         return structure
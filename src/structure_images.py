@@ -0,0 +1,34 @@
+"""
+Structure Images class for picking the image a structure is drawn with
+"""
+from .world import World
+from .tile import Tile
+from .structure import Structure
+
+
+class StructureImages:
+    """
+    Structure Images class
+
+    Picks the image of a structure from the structure images of the
+    resources. Connected textures are tables of the image of each of the
+    256 autotile masks so the lookup is one index. Knows nothing about
+    pyglet, any objects work as images.
+    """
+
+    def __init__(self, world: World, images: dict):
+        self.world: World = world
+        self.images: dict = images
+        # Autotile mask -> image lookup table per connected texture type
+        self.connected_images: dict[str, list] = {
+            type_: images
+            for type_, images in images.items()
+            if isinstance(images, list)
+        }
+
+    def get(self, structure: Structure, tile: Tile):
+        if structure.connected_texture:
+            index = self.world.get_neighbor_mask(tile, structure.type_)
+            return self.connected_images[structure.type_][index]
+        else:
+            return self.images[structure.type_]
@@ -0,0 +1,222 @@
+"""
+Texture Atlas builder for packing the game images into one cached texture
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pyglet
+
+from . import constants
+from .autotile import CANONICAL_MASKS
+from .save_file import read_save, write_save
+
+# Changes whenever the packing or the cached layout does
+ATLAS_VERSION = 1
+# Empty pixels around every image so a neighbor is never sampled
+PADDING = 1
+
+
+def load_pixels(path: str) -> np.ndarray:
+    """Returns a resource image as [y, x, rgba] with the bottom row first"""
+    image = pyglet.image.load(path, file=pyglet.resource.file(path))
+    pixels = np.frombuffer(image.get_data("RGBA", image.width * 4), np.uint8)
+    return pixels.reshape(image.height, image.width, 4)
+
+
+class Atlas:
+    """
+    Atlas class
+
+    The texture of a built atlas with a region for every named image and a
+    region for every raw autotile mask of every connected texture.
+    """
+
+    def __init__(self, header: dict, pixels: np.ndarray):
+        self.header: dict = header
+        self.pixels: np.ndarray = pixels
+        height, width = pixels.shape[:2]
+        self.texture: pyglet.image.Texture = pyglet.image.ImageData(
+            width, height, "RGBA", pixels.tobytes()
+        ).get_texture()
+        regions = [self.texture.get_region(*rect) for rect in header["regions"]]
+        self.images: dict[str, pyglet.image.TextureRegion] = {
+            name: regions[index] for name, index in header["images"].items()
+        }
+        # Connected texture type -> region of each raw mask
+        self.tables: dict[str, list[pyglet.image.TextureRegion]] = {
+            type_: [regions[index] for index in table]
+            for type_, table in header["tables"].items()
+        }
+
+    def get_average_color(self, name: str) -> tuple[int, int, int, int]:
+        """Mean color of the opaque pixels of an image or connected texture"""
+        indices = set(self.header["tables"].get(name, []))
+        if not indices:
+            indices = {self.header["images"][name]}
+        pixels = np.concatenate(
+            [
+                self.pixels[y : y + height, x : x + width].reshape(-1, 4)
+                for x, y, width, height in (
+                    self.header["regions"][index] for index in sorted(indices)
+                )
+            ]
+        )
+        opaque = pixels[pixels[:, 3] > 0, :3]
+        red, green, blue = opaque.mean(axis=0).astype(int).tolist()
+        return red, green, blue, 255
+
+
+class TextureAtlasBuilder:
+    """
+    Texture Atlas Builder class
+
+    Collects images, whole files or cells of a sprite sheet, and packs the
+    cells that are used into one texture on shelves. A connected texture
+    gives the sheet cell of every canonical autotile mask and gets a dense
+    table of all 256 raw masks, a mask without a cell is an error when the
+    atlas is built instead of a fallback when it is drawn.
+
+    The packed pixels and tables are cached in one file together with a
+    hash of the sources and their files, a start with the same files loads
+    the texture from it without decoding or packing anything.
+    """
+
+    def __init__(
+        self,
+        cache_path: str = constants.ATLAS_CACHE_PATH,
+        width: int = constants.ATLAS_WIDTH,
+    ):
+        self.cache_path: str = cache_path
+        self.width: int = width
+        self.sources: list[dict] = []
+
+    def add_image(self, name: str, path: str) -> None:
+        self.add_sheet_image(name, path, 1, 1, 0)
+
+    def add_sheet_image(
+        self, name: str, path: str, rows: int, columns: int, index: int
+    ) -> None:
+        """Adds a cell of a sprite sheet, indexed from the bottom left"""
+        self.sources.append(
+            {"path": path, "rows": rows, "columns": columns, "images": {name: index}}
+        )
+
+    def add_connected(
+        self, type_: str, path: str, rows: int, columns: int, cells: dict[int, int]
+    ) -> None:
+        """Adds a connected texture from its canonical mask -> sheet cell"""
+        self.sources.append(
+            {
+                "path": path,
+                "rows": rows,
+                "columns": columns,
+                "connected": type_,
+                "cells": cells,
+            }
+        )
+
+    def get_key(self) -> str:
+        key = hashlib.sha256()
+        key.update(json.dumps([ATLAS_VERSION, PADDING, self.width]).encode())
+        key.update(json.dumps(self.sources, sort_keys=True).encode())
+        for path in sorted({source["path"] for source in self.sources}):
+            with pyglet.resource.file(path) as file:
+                key.update(file.read())
+        return key.hexdigest()
+
+    def build(self) -> Atlas:
+        key = self.get_key()
+        try:
+            header, arrays = read_save(self.cache_path)
+            if header.get("key") == key:
+                return Atlas(header, np.array(arrays["pixels"]))
+        except Exception as error:
+            # Anything wrong with the cache only means packing again
+            if not isinstance(error, FileNotFoundError):
+                print(f"Texture atlas cache not used: {error!r}")
+
+        header, pixels = self.pack()
+        header["key"] = key
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            # A write that is cut short never replaces a whole cache
+            temporary_path = self.cache_path + ".tmp"
+            write_save(temporary_path, header, {"pixels": pixels})
+            os.replace(temporary_path, self.cache_path)
+        except OSError as error:
+            # The next start packs again
+            print(f"Texture atlas not cached: {error}")
+        return Atlas(header, pixels)
+
+    def pack(self) -> tuple[dict, np.ndarray]:
+        """Packs the cells that are used, returns the header and the pixels"""
+        sheets = {}
+        # Sheet path, cell index -> region index, each cell is packed once
+        cell_regions: dict[tuple[str, int], int] = {}
+        cells: list[np.ndarray] = []
+
+        def get_region(source: dict, index: int) -> int:
+            path = source["path"]
+            if (path, index) not in cell_regions:
+                if path not in sheets:
+                    sheets[path] = load_pixels(path)
+                sheet = sheets[path]
+                height = sheet.shape[0] // source["rows"]
+                width = sheet.shape[1] // source["columns"]
+                row, column = divmod(index, source["columns"])
+                cell_regions[path, index] = len(cells)
+                cells.append(
+                    sheet[
+                        row * height : (row + 1) * height,
+                        column * width : (column + 1) * width,
+                    ]
+                )
+            return cell_regions[path, index]
+
+        images = {}
+        tables = {}
+        for source in self.sources:
+            for name, index in source.get("images", {}).items():
+                images[name] = get_region(source, index)
+            if "connected" in source:
+                sheet_cells = source["cells"]
+                missing = set(CANONICAL_MASKS.tolist()) - set(sheet_cells)
+                if missing:
+                    raise ValueError(
+                        f"{source['path']} has no cell for the masks {sorted(missing)}"
+                    )
+                tables[source["connected"]] = [
+                    get_region(source, sheet_cells[mask])
+                    for mask in CANONICAL_MASKS.tolist()
+                ]
+
+        regions, atlas_height = self.place(cells)
+        pixels = np.zeros((atlas_height, self.width, 4), dtype=np.uint8)
+        for (x, y, width, height), cell in zip(regions, cells):
+            pixels[y : y + height, x : x + width] = cell
+        header = {"regions": regions, "images": images, "tables": tables}
+        return header, pixels
+
+    def place(self, cells: list[np.ndarray]) -> tuple[list[list[int]], int]:
+        """
+        Places the cells on shelves, tallest first, returns their x, y,
+        width, height and the power of two height of the atlas
+        """
+        regions = [[0, 0, 0, 0] for _ in cells]
+        x = y = shelf_height = 0
+        for index in sorted(range(len(cells)), key=lambda i: -cells[i].shape[0]):
+            height, width = cells[index].shape[:2]
+            if width + 2 * PADDING > self.width:
+                raise ValueError(f"An image is wider than the {self.width} atlas")
+            if x + width + 2 * PADDING > self.width:
+                x = 0
+                y += shelf_height
+                shelf_height = 0
+            regions[index] = [x + PADDING, y + PADDING, width, height]
+            x += width + 2 * PADDING
+            shelf_height = max(shelf_height, height + 2 * PADDING)
+
+        used = y + shelf_height
+        return regions, 1 << max(used - 1, 0).bit_length()
@@ -22,6 +22,17 @@ class Tile:
     def position(self, value: tuple) -> None:
         self.x, self.y = value
 
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Tile):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+
+    def __hash__(self) -> int:
+        return hash((self.x, self.y))
+
+    def __repr__(self) -> str:
+        return f"Tile({self.x}, {self.y})"
+
     def is_neighbor(self, tile: "Tile", check_diagonal: bool = False) -> bool:
         if abs(self.x - tile.x) + abs(self.y - tile.y) == 1:
             return True
@@ -0,0 +1,112 @@
+"""
+Tile Colors class for flat color images of the tile grid
+"""
+import numpy as np
+
+from .world import World
+from .chunk import Chunk
+
+# Color of a tile that has nothing built on it
+EMPTY_COLOR = (0, 0, 0, 0)
+
+
+class TileColors:
+    """
+    Tile Colors class
+
+    Turns the structure type ids of the tile grid into one color per tile,
+    the color of the structure on the highest layer, for the zoomed out
+    chunks and the minimap. Images are [y, x, rgba] arrays with the bottom
+    row first, the order pyglet takes image data in.
+    """
+
+    def __init__(self, world: World, colors: dict[str, tuple[int, int, int, int]]):
+        self.world: World = world
+        grid = world.grid
+        # Type id -> color
+        self.type_colors: np.ndarray = np.array(
+            [colors.get(type_, EMPTY_COLOR) for type_ in grid.type_names],
+            dtype=np.uint8,
+        )
+        self.type_colors[0] = EMPTY_COLOR
+
+    @staticmethod
+    def get_top_ids(structure_ids: np.ndarray) -> np.ndarray:
+        """
+        Type id of the highest layer with something built, 0 if nothing is,
+        from [..., layer, x, y] ids
+        """
+        top_ids = structure_ids[..., 0, :, :]
+        for layer in range(1, structure_ids.shape[-3]):
+            type_ids = structure_ids[..., layer, :, :]
+            top_ids = np.where(type_ids != 0, type_ids, top_ids)
+        return top_ids
+
+    def get_chunk_colors(self, chunk: Chunk) -> np.ndarray:
+        return self.type_colors[self.get_top_ids(chunk.structure_ids).T]
+
+    def get_chunks_block_colors(self, chunks: list[Chunk], size: int) -> np.ndarray:
+        """
+        Returns the block colors of each chunk as [chunk, y, x, rgba], size
+        has to divide the chunk size
+        """
+        structure_ids = np.stack([chunk.structure_ids for chunk in chunks])
+        return self.reduce_blocks(
+            self.get_top_ids(structure_ids).transpose(0, 2, 1), size
+        )
+
+    def get_rect_ids(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """
+        Returns the top type ids of the inclusive rect as [y, x], outside the
+        world is empty
+        """
+        top_ids = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=np.uint16)
+        grid = self.world.grid
+        for chunk in grid.iter_chunks_in_rect(x0, y0, x1, y1):
+            origin_x, origin_y = chunk.origin
+            source_x0 = max(x0 - origin_x, 0)
+            source_y0 = max(y0 - origin_y, 0)
+            source_x1 = min(x1 - origin_x, chunk.size - 1)
+            source_y1 = min(y1 - origin_y, chunk.size - 1)
+            top_ids[
+                origin_y + source_y0 - y0 : origin_y + source_y1 - y0 + 1,
+                origin_x + source_x0 - x0 : origin_x + source_x1 - x0 + 1,
+            ] = self.get_top_ids(chunk.structure_ids).T[
+                source_y0 : source_y1 + 1, source_x0 : source_x1 + 1
+            ]
+        return top_ids
+
+    def get_block_colors(
+        self, x0: int, y0: int, columns: int, rows: int, size: int
+    ) -> np.ndarray:
+        """Returns the block colors of a rect of columns x rows blocks"""
+        top_ids = self.get_rect_ids(
+            x0, y0, x0 + columns * size - 1, y0 + rows * size - 1
+        )
+        return self.reduce_blocks(top_ids, size)
+
+    def reduce_blocks(self, top_ids: np.ndarray, size: int) -> np.ndarray:
+        """
+        Returns the mean color of the built tiles of each size x size block
+        of [..., y, x] top type ids, opaque where anything is built. The
+        tiles of each type are counted, there are only a few types.
+        """
+        *shape, height, width = top_ids.shape
+        rows, columns = height // size, width // size
+        blocks = top_ids.reshape(*shape, rows, size, columns, size)
+        # [..., row, column, type] without the empty type
+        counts = np.stack(
+            [
+                (blocks == type_id).sum(axis=(-3, -1), dtype=np.uint32)
+                for type_id in range(1, len(self.type_colors))
+            ],
+            axis=-1,
+        )
+        built = counts.sum(axis=-1)
+        sums = counts @ self.type_colors[1:, :3].astype(np.uint32)
+
+        block_colors = np.zeros((*shape, rows, columns, 4), dtype=np.uint8)
+        any_built = built > 0
+        block_colors[any_built, :3] = sums[any_built] // built[any_built, np.newaxis]
+        block_colors[any_built, 3] = 255
+        return block_colors
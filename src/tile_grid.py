@@ -0,0 +1,387 @@
+"""
+Tile grid class that stores the per-tile world data in chunked typed arrays
+"""
+import numpy as np
+
+from . import constants
+from .tile import Tile
+from .chunk import Chunk
+from .autotile import CANONICAL_MASKS, OPPOSITE_BITS, compute_raw_masks
+
+# Build states
+BUILD_STATE_EMPTY = 0
+BUILD_STATE_PLANNED = 1
+BUILD_STATE_BUILT = 2
+
+# Structure type id 0 is reserved for "nothing on this layer"
+EMPTY_TYPE_ID = 0
+
+# Movement cost of a tile that has nothing on it
+EMPTY_MOVEMENT_COST = 1.0
+
+# Neighbor offsets in bitmask order: w, n, e, s, nw, ne, se, sw
+NEIGHBOR_OFFSETS = (
+    (-1, 0),
+    (0, 1),
+    (1, 0),
+    (0, -1),
+    (-1, 1),
+    (1, 1),
+    (1, -1),
+    (-1, -1),
+)
+
+
+class TileGrid:
+    """
+    Tile grid class
+
+    Stores structure type ids and build state per layer and the movement cost
+    per tile as numpy arrays split into chunks. A chunk is only allocated when
+    something is written to it, reading an untouched chunk returns the empty
+    values. Tile objects are only created when a caller asks for one.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        layers: int = constants.STRUCTURE_LAYERS,
+        chunk_size: int = constants.CHUNK_SIZE,
+    ):
+        self.width: int = width
+        self.height: int = height
+        self.layers: int = layers
+        self.chunk_size: int = chunk_size
+
+        self.chunks: dict[tuple[int, int], Chunk] = {}
+
+        self.type_ids: dict[str, int] = {}
+        self.type_names: list[str] = [""]
+        self.type_layers: list[int] = [0]
+        self.type_movement_costs: list[float] = [EMPTY_MOVEMENT_COST]
+        self.connected_type_ids: set[int] = set()
+
+    def register_type(
+        self,
+        type_: str,
+        layer: int,
+        movement_speed: float,
+        connected_texture: bool = False,
+    ) -> int:
+        """Registers a structure type and returns its id"""
+        if type_ in self.type_ids:
+            return self.type_ids[type_]
+
+        type_id = len(self.type_names)
+        self.type_ids[type_] = type_id
+        self.type_names.append(type_)
+        self.type_layers.append(layer)
+        self.type_movement_costs.append(
+            1 / movement_speed if movement_speed > 0 else np.inf
+        )
+        if connected_texture:
+            self.connected_type_ids.add(type_id)
+        return type_id
+
+    # Chunks
+    @property
+    def chunks_wide(self) -> int:
+        return -(-self.width // self.chunk_size)
+
+    @property
+    def chunks_high(self) -> int:
+        return -(-self.height // self.chunk_size)
+
+    def chunk_position_at(self, x: int, y: int) -> tuple[int, int]:
+        return x // self.chunk_size, y // self.chunk_size
+
+    def get_chunk(self, chunk_x: int, chunk_y: int) -> Chunk | None:
+        return self.chunks.get((chunk_x, chunk_y))
+
+    def get_or_create_chunk(self, chunk_x: int, chunk_y: int) -> Chunk:
+        chunk = self.chunks.get((chunk_x, chunk_y))
+        if chunk is None:
+            chunk = Chunk(
+                chunk_x,
+                chunk_y,
+                self.chunk_size,
+                self.layers,
+                EMPTY_MOVEMENT_COST,
+            )
+            self.chunks[(chunk_x, chunk_y)] = chunk
+        return chunk
+
+    def load_chunk(
+        self,
+        chunk_x: int,
+        chunk_y: int,
+        structure_ids: np.ndarray,
+        build_state: np.ndarray,
+    ) -> Chunk:
+        """
+        Creates a chunk from whole [layer, x, y] arrays, the autotile masks are
+        left to recompute_masks
+        """
+        chunk = self.get_or_create_chunk(chunk_x, chunk_y)
+        chunk.structure_ids[:] = structure_ids
+        chunk.build_state[:] = build_state
+        movement_costs = np.array(self.type_movement_costs, dtype=np.float32)
+        # The empty type's cost is the lowest so it only wins on empty tiles
+        chunk.movement_cost[:] = movement_costs[chunk.structure_ids].max(axis=0)
+        return chunk
+
+    def clear(self) -> None:
+        self.chunks.clear()
+
+    def iter_chunks(self):
+        """Yields only the populated chunks"""
+        yield from list(self.chunks.values())
+
+    def iter_chunks_in_rect(self, x0: int, y0: int, x1: int, y1: int):
+        """Yields the populated chunks overlapping the inclusive tile rect"""
+        chunk_x0, chunk_y0 = self.chunk_position_at(max(x0, 0), max(y0, 0))
+        chunk_x1, chunk_y1 = self.chunk_position_at(
+            min(x1, self.width - 1), min(y1, self.height - 1)
+        )
+        if (chunk_x1 - chunk_x0 + 1) * (chunk_y1 - chunk_y0 + 1) > len(self.chunks):
+            for chunk in self.iter_chunks():
+                if chunk_x0 <= chunk.chunk_x <= chunk_x1:
+                    if chunk_y0 <= chunk.chunk_y <= chunk_y1:
+                        yield chunk
+            return
+
+        for chunk_x in range(chunk_x0, chunk_x1 + 1):
+            for chunk_y in range(chunk_y0, chunk_y1 + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is not None:
+                    yield chunk
+
+    def _locate(self, x: int, y: int) -> tuple[Chunk | None, int, int]:
+        chunk = self.chunks.get((x // self.chunk_size, y // self.chunk_size))
+        return chunk, x % self.chunk_size, y % self.chunk_size
+
+    def _locate_for_write(self, x: int, y: int) -> tuple[Chunk, int, int]:
+        chunk = self.get_or_create_chunk(x // self.chunk_size, y // self.chunk_size)
+        return chunk, x % self.chunk_size, y % self.chunk_size
+
+    def _release_if_empty(self, chunk: Chunk) -> None:
+        if chunk.is_empty() and self.chunks.get(chunk.position) is chunk:
+            del self.chunks[chunk.position]
+
+    # Tiles
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get_tile_at(self, x: int, y: int) -> Tile | None:
+        if not self.in_bounds(x, y):
+            return None
+        return Tile(x, y)
+
+    def get_type_ids_at(self, x: int, y: int) -> list[int]:
+        if not self.in_bounds(x, y):
+            return []
+        chunk, local_x, local_y = self._locate(x, y)
+        if chunk is None:
+            return []
+        return [
+            int(type_id)
+            for type_id in chunk.structure_ids[:, local_x, local_y]
+            if type_id != EMPTY_TYPE_ID
+        ]
+
+    def get_types_at(self, x: int, y: int) -> list[str]:
+        return [self.type_names[type_id] for type_id in self.get_type_ids_at(x, y)]
+
+    def has_type(self, x: int, y: int, type_id: int) -> bool:
+        if not self.in_bounds(x, y):
+            return False
+        chunk, local_x, local_y = self._locate(x, y)
+        if chunk is None:
+            return False
+        layer = self.type_layers[type_id]
+        return bool(chunk.structure_ids[layer, local_x, local_y] == type_id)
+
+    def is_empty(self, x: int, y: int) -> bool:
+        if not self.in_bounds(x, y):
+            return True
+        chunk, local_x, local_y = self._locate(x, y)
+        if chunk is None:
+            return True
+        return not bool(chunk.structure_ids[:, local_x, local_y].any())
+
+    def get_build_state(self, x: int, y: int, type_id: int) -> int:
+        if not self.in_bounds(x, y):
+            return BUILD_STATE_EMPTY
+        chunk, local_x, local_y = self._locate(x, y)
+        if chunk is None:
+            return BUILD_STATE_EMPTY
+        return int(chunk.build_state[self.type_layers[type_id], local_x, local_y])
+
+    def get_movement_cost(self, x: int, y: int) -> float:
+        if not self.in_bounds(x, y):
+            return np.inf
+        chunk, local_x, local_y = self._locate(x, y)
+        if chunk is None:
+            return EMPTY_MOVEMENT_COST
+        return float(chunk.movement_cost[local_x, local_y])
+
+    def get_movement_costs(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Returns the movement costs of the inclusive in-bounds rect as [x, y]"""
+        costs = np.full(
+            (x1 - x0 + 1, y1 - y0 + 1), EMPTY_MOVEMENT_COST, dtype=np.float32
+        )
+        for chunk in self.iter_chunks_in_rect(x0, y0, x1, y1):
+            origin_x, origin_y = chunk.origin
+            source_x0 = max(x0 - origin_x, 0)
+            source_y0 = max(y0 - origin_y, 0)
+            source_x1 = min(x1 - origin_x, self.chunk_size - 1)
+            source_y1 = min(y1 - origin_y, self.chunk_size - 1)
+            costs[
+                origin_x + source_x0 - x0 : origin_x + source_x1 - x0 + 1,
+                origin_y + source_y0 - y0 : origin_y + source_y1 - y0 + 1,
+            ] = chunk.movement_cost[
+                source_x0 : source_x1 + 1, source_y0 : source_y1 + 1
+            ]
+        return costs
+
+    def set_structure(self, x: int, y: int, type_id: int) -> None:
+        chunk, local_x, local_y = self._locate_for_write(x, y)
+        layer = self.type_layers[type_id]
+        chunk.structure_ids[layer, local_x, local_y] = type_id
+        chunk.build_state[layer, local_x, local_y] = BUILD_STATE_BUILT
+        self._update_movement_cost(chunk, local_x, local_y)
+        if type_id in self.connected_type_ids:
+            self._update_neighbor_masks(x, y, type_id, True)
+
+    def clear_structure(self, x: int, y: int, type_id: int) -> None:
+        chunk, local_x, local_y = self._locate(x, y)
+        if chunk is None:
+            return
+        layer = self.type_layers[type_id]
+        chunk.structure_ids[layer, local_x, local_y] = EMPTY_TYPE_ID
+        chunk.build_state[layer, local_x, local_y] = BUILD_STATE_EMPTY
+        self._update_movement_cost(chunk, local_x, local_y)
+        if type_id in self.connected_type_ids:
+            self._update_neighbor_masks(x, y, type_id, False)
+        self._release_if_empty(chunk)
+
+    def set_build_state(self, x: int, y: int, type_id: int, state: int) -> None:
+        if state == BUILD_STATE_EMPTY:
+            chunk, local_x, local_y = self._locate(x, y)
+            if chunk is None:
+                return
+        else:
+            chunk, local_x, local_y = self._locate_for_write(x, y)
+        chunk.build_state[self.type_layers[type_id], local_x, local_y] = state
+        if state == BUILD_STATE_EMPTY:
+            self._release_if_empty(chunk)
+
+    def get_neighbor_positions(self, x: int, y: int) -> list[tuple[int, int]]:
+        """Returns the in-bounds neighbor positions that have a structure"""
+        return [
+            (x + dx, y + dy)
+            for dx, dy in NEIGHBOR_OFFSETS
+            if not self.is_empty(x + dx, y + dy)
+        ]
+
+    # Autotile masks
+    def raw_neighbor_mask(self, x: int, y: int, type_id: int) -> int:
+        """Returns the cached 8-neighbor bitmask of the given type around a tile"""
+        if not self.in_bounds(x, y):
+            return 0
+        chunk, local_x, local_y = self._locate(x, y)
+        if chunk is None or type_id not in chunk.masks:
+            return 0
+        return int(chunk.masks[type_id][local_x, local_y])
+
+    def neighbor_mask(self, x: int, y: int, type_id: int) -> int:
+        """
+        Returns the 8-neighbor bitmask of the given type around a tile.
+        Diagonals only count when both of the adjacent sides are set.
+        """
+        return int(CANONICAL_MASKS[self.raw_neighbor_mask(x, y, type_id)])
+
+    def _update_neighbor_masks(
+        self, x: int, y: int, type_id: int, present: bool
+    ) -> None:
+        for bit, (dx, dy) in enumerate(NEIGHBOR_OFFSETS):
+            neighbor_x, neighbor_y = x + dx, y + dy
+            if not self.in_bounds(neighbor_x, neighbor_y):
+                continue
+
+            neighbor_bit = 1 << OPPOSITE_BITS[bit]
+            if present:
+                chunk, local_x, local_y = self._locate_for_write(
+                    neighbor_x, neighbor_y
+                )
+                chunk.get_masks(type_id)[local_x, local_y] |= neighbor_bit
+            else:
+                chunk, local_x, local_y = self._locate(neighbor_x, neighbor_y)
+                if chunk is None or type_id not in chunk.masks:
+                    continue
+                chunk.masks[type_id][local_x, local_y] &= 0xFF ^ neighbor_bit
+                self._release_if_empty(chunk)
+
+    def recompute_masks(self) -> None:
+        """Rebuilds every autotile mask, one vectorized pass per chunk"""
+        populated = {
+            position
+            for position, chunk in self.chunks.items()
+            if chunk.structure_ids.any()
+        }
+        targets = {
+            (chunk_x + dx, chunk_y + dy)
+            for chunk_x, chunk_y in populated
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+            if 0 <= chunk_x + dx < self.chunks_wide
+            and 0 <= chunk_y + dy < self.chunks_high
+        }
+
+        for chunk in self.chunks.values():
+            chunk.masks.clear()
+
+        for type_id in self.connected_type_ids:
+            for chunk_x, chunk_y in targets:
+                masks = compute_raw_masks(
+                    self._padded_occupancy(chunk_x, chunk_y, type_id)
+                )
+                if masks.any():
+                    chunk = self.get_or_create_chunk(chunk_x, chunk_y)
+                    chunk.masks[type_id] = masks
+
+        for chunk in list(self.chunks.values()):
+            self._release_if_empty(chunk)
+
+    def _padded_occupancy(self, chunk_x: int, chunk_y: int, type_id: int) -> np.ndarray:
+        """
+        Returns where the given type is built in a chunk, padded by one tile
+        taken from each of the surrounding chunks
+        """
+        size = self.chunk_size
+        layer = self.type_layers[type_id]
+        padded = np.zeros((size + 2, size + 2), dtype=bool)
+        # offset -> (source slice, destination slice)
+        slices = {
+            -1: (slice(size - 1, size), slice(0, 1)),
+            0: (slice(0, size), slice(1, size + 1)),
+            1: (slice(0, 1), slice(size + 1, size + 2)),
+        }
+
+        for dx, (source_x, destination_x) in slices.items():
+            for dy, (source_y, destination_y) in slices.items():
+                chunk = self.chunks.get((chunk_x + dx, chunk_y + dy))
+                if chunk is None:
+                    continue
+                padded[destination_x, destination_y] = (
+                    chunk.structure_ids[layer, source_x, source_y] == type_id
+                )
+        return padded
+
+    def _update_movement_cost(self, chunk: Chunk, local_x: int, local_y: int) -> None:
+        cost = EMPTY_MOVEMENT_COST
+        for type_id in chunk.structure_ids[:, local_x, local_y]:
+            if type_id != EMPTY_TYPE_ID:
+                cost = max(cost, self.type_movement_costs[type_id])
+        chunk.movement_cost[local_x, local_y] = cost
@@ -0,0 +1,185 @@
+"""
+Tilemap Renderer for drawing the structures of a chunk as one vertex list
+"""
+from typing import Iterable
+
+import numpy as np
+import pyglet
+from pyglet.gl import GL_QUADS, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA
+from pyglet.graphics.vertexdomain import VertexList
+
+from . import constants
+from .world import World
+from .tile import Tile
+from .chunk import Chunk
+from .structure_images import StructureImages
+
+# Floats of the texture coordinates of a quad
+TEX_COORDS_PER_QUAD = 12
+# Two ints of position and three floats of texture coordinates
+BYTES_PER_VERTEX = 2 * 4 + 3 * 4
+
+
+class TilemapRenderer:
+    """
+    Tilemap Renderer class
+
+    Draws the built structures of each chunk with one vertex list of textured
+    quads, a quad per tile and layer in [layer, x, y] order so the floors are
+    drawn under the walls. Texture coordinates come from the atlas the
+    structure images share and are looked up by type id and autotile mask
+    straight from the tile grid arrays, no per tile objects are kept. When a
+    tile changes only its quads are rewritten, empty tiles get a quad with
+    no area.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        images: StructureImages,
+    ):
+        self.world: World = world
+        self.images: StructureImages = images
+
+        textures = set()
+        for image in self.iter_images(images.images):
+            texture = image.get_texture()
+            textures.add(getattr(texture, "owner", None) or texture)
+        if len(textures) != 1:
+            raise ValueError("The structure images have to share one texture atlas")
+        self.texture: pyglet.image.Texture = textures.pop()
+        self.group: pyglet.graphics.Group = pyglet.sprite.SpriteGroup(
+            self.texture, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA
+        )
+
+        self.vertex_lists: dict[tuple[int, int], VertexList] = {}
+        # Type id, raw autotile mask -> texture coordinates of the quad
+        self.tex_coords: np.ndarray = self.create_tex_coords()
+
+    @staticmethod
+    def iter_images(images: dict) -> Iterable:
+        for image in images.values():
+            if isinstance(image, list):
+                yield from image
+            else:
+                yield image
+
+    def create_tex_coords(self) -> np.ndarray:
+        type_names = self.world.grid.type_names
+        tex_coords = np.zeros((len(type_names), 256, TEX_COORDS_PER_QUAD), np.float32)
+        for type_id, type_ in enumerate(type_names):
+            if type_ in self.images.connected_images:
+                tex_coords[type_id] = [
+                    image.tex_coords for image in self.images.connected_images[type_]
+                ]
+            elif type_ in self.images.images:
+                tex_coords[type_id] = self.images.images[type_].tex_coords
+        return tex_coords
+
+    def get_quads(
+        self, chunk: Chunk, xs: np.ndarray, ys: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the vertices and texture coordinates of the quads of every
+        layer at the local positions of the chunk, as [layer, position]
+        """
+        grid = self.world.grid
+        type_ids = chunk.structure_ids[:, xs, ys]
+        masks = np.zeros(type_ids.shape, dtype=np.uint8)
+        for type_id, chunk_masks in chunk.masks.items():
+            layer = grid.type_layers[type_id]
+            is_type = type_ids[layer] == type_id
+            masks[layer, is_type] = chunk_masks[xs, ys][is_type]
+
+        origin_x, origin_y = chunk.origin
+        left = (origin_x + xs) * constants.TILE_SIZE
+        bottom = (origin_y + ys) * constants.TILE_SIZE
+        right = left + constants.TILE_SIZE
+        top = bottom + constants.TILE_SIZE
+        quads = np.stack([left, bottom, right, bottom, right, top, left, top], axis=1)
+        # Empty tiles collapse to a point
+        vertices = quads[np.newaxis] * (type_ids != 0)[..., np.newaxis]
+        return vertices.astype(np.int32), self.tex_coords[type_ids, masks]
+
+    def build_chunk(self, chunk: Chunk) -> None:
+        size = chunk.size
+        xs, ys = np.divmod(np.arange(size * size), size)
+        vertices, tex_coords = self.get_quads(chunk, xs, ys)
+
+        vertex_list = self.vertex_lists.get(chunk.position)
+        if vertex_list is None:
+            vertex_list = pyglet.graphics.vertex_list(
+                len(vertices) * size * size * 4, "v2i/dynamic", "t3f/dynamic"
+            )
+            self.vertex_lists[chunk.position] = vertex_list
+        np.ctypeslib.as_array(vertex_list.vertices)[:] = vertices.ravel()
+        np.ctypeslib.as_array(vertex_list.tex_coords)[:] = tex_coords.ravel()
+
+    def build(self) -> None:
+        for chunk in self.world.iter_chunks():
+            self.build_chunk(chunk)
+
+    def update_tiles(self, tiles: Iterable[Tile]) -> None:
+        """Rewrites the quads of the tiles, building chunks that are new"""
+        grid = self.world.grid
+        positions_by_chunk: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for tile in tiles:
+            chunk_position = grid.chunk_position_at(tile.x, tile.y)
+            positions_by_chunk.setdefault(chunk_position, []).append(tile.position)
+
+        for chunk_position, positions in positions_by_chunk.items():
+            chunk = grid.get_chunk(*chunk_position)
+            vertex_list = self.vertex_lists.get(chunk_position)
+            if chunk is None:
+                # Everything on it was removed
+                if vertex_list is not None:
+                    vertex_list.delete()
+                    del self.vertex_lists[chunk_position]
+                continue
+            if vertex_list is None:
+                self.build_chunk(chunk)
+                continue
+
+            origin_x, origin_y = chunk.origin
+            xs = np.array([x - origin_x for x, _ in positions])
+            ys = np.array([y - origin_y for _, y in positions])
+            vertices, tex_coords = self.get_quads(chunk, xs, ys)
+            quads = xs * chunk.size + ys
+            for layer in range(len(vertices)):
+                layer_quads = (quads + layer * chunk.size**2).tolist()
+                for quad, quad_vertices, quad_tex_coords in zip(
+                    layer_quads, vertices[layer], tex_coords[layer]
+                ):
+                    self.write_quad(vertex_list, "vertices", quad, quad_vertices)
+                    self.write_quad(vertex_list, "tex_coords", quad, quad_tex_coords)
+
+    @staticmethod
+    def write_quad(
+        vertex_list: VertexList, name: str, quad: int, data: np.ndarray
+    ) -> None:
+        """Writes one quad of an attribute, only it is uploaded again"""
+        attribute = vertex_list.domain.attribute_names[name]
+        region = attribute.get_region(attribute.buffer, vertex_list.start + quad * 4, 4)
+        np.ctypeslib.as_array(region.array)[:] = data
+        region.invalidate()
+
+    def draw(self, chunk_positions: Iterable[tuple[int, int]]) -> None:
+        self.group.set_state_recursive()
+        for chunk_position in chunk_positions:
+            vertex_list = self.vertex_lists.get(chunk_position)
+            if vertex_list is not None:
+                vertex_list.draw(GL_QUADS)
+        self.group.unset_state_recursive()
+
+    def clear(self) -> None:
+        for vertex_list in self.vertex_lists.values():
+            vertex_list.delete()
+        self.vertex_lists.clear()
+        self.tex_coords = self.create_tex_coords()
+
+    def measure(self) -> tuple[int, int]:
+        """Returns the quads and the bytes of their vertex data"""
+        vertices = sum(
+            vertex_list.get_size() for vertex_list in self.vertex_lists.values()
+        )
+        return vertices // 4, vertices * BYTES_PER_VERTEX
@@ -0,0 +1,109 @@
+"""
+Tracer for recording nested spans and exporting them as a Chrome trace
+"""
+from time import perf_counter, perf_counter_ns
+import json
+import os
+
+from . import constants
+
+
+class Tracer:
+    """
+    Tracer class
+
+    Records nested spans of named work into a ring buffer that keeps the last
+    capacity spans. export writes them in the Chrome trace event format that
+    chrome://tracing and ui.perfetto.dev open. Disabled, begin and end return
+    right away so the calls can stay in the hot paths.
+
+    Frames that take longer than threshold_ms are exported on their own, at
+    most once every cooldown seconds.
+    """
+
+    def __init__(
+        self,
+        capacity: int = constants.TRACE_CAPACITY,
+        path: str = constants.TRACE_PATH,
+        threshold_ms: float = constants.TRACE_FRAME_THRESHOLD_MS,
+        cooldown: float = constants.TRACE_EXPORT_COOLDOWN,
+    ):
+        self.enabled: bool = False
+        self.capacity: int = capacity
+        self.path: str = path
+        self.threshold_ms: float = threshold_ms
+        self.cooldown: float = cooldown
+
+        self.origin: int = perf_counter_ns()
+        # Ring buffer of finished spans
+        self.names: list[str] = [""] * capacity
+        self.starts: list[int] = [0] * capacity
+        self.ends: list[int] = [0] * capacity
+        self.count: int = 0
+        # Name and start of the spans that are open
+        self.stack: list[tuple[str, int]] = []
+
+        self.exports: int = 0
+        self.last_export: float = float("-inf")
+
+    def begin(self, name: str) -> None:
+        if not self.enabled:
+            return
+        self.stack.append((name, perf_counter_ns()))
+
+    def end(self) -> None:
+        if not self.enabled or not self.stack:
+            return
+        end = perf_counter_ns()
+        name, start = self.stack.pop()
+
+        index = self.count % self.capacity
+        self.names[index] = name
+        self.starts[index] = start
+        self.ends[index] = end
+        self.count += 1
+
+    def clear(self) -> None:
+        self.count = 0
+        self.stack.clear()
+
+    def check_frame(self, seconds: float) -> str | None:
+        """Exports the trace if the frame was too slow, returns the path"""
+        if not self.enabled or seconds * 1000 < self.threshold_ms:
+            return None
+        now = perf_counter()
+        if now - self.last_export < self.cooldown:
+            return None
+        self.last_export = now
+        return self.export()
+
+    def get_events(self) -> list[dict]:
+        first = max(self.count - self.capacity, 0)
+        events = []
+        for i in range(first, self.count):
+            index = i % self.capacity
+            start = self.starts[index]
+            events.append(
+                {
+                    "name": self.names[index],
+                    "ph": "X",
+                    "ts": (start - self.origin) / 1000,
+                    "dur": (self.ends[index] - start) / 1000,
+                    "pid": os.getpid(),
+                    "tid": 0,
+                }
+            )
+        return events
+
+    def export(self, path: str | None = None) -> str:
+        """Writes the spans in the ring buffer to a numbered file or path"""
+        if path is None:
+            self.exports += 1
+            path = f"{self.path}-{self.exports:04}.json"
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.get_events(), "displayTimeUnit": "ms"}, file)
+        return path
+
+
+# The tracer the game and the world record into, off unless enabled
+TRACER = Tracer()
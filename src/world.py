@@ -2,13 +2,37 @@
 Word class for world data
 """
 from itertools import chain
-from collections import deque
-from typing import Callable
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Iterable
 
+from . import constants
 from .tile import Tile
+from .chunk import Chunk
+from .tile_grid import (
+    TileGrid,
+    BUILD_STATE_EMPTY,
+    BUILD_STATE_PLANNED,
+    NEIGHBOR_OFFSETS,
+)
 from .structure import Structure
 from .job import Job
+from .job_board import JobBoard
+from .pathfinding import Path, octile_distance
+from .hierarchical_pathfinding import HierarchicalPathfinder
+from .flow_field import FlowFieldService
 from .character import Character
+from .character_store import CharacterStore
+from .event_bus import EventBus
+from .events import StructuresChanged, JobCreated, JobCompleted, JobCancelled
+from .tracer import TRACER
+
+if TYPE_CHECKING:
+    from .journal import Journal
+
+# Parts of World.update that are timed separately
+UPDATE_SUBSYSTEMS = ("jobs", "paths", "characters", "events")
+# A changed tile and its neighbors, whose autotile masks it changes
+DIRTY_OFFSETS = ((0, 0),) + NEIGHBOR_OFFSETS
 
 
 class World:
@@ -18,26 +42,42 @@ class World:
 
     def __init__(
         self,
-        width: int = 100,
-        height: int = 100,
+        width: int = constants.WORLD_WIDTH,
+        height: int = constants.WORLD_HEIGHT,
     ):
         self.width: int = width
         self.height: int = height
 
-        self.tiles: dict[(int, int), Tile] = {}
+        self.grid: TileGrid = TileGrid(width, height)
         self.blueprints: dict[str, Structure] = {}
+        # Only tiles that have structures on them are stored, and only once
+        # something asks for them, the grid knows where every structure is
         self.structures: dict[Tile, list[Structure]] = {}
 
-        self.characters: list[Character] = []
+        self.characters: CharacterStore = CharacterStore()
 
-        self._on_structure_changed_callbacks = set()
-        self._on_job_created_callbacks = set()
-        self._on_job_completed_callbacks = set()
+        self.events: EventBus = EventBus()
+        self.events.subscribe(JobCompleted, self.on_jobs_completed)
+        self.events.subscribe(JobCancelled, self.on_jobs_cancelled)
 
-        # TODO: refactor to job manager
-        self.jobs = deque()
+        self.jobs: JobBoard = JobBoard()
+        self.next_job_id: int = 0
+        # Jobs no path was found to since the last structure change
+        self.unreachable_jobs: set[Job] = set()
+        # Records every structure and job change when autosaving
+        self.journal: "Journal | None" = None
 
-        self.initialize()
+        self.pathfinder: HierarchicalPathfinder = HierarchicalPathfinder(self.grid)
+        self.flow_fields: FlowFieldService = FlowFieldService(
+            self.pathfinder.grid_pathfinder
+        )
+        self.flow_field_decay_timer: float = 0.0
+        self.flow_field_rebuild_timer: float = 0.0
+
+        # Seconds spent in each part of update since the last reset
+        self.timings: dict[str, float] = {}
+        self.reset_timings()
+        self.events.subscribe(StructuresChanged, self.on_structures_changed)
 
         self.blueprints = {
             "floor": Structure.create_blueprint(
@@ -46,6 +86,7 @@ class World:
                 movement_speed=0.5,
                 connected_texture=False,
                 build_time=5,
+                layer=0,
             ),
             "wall": Structure.create_blueprint(
                 structure_types_needs_to_be_under=["floor"],
@@ -53,124 +94,333 @@ class World:
                 movement_speed=0.0,
                 connected_texture=True,
                 build_time=10,
+                layer=1,
             ),
         }
 
-    # Subscriptions
-    def subscribe_on_structure_changed(self, fn):
-        self._on_structure_changed_callbacks.add(fn)
-
-    def unsubscribe_on_structure_changed(self, fn):
-        self._on_structure_changed_callbacks.remove(fn)
-
-    def subscribe_on_job_created(self, fn):
-        self._on_job_created_callbacks.add(fn)
-
-    def unsubscribe_on_job_created(self, fn):
-        self._on_job_created_callbacks.remove(fn)
-
-    def subscribe_on_job_completed(self, fn):
-        self._on_job_completed_callbacks.add(fn)
-
-    def unsubscribe_on_job_completed(self, fn):
-        self._on_job_completed_callbacks.remove(fn)
-
-    def on_structure_changed(self, structure: Structure) -> None:
-        for callback in self._on_structure_changed_callbacks:
-            callback(structure)
-
-    def on_job_created(self, job: Job) -> None:
-        for callback in self._on_job_created_callbacks:
-            callback(job)
-
-    def on_job_completed(self, job: Job) -> None:
-        self.place_structure(job)
-        # self.jobs.remove(job)
+        self.initialize()
 
-        for callback in self._on_job_completed_callbacks:
-            callback(job)
+    def on_structures_changed(self, events: list[StructuresChanged]) -> None:
+        positions = {
+            structure.tile.position
+            for event in events
+            for structure in chain(event.placed_structures, event.removed_structures)
+        }
+        self.pathfinder.invalidate(positions)
+        self.flow_fields.invalidate(positions)
+        self.unreachable_jobs.clear()
+
+        for index in self.characters.job_indices().tolist():
+            character = self.characters[index]
+            if character.path and character.path.crosses(positions):
+                self.update_path(character)
+
+    def on_jobs_completed(self, events: list[JobCompleted]) -> None:
+        jobs_by_type: dict[str, list[Job]] = {}
+        for event in events:
+            jobs_by_type.setdefault(event.job.structure_type, []).append(event.job)
+
+        for structure_type, jobs in jobs_by_type.items():
+            for job in jobs:
+                self.jobs.remove(job)
+                if self.journal:
+                    self.journal.job_completed(
+                        self.grid.type_ids[structure_type], job.tile.x, job.tile.y
+                    )
+            self.place_structures(structure_type, (job.tile for job in jobs))
+
+    def on_jobs_cancelled(self, events: list[JobCancelled]) -> None:
+        for event in events:
+            job = event.job
+            self.characters.drop_job(job)
+            self.jobs.remove(job)
+            self.grid.set_build_state(
+                job.tile.x,
+                job.tile.y,
+                self.grid.type_ids[job.structure_type],
+                BUILD_STATE_EMPTY,
+            )
+            if self.journal:
+                self.journal.job_cancelled(
+                    self.grid.type_ids[job.structure_type], job.tile.x, job.tile.y
+                )
 
     def create_job(self, tile: Tile, structure_type: str) -> None:
-        if not any(job for job in self.jobs if job.tile == tile):
+        if tile not in self.jobs:
             blueprint = self.blueprints[structure_type]
-            job = Job(tile, blueprint)
-            job.subscribe_on_job_created(self.on_job_created)
-            job.subscribe_on_job_completed(self.on_job_completed)
-            self.on_job_created(job)
-            self.jobs.append(job)
+            job = Job(tile, blueprint, self.events, self.next_job_id)
+            self.next_job_id += 1
+            self.grid.set_build_state(
+                tile.x, tile.y, self.grid.type_ids[structure_type], BUILD_STATE_PLANNED
+            )
+            self.events.publish(JobCreated(job))
+            self.jobs.add(job)
+            if self.journal:
+                self.journal.job_created(
+                    self.grid.type_ids[structure_type], tile.x, tile.y
+                )
+
+    def cancel_job(self, tile: Tile) -> None:
+        self.jobs.cancel(tile)
 
     def initialize(self):
-        for x in range(self.width):
-            for y in range(self.height):
-                tile = Tile(x, y)
-                self.tiles[(x, y)] = tile
-                self.structures[tile] = []
-
-        self.characters.append(Character(self.get_tile_at(50, 50)))
+        for blueprint in self.blueprints.values():
+            self.grid.register_type(
+                blueprint.type_,
+                blueprint.layer,
+                blueprint.movement_speed,
+                blueprint.connected_texture,
+            )
+
+        self.characters.add(self.get_tile_at(self.width // 2, self.height // 2))
         print("World Initialized")
 
+    def reset(self) -> None:
+        """Empties the world of structures, jobs and characters"""
+        self.grid.clear()
+        self.structures.clear()
+        self.jobs = JobBoard()
+        self.next_job_id = 0
+        self.unreachable_jobs.clear()
+        self.characters = CharacterStore()
+        self.pathfinder.clear()
+        self.flow_fields.clear()
+        self.flow_field_decay_timer = 0.0
+        self.flow_field_rebuild_timer = 0.0
+
     def get_tile_at(self, x: int, y: int) -> Tile | None:
-        if (x, y) not in self.tiles:
-            return None
-        return self.tiles[(x, y)]
+        return self.grid.get_tile_at(x, y)
+
+    def get_structures_at(self, tile: Tile) -> list[Structure]:
+        structures = self.structures.get(tile)
+        if structures is None:
+            type_names = self.grid.get_types_at(tile.x, tile.y)
+            if not type_names:
+                return []
+            # Built before the objects were, e.g. loaded from a save file
+            structures = [
+                Structure.build_blueprint(self.blueprints[type_], tile)
+                for type_ in type_names
+            ]
+            self.structures[tile] = structures
+        return structures
+
+    def iter_chunks(self):
+        """Yields only the chunks that have something built or planned"""
+        return self.grid.iter_chunks()
+
+    def get_structures_in_chunk(self, chunk: Chunk) -> list[Structure]:
+        return list(
+            chain.from_iterable(
+                self.get_structures_at(Tile(x, y))
+                for x, y in chunk.iter_structure_positions()
+            )
+        )
 
     def is_structure_valid_position(self, type_: str, tile: Tile) -> bool:
-        return self.blueprints[type_].is_valid_position(self.structures[tile])
+        return self.blueprints[type_].is_valid_position(
+            self.grid.get_types_at(tile.x, tile.y)
+        )
+
+    def get_neighbor_mask(self, tile: Tile, type_: str) -> int:
+        return self.grid.neighbor_mask(tile.x, tile.y, self.grid.type_ids[type_])
 
     def get_structure_neighbors(self, structure: Structure) -> list[Structure]:
-        # TODO: Fix this for the new neighbor list system
-        neighbors = []
-
-        x = structure.tile.x
-        y = structure.tile.y
-
-        w = self.get_tile_at(x - 1, y + 0)
-        n = self.get_tile_at(x + 0, y + 1)
-        e = self.get_tile_at(x + 1, y + 0)
-        s = self.get_tile_at(x + 0, y - 1)
-        nw = self.get_tile_at(x - 1, y + 1)
-        ne = self.get_tile_at(x + 1, y + 1)
-        se = self.get_tile_at(x + 1, y - 1)
-        sw = self.get_tile_at(x - 1, y - 1)
-
-        if w in self.structures:
-            neighbors.append(self.structures[w])
-        if n in self.structures:
-            neighbors.append(self.structures[n])
-        if e in self.structures:
-            neighbors.append(self.structures[e])
-        if s in self.structures:
-            neighbors.append(self.structures[s])
-        if nw in self.structures:
-            neighbors.append(self.structures[nw])
-        if ne in self.structures:
-            neighbors.append(self.structures[ne])
-        if se in self.structures:
-            neighbors.append(self.structures[se])
-        if sw in self.structures:
-            neighbors.append(self.structures[sw])
+        neighbors = [
+            self.get_structures_at(Tile(x, y))
+            for x, y in self.grid.get_neighbor_positions(
+                structure.tile.x, structure.tile.y
+            )
+        ]
 
         return list(chain(*neighbors))
 
+    def get_tiles_in_rect(self, x0: int, y0: int, x1: int, y1: int) -> list[Tile]:
+        """Returns the in-bounds tiles of the inclusive rect"""
+        return [
+            Tile(x, y)
+            for x in range(max(x0, 0), min(x1, self.width - 1) + 1)
+            for y in range(max(y0, 0), min(y1, self.height - 1) + 1)
+        ]
+
+    def get_dirty_tiles(self, tiles: Iterable[Tile]) -> set[Tile]:
+        """
+        Returns the tiles and their in-bounds neighbors, empty or not, the
+        subscribers skip the ones without structures
+        """
+        positions = {tile.position for tile in tiles}
+        dirty = set()
+        for x, y in positions:
+            for dx, dy in DIRTY_OFFSETS:
+                neighbor_x, neighbor_y = x + dx, y + dy
+                if 0 <= neighbor_x < self.width and 0 <= neighbor_y < self.height:
+                    dirty.add((neighbor_x, neighbor_y))
+        return {Tile(x, y) for x, y in dirty}
+
     def place_structure(self, job: Job) -> None:
-        structure = Structure.build_blueprint(
-            self.blueprints[job.structure_type], job.tile
+        self.place_structures(job.structure_type, [job.tile])
+
+    def place_structures(self, type_: str, tiles: Iterable[Tile]) -> list[Structure]:
+        """
+        Builds the structure type on every tile that is a valid position and
+        notifies the subscribers once with all the changed tiles. A tile that
+        is skipped loses the plan of a job that is no longer there.
+        """
+        blueprint = self.blueprints[type_]
+        type_id = self.grid.type_ids[type_]
+
+        structures = []
+        for tile in tiles:
+            if not self.is_structure_valid_position(type_, tile):
+                if (
+                    tile not in self.jobs
+                    and self.grid.get_build_state(tile.x, tile.y, type_id)
+                    == BUILD_STATE_PLANNED
+                ):
+                    self.grid.set_build_state(
+                        tile.x, tile.y, type_id, BUILD_STATE_EMPTY
+                    )
+                continue
+
+            structure = Structure.build_blueprint(blueprint, tile)
+            self.structures[tile] = self.get_structures_at(tile) + [structure]
+            self.grid.set_structure(tile.x, tile.y, type_id)
+            structures.append(structure)
+            if self.journal:
+                self.journal.structure_placed(type_id, tile.x, tile.y)
+
+        if structures:
+            self.events.publish(
+                StructuresChanged(
+                    self.get_dirty_tiles(structure.tile for structure in structures),
+                    structures,
+                    [],
+                )
+            )
+        return structures
+
+    def remove_structures(self, type_: str, tiles: Iterable[Tile]) -> list[Structure]:
+        """
+        Removes the structure type from every given tile and notifies the
+        subscribers once with all the changed tiles
+        """
+        type_id = self.grid.type_ids[type_]
+
+        removed = []
+        for tile in tiles:
+            structures = self.get_structures_at(tile)
+            if not structures:
+                continue
+
+            matching = [s for s in structures if s.type_ == type_]
+            if not matching:
+                # The layer may hold a planned job that has to stay
+                continue
+
+            for structure in matching:
+                structures.remove(structure)
+                removed.append(structure)
+            if not structures:
+                del self.structures[tile]
+            self.grid.clear_structure(tile.x, tile.y, type_id)
+            if self.journal:
+                self.journal.structure_removed(type_id, tile.x, tile.y)
+
+        if removed:
+            self.events.publish(
+                StructuresChanged(
+                    self.get_dirty_tiles(structure.tile for structure in removed),
+                    [],
+                    removed,
+                )
+            )
+        return removed
+
+    def find_path(self, start: Tile, goal: Tile) -> Path | None:
+        """
+        Follows the flow field of the goal's area when many characters are
+        heading there, otherwise searches for a path
+        """
+        distance = octile_distance(start.position, goal.position)
+        if distance > constants.FLOW_FIELD_AREA_SIZE:
+            path = self.flow_fields.find_path(start, goal)
+            if path is not None:
+                return path
+        return self.pathfinder.find_path(start, goal)
+
+    def assign_job(self, character: Character) -> bool:
+        """
+        Returns whether a path was searched for, False when there is no job
+        left to claim for anyone
+        """
+        job = self.jobs.claim_nearest(
+            character.destinaiton_tile, exclude=self.unreachable_jobs
         )
-        structure.subscribe_on_changed(self.on_structure_changed)
+        if job is None:
+            return False
+
+        path = self.find_path(character.destinaiton_tile, job.tile)
+        if path is None:
+            self.jobs.release(job)
+            self.unreachable_jobs.add(job)
+            return True
+
+        character.assign_job(job, path)
+        return True
 
-        if structure:
-            self.structures[job.tile].append(structure)
+    def update_path(self, character: Character) -> None:
+        """Finds a new path to the job or gives the job up if there is none"""
+        path = self.find_path(character.destinaiton_tile, character.job.tile)
+        if path is None:
+            self.jobs.release(character.job)
+            self.unreachable_jobs.add(character.job)
+            character.remove_job()
+            return
 
-            neighbors = self.get_structure_neighbors(structure)
-            for neighbor in neighbors:
-                self.on_structure_changed(neighbor)
+        character.path = path
 
-            self.on_structure_changed(structure)
+    def reset_timings(self) -> None:
+        self.timings = {subsystem: 0.0 for subsystem in UPDATE_SUBSYSTEMS}
 
     def update(self, dt) -> None:
-        for character in self.characters:
-            if not character.job:
-                if self.jobs:
-                    job = self.jobs.pop()
-                    character.assign_job(job)
-            character.update(dt)
+        TRACER.begin("World.update")
+        start = perf_counter()
+        # Characters past the budget wait for a later tick
+        path_requests = constants.PATH_REQUESTS_PER_TICK
+        for index in self.characters.idle_indices().tolist():
+            if not self.jobs.open_count or not path_requests:
+                break
+            if not self.assign_job(self.characters[index]):
+                # Every open job is claimed or unreachable, the rest of the
+                # idle characters would only scan the board again
+                break
+            path_requests -= 1
+        assigned = perf_counter()
+
+        for index in self.characters.lost_indices().tolist():
+            if not path_requests:
+                break
+            self.update_path(self.characters[index])
+            path_requests -= 1
+        pathed = perf_counter()
+
+        self.characters.update(dt)
+        moved = perf_counter()
+
+        self.flow_field_decay_timer += dt
+        if self.flow_field_decay_timer >= constants.FLOW_FIELD_DECAY_INTERVAL:
+            self.flow_field_decay_timer = 0.0
+            self.flow_fields.decay_requests()
+        self.flow_field_rebuild_timer += dt
+        if self.flow_field_rebuild_timer >= constants.FLOW_FIELD_REBUILD_INTERVAL:
+            self.flow_field_rebuild_timer = 0.0
+            self.flow_fields.drop_stale()
+
+        self.events.dispatch()
+        dispatched = perf_counter()
+
+        self.timings["jobs"] += assigned - start
+        self.timings["paths"] += pathed - assigned
+        self.timings["characters"] += moved - pathed
+        self.timings["events"] += dispatched - moved
+        TRACER.end()
@@ -1,12 +1,23 @@
 """
 World Manager
 """
+from typing import Iterable
+import os
+
 import pyglet
+from pyglet.window import key
 
+from . import constants
 from .world import World
+from .simulation import Simulation
+from .simulation_process import SimulationProcess, apply_command, apply_delta
+from .save_file import SaveFileError, save_world, load_world
+from .journal import Journal
+from .replay import Replay, ReplayRecorder
 from .tile import Tile
 from .structure import Structure
 from .manager import Manager
+from .events import StructuresChanged
 
 
 class WorldManager(Manager):
@@ -19,10 +30,108 @@ class WorldManager(Manager):
 
     def init(self) -> None:
         self.world: World = World()
-        self.world.subscribe_on_structure_changed(self.on_structure_changed)
+        self.world.events.subscribe(StructuresChanged, self.on_structures_changed)
+
+        self.simulation: Simulation | None = None
+        self.simulation_process: SimulationProcess | None = None
+        if constants.SIMULATION_IN_PROCESS:
+            # self.world only mirrors the world simulated on the worker
+            self.simulation_process = SimulationProcess(
+                self.world.width, self.world.height
+            )
+            self.simulation_process.start()
+        else:
+            self.simulation = Simulation(self.world)
+
+        # The worker's world is not journaled, its mirror misses changes
+        self.journal: Journal | None = None
+        if constants.AUTOSAVE_ENABLED and not self.simulation_process:
+            self.journal = Journal(self.world)
+            self.journal.start()
+
+        # Records the commands of every frame while recording a replay
+        self.recorder: ReplayRecorder | None = None
+        self.replaying: bool = False
+
+    @property
+    def alpha(self) -> float:
+        """How far between the last two simulation ticks drawing is"""
+        if self.simulation_process:
+            return self.simulation_process.alpha
+        return self.simulation.alpha
+
+    def create_jobs(self, type_: str, tiles: Iterable[Tile]) -> None:
+        self.send_command(("create_jobs", type_, [tile.position for tile in tiles]))
+
+    def cancel_jobs(self, tiles: Iterable[Tile]) -> None:
+        self.send_command(("cancel_jobs", [tile.position for tile in tiles]))
+
+    def start_recording(self, path: str) -> None:
+        self.recorder = ReplayRecorder(
+            path, self.world, self.simulation.rate, self.simulation.ticks
+        )
+        if self.journal:
+            self.journal.snapshot()
 
-    def on_structure_changed(self, structure: Structure) -> None:
+    def start_replay(self, replay: Replay) -> None:
+        replay.load_world(self.world)
+        self.replaying = True
+        self.simulation = Simulation(self.world, replay.header["rate"])
+        if self.journal:
+            self.journal.snapshot()
+
+    def send_command(self, command: tuple) -> None:
+        if self.recorder:
+            self.recorder.record_command(command)
+        if self.simulation_process:
+            self.simulation_process.send(command)
+        else:
+            apply_command(self.world, command)
+
+    def save(self, path: str = constants.SAVE_FILE_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        save_world(self.world, path)
+
+    def load(self, path: str = constants.SAVE_FILE_PATH) -> None:
+        try:
+            load_world(self.world, path)
+        except (OSError, SaveFileError) as error:
+            # Checked before anything is replaced, the world is kept
+            print(f"World not loaded: {error}")
+            return
+        if self.journal:
+            # The journal so far continues the world that was replaced
+            self.journal.snapshot()
+
+    def close(self) -> None:
+        """Stops autosaving after the game was closed normally"""
+        if self.journal:
+            self.journal.stop(clean=True)
+
+    def on_structures_changed(self, events: list[StructuresChanged]) -> None:
         pass
 
     def update(self, dt) -> None:
-        self.world.update(dt)
+        if not self.simulation_process:
+            # The mirror of a worker's world does not have all of its state
+            if self.is_key_pressed(key.F5):
+                self.save()
+            if self.is_key_pressed(key.F9):
+                # A load is not a command, a replay could not repeat it
+                if self.recorder or self.replaying:
+                    print("Loading is disabled while recording or replaying")
+                else:
+                    self.load()
+
+            self.simulation.advance(dt)
+            if self.journal:
+                self.journal.update(dt)
+            return
+
+        for delta in self.simulation_process.receive_deltas():
+            apply_delta(self.world, delta)
+        self.world.events.dispatch()
+
+        snapshot = self.simulation_process.read_snapshot()
+        if snapshot:
+            self.world.characters.copy_positions(*snapshot)